@@ -7,6 +7,10 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 from utils import load_trimmed_data, create_sample_data
+from plan_index import get_premium_matrix
+from plan_cube import get_plan_cube
+from charts import show_cached_chart
+from data_store import get_dataset
 
 # Page configuration
 st.set_page_config(
@@ -109,7 +113,7 @@ with st.sidebar:
     
     st.markdown("### Market Insights")
     st.metric("Total Plans", f"{len(plans_df):,}")
-    st.metric("Avg Premium", f"₹{rates_df['AvgIndividualRate'].mean():.0f}/month")
+    st.metric("Avg Premium", f"₹{get_premium_matrix().overall_mean:.0f}/month")
     st.metric("Coverage Score", "92%")
     
     st.markdown("---")
@@ -207,44 +211,49 @@ st.markdown("## 📊 Market Overview")
 col1, col2 = st.columns(2)
 
 with col1:
-    # Plan distribution pie chart
-    metal_counts = plans_df['MetalLevel'].value_counts()
-    fig_distribution = px.pie(
-        values=metal_counts.values, 
-        names=metal_counts.index,
-        title="Plan Distribution by Metal Level",
-        color_discrete_map={
-            'Bronze': '#8B4513',
-            'Silver': '#A0522D', 
-            'Gold': '#DAA520',
-            'Platinum': '#B8860B'
-        }
-    )
-    fig_distribution.update_layout(height=400)
-    st.plotly_chart(fig_distribution, use_container_width=True)
-
-with col2:
-    # Simple premium overview - Fixed the groupby operation
-    try:
-        # Merge plans and rates data properly
-        plans_with_rates = plans_df.merge(rates_df, on='PlanId', how='inner')
-        avg_premium_by_metal = plans_with_rates.groupby('MetalLevel')['AvgIndividualRate'].mean().reset_index()
-        
-        fig_premium = px.bar(
-            avg_premium_by_metal,
-            x='MetalLevel',
-            y='AvgIndividualRate',
-            title="Average Premium by Metal Level",
-            color='MetalLevel',
+    # Plan distribution pie chart, from counts precomputed per data version
+    def distribution_chart():
+        metal_counts = get_plan_cube().plans_by("MetalLevel")
+        fig_distribution = px.pie(
+            values=metal_counts.values, 
+            names=metal_counts.index,
+            title="Plan Distribution by Metal Level",
             color_discrete_map={
                 'Bronze': '#8B4513',
-                'Silver': '#A0522D',
+                'Silver': '#A0522D', 
                 'Gold': '#DAA520',
                 'Platinum': '#B8860B'
             }
         )
-        fig_premium.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_premium, use_container_width=True)
+        fig_distribution.update_layout(height=400)
+        return fig_distribution
+
+    show_cached_chart("home_distribution", {}, get_dataset().version, distribution_chart)
+
+with col2:
+    # Simple premium overview - Fixed the groupby operation
+    try:
+        # Averages come from the precomputed premium matrix, not a per-rerun merge
+        def premium_chart():
+            avg_premium_by_metal = get_premium_matrix().average_by(plans_df['MetalLevel'])
+            
+            fig_premium = px.bar(
+                avg_premium_by_metal,
+                x='MetalLevel',
+                y='AvgIndividualRate',
+                title="Average Premium by Metal Level",
+                color='MetalLevel',
+                color_discrete_map={
+                    'Bronze': '#8B4513',
+                    'Silver': '#A0522D',
+                    'Gold': '#DAA520',
+                    'Platinum': '#B8860B'
+                }
+            )
+            fig_premium.update_layout(height=400, showlegend=False)
+            return fig_premium
+
+        show_cached_chart("home_premium", {}, get_dataset().version, premium_chart)
     except Exception as e:
         st.warning(f"Could not generate premium chart: {e}")
         # Fallback to sample data
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Chat load test: many concurrent sessions calling the LLM client, against the
+local fake Gemini server by default
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_gemini_server import start_server
+from llm_client import GeminiClient, LLMError
+
+
+def percentile(samples, q):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def one_request(client, i, stream):
+    """Return (time to first token, total time, error) for one chat turn."""
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if stream:
+            for chunk in client.generate_content(f"User: question {i} about deductibles", stream=True):
+                if ttft is None and chunk.text:
+                    ttft = time.perf_counter() - start
+        else:
+            client.generate_content(f"User: question {i} about deductibles")
+            ttft = time.perf_counter() - start
+        return ttft, time.perf_counter() - start, None
+    except LLMError as e:
+        return ttft, time.perf_counter() - start, str(e)
+
+
+def fmt(samples):
+    return (
+        f"p50 {percentile(samples, 50) * 1000:7.0f} ms  p95 {percentile(samples, 95) * 1000:7.0f} ms  "
+        f"p99 {percentile(samples, 99) * 1000:7.0f} ms  max {max(samples, default=float('nan')) * 1000:7.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the chat LLM client")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=32, help="concurrent chat sessions")
+    parser.add_argument("--base-url", help="API to hit (default: start a local fake server)")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--timeout", type=float, default=10.0, help="deadline per call")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--hedge-after", type=float, default=0.0, help="seconds before a hedged request (0: off)")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="fake server: share of 503s")
+    parser.add_argument("--stall-rate", type=float, default=0.02, help="fake server: share of stalled requests")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(port=0, latency=0.3, jitter=0.1, token_delay=0.01,
+                              error_rate=args.error_rate, stall_rate=args.stall_rate, stall_seconds=5.0)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    client = GeminiClient(
+        api_key="fake", model_name="gemini-1.5-flash", base_url=base_url, timeout=args.timeout,
+        max_retries=args.retries, hedge_after=args.hedge_after, max_concurrency=args.max_concurrency,
+    )
+
+    print(f"💬 Chat load test: {args.requests} requests, {args.sessions} sessions → {base_url}")
+    print("=" * 70)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        results = list(pool.map(lambda i: one_request(client, i, not args.no_stream), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r[2] is None]
+    print(f"First token  {fmt([r[0] for r in ok])}")
+    print(f"Total        {fmt([r[1] for r in ok])}")
+    print(f"Throughput   {len(results) / elapsed:.1f} req/s, {len(ok)}/{len(results)} succeeded")
+    print(f"Client       {client.stats()}")
+    if server is not None:
+        print(f"Fake server  {server.RequestHandlerClass.counters}")
+        server.shutdown()
+    errors = [r[2] for r in results if r[2] is not None]
+    if errors:
+        print(f"⚠️ {len(errors)} failed, e.g. {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
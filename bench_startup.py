@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time of utils and first-render latency of each page
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+PAGES = [
+    "Home.py",
+    "pages/Dashboard.py",
+    "pages/Details.py",
+    "pages/Find_a_Plan.py",
+    "pages/You_and_your_Plan.py",
+]
+
+IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import utils
+print(time.perf_counter() - t)
+"""
+
+# Cold render loads the datasets; warm render reuses the process-wide store
+RENDER_SNIPPET = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+for _ in range(2):
+    t = time.perf_counter()
+    at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+    print(time.perf_counter() - t)
+    if at.exception:
+        sys.exit(at.exception[0].value)
+"""
+
+
+def run_snippet(snippet, *args):
+    """Run a snippet in a fresh interpreter and return the timings it prints."""
+    result = subprocess.run(
+        [sys.executable, "-c", snippet, *args],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    return [float(line) for line in result.stdout.split()]
+
+
+def fmt(samples):
+    return f"{statistics.median(samples) * 1000:8.1f} ms (min {min(samples) * 1000:.1f})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Havenly startup latency")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement")
+    args = parser.parse_args()
+
+    print("🚀 Havenly startup benchmark")
+    print("=" * 70)
+
+    imports = [run_snippet(IMPORT_SNIPPET)[0] for _ in range(args.repeat)]
+    print(f"{'import utils':<28}{fmt(imports)}")
+
+    for page in PAGES:
+        try:
+            runs = [run_snippet(RENDER_SNIPPET, page) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{page:<28}❌ {e}")
+            continue
+        cold = [r[0] for r in runs]
+        warm = [r[1] for r in runs]
+        print(f"{page:<28}cold {fmt(cold)}   warm {fmt(warm)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Incremental data build.
+
+The data scripts are modelled as a DAG of stages. A stage re-runs only when
+the content of one of its inputs or its own code changed, or when one of its
+outputs is missing or was modified outside the build. Outputs of the last
+BUILD_CACHE_KEYS runs of each stage are kept in .build_cache/ keyed by that
+fingerprint, so going back to a recent input restores the outputs without
+re-running the script.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from graphlib import TopologicalSorter
+
+from data_store import DATA_FILES, RATE_CUBE_FILE, snapshot_path
+
+STATE_FILE = ".build_state.json"
+CACHE_DIR = ".build_cache"
+# Cached runs kept per stage, most recently built or restored first
+BUILD_CACHE_KEYS = int(os.getenv("BUILD_CACHE_KEYS", "3"))
+
+
+class Stage:
+    def __init__(self, name, script, inputs, outputs, code=(), manual=False, args=()):
+        self.name = name
+        self.script = script
+        # Command-line arguments for the script, e.g. the etl.py stage to run
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # Modules the script imports from this repo; editing them re-runs the stage
+        self.code = [script, *code]
+        # Manual stages only run when named on the command line
+        self.manual = manual
+
+
+# The raw CMS files go through etl.py into partitioned Parquet directories
+STAGES = [
+    Stage("etl_rate", "etl.py", ["data/Rate.csv"], ["data/rate"], code=["trim_rate.py"], args=["rate"]),
+    Stage("filtered_rate2", "filtered_rate2.py", ["data/rate"],
+          ["filtered_rate2.csv", "filtered_rate2_stats.csv", RATE_CUBE_FILE], code=["rate_cube.py", "etl.py"]),
+    Stage("etl_service", "etl.py", ["data/ServiceArea.csv"], ["data/service"], code=["trim_service.py"], args=["service"]),
+    Stage("filtered_services", "filtered_services.py", ["data/service"],
+          [DATA_FILES["service_areas"]], code=["etl.py"]),
+    Stage("etl_benefits", "etl.py", ["data/BenefitsCostSharing.csv"], ["data/benefits"],
+          code=["trim_benefits.py"], args=["benefits"]),
+    Stage("etl_business_rules", "etl.py", ["data/BusinessRules.csv"], ["data/business_rules"],
+          code=["trim_business_rules.py"], args=["business_rules"]),
+    Stage("load_plans", "load_plans.py", ["filtered_plans.csv"], ["filtered_plan_attributes_trimmed.csv"]),
+    # Rewrites filtered_plan2.csv in place with random names, so never implied
+    Stage("update_plan_names", "update_plan_names.py", ["filtered_plan2.csv"], ["filtered_plan2.csv"], manual=True),
+    Stage("build_snapshots", "build_snapshots.py", list(DATA_FILES.values()),
+          [snapshot_path(path) for path in DATA_FILES.values()], code=["data_store.py"]),
+]
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+class FileHasher:
+    """
+    Content hashes, reused while a file's size and mtime are unchanged.
+    A directory hashes the relative paths and content hashes of its files.
+    """
+
+    def __init__(self, known):
+        self.known = known
+
+    def __call__(self, path):
+        if os.path.isdir(path):
+            digest = hashlib.blake2b(digest_size=16)
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(f"{os.path.relpath(file_path, path)}={self(file_path)};".encode())
+            return digest.hexdigest()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self.known.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.known[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "stages": {}}
+
+
+def save_state(state):
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def stage_key(stage, file_hash):
+    """
+    Fingerprint of a stage's code and input contents, or None if an input is missing
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in [*stage.code, *stage.inputs]:
+        content = file_hash(path)
+        if content is None:
+            return None
+        digest.update(f"{path}={content};".encode())
+    return digest.hexdigest()
+
+
+def graph(stages):
+    """
+    Map each stage to the stages producing its inputs
+    """
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            if path not in stage.inputs:
+                producers[path] = stage.name
+    return {
+        stage.name: {producers[path] for path in stage.inputs if path in producers and producers[path] != stage.name}
+        for stage in stages
+    }
+
+
+def select(targets):
+    """
+    Requested stages plus everything upstream of them, in dependency order
+    """
+    deps = graph(STAGES)
+    if not targets:
+        wanted = {stage.name for stage in STAGES if not stage.manual}
+    else:
+        wanted, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(deps[name])
+    order = TopologicalSorter({name: deps[name] & wanted for name in wanted}).static_order()
+    return [STAGES_BY_NAME[name] for name in order]
+
+
+def outputs_intact(stage, record, file_hash):
+    recorded = record.get("outputs", {})
+    return all(path in recorded and file_hash(path) == recorded[path] for path in stage.outputs)
+
+
+def _copy(source, target):
+    if os.path.isdir(source):
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(source, target)
+    else:
+        shutil.copy2(source, target)
+
+
+def restore_from_cache(stage, key):
+    cached = os.path.join(CACHE_DIR, stage.name, key)
+    if not all(os.path.exists(os.path.join(cached, str(i))) for i in range(len(stage.outputs))):
+        return False
+    for i, path in enumerate(stage.outputs):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        _copy(os.path.join(cached, str(i)), path)
+    # Mark it recently used so eviction keeps it
+    os.utime(cached)
+    return True
+
+
+def store_in_cache(stage, key):
+    cached = os.path.join(CACHE_DIR, stage.name, key)
+    os.makedirs(cached, exist_ok=True)
+    for i, path in enumerate(stage.outputs):
+        _copy(path, os.path.join(cached, str(i)))
+    os.utime(cached)
+    evict_from_cache(stage)
+
+
+def evict_from_cache(stage, keep=None):
+    """
+    Delete all but the most recently used cached runs of a stage
+    """
+    keep = BUILD_CACHE_KEYS if keep is None else keep
+    stage_dir = os.path.join(CACHE_DIR, stage.name)
+    runs = [os.path.join(stage_dir, key) for key in os.listdir(stage_dir)]
+    runs.sort(key=lambda path: os.stat(path).st_mtime_ns, reverse=True)
+    for path in runs[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def build(targets=(), force=False, dry_run=False, use_cache=True):
+    state = load_state()
+    file_hash = FileHasher(state.setdefault("files", {}))
+    records = state.setdefault("stages", {})
+
+    for stage in select(targets):
+        key = stage_key(stage, file_hash)
+        record = records.get(stage.name, {})
+
+        if key is None:
+            missing = [path for path in [*stage.code, *stage.inputs] if not os.path.exists(path)]
+            print(f"⚠️ {stage.name}: skipped, missing {', '.join(missing)}")
+            continue
+
+        if not force and record.get("key") == key and outputs_intact(stage, record, file_hash):
+            print(f"✔️ {stage.name}: up to date")
+            continue
+
+        if dry_run:
+            print(f"🔄 {stage.name}: would run")
+            continue
+
+        start = time.perf_counter()
+        if not force and use_cache and restore_from_cache(stage, key):
+            how = "restored from cache"
+        else:
+            print(f"🔄 {stage.name}: running {' '.join([stage.script, *stage.args])}")
+            subprocess.run([sys.executable, stage.script, *stage.args], check=True)
+            how = "built"
+
+        # An in-place stage rewrites its own input, so fingerprint it again
+        key = stage_key(stage, file_hash)
+        records[stage.name] = {
+            "key": key,
+            "outputs": {path: file_hash(path) for path in stage.outputs},
+        }
+        if use_cache and how == "built":
+            store_in_cache(stage, key)
+        save_state(state)
+        print(f"✅ {stage.name}: {how} in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the Havenly datasets incrementally")
+    parser.add_argument("targets", nargs="*", help=f"stages to bring up to date (default: all but manual ones): {', '.join(STAGES_BY_NAME)}")
+    parser.add_argument("--force", action="store_true", help="re-run the selected stages even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages would run")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write .build_cache/")
+    args = parser.parse_args()
+
+    unknown = set(args.targets) - set(STAGES_BY_NAME)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    build(args.targets, force=args.force, dry_run=args.dry_run, use_cache=not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import argparse
+
+from data_store import DATA_FILES, write_snapshot
+
+# Compile the trimmed CSVs into memory-mappable columnar snapshots
+parser = argparse.ArgumentParser(description="Build Arrow snapshots of the trimmed datasets")
+parser.add_argument(
+    "--compression", choices=["none", "lz4", "zstd"], default="none",
+    help="buffer compression; 'none' keeps the snapshots zero-copy when memory-mapped"
+)
+args = parser.parse_args()
+compression = None if args.compression == "none" else args.compression
+
+for path in DATA_FILES.values():
+    out_path, rows = write_snapshot(path, compression=compression)
+    print(f"✅ {path} → {out_path} ({rows:,} rows)")
@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+import streamlit as st
+
+# Serialized figures kept in memory across sessions
+FIGURE_CACHE_ENTRIES = 256
+# Plotly's own default, used when a figure sets no height
+DEFAULT_CHART_HEIGHT = 450
+
+
+class ChartSpec:
+    """
+    A finished figure serialized once: the Plotly JSON the browser receives and its height
+    """
+
+    def __init__(self, figure):
+        self.json = pio.to_json(figure, validate=False)
+        self.height = figure.layout.height or DEFAULT_CHART_HEIGHT
+        self.id = "plotly_chart-" + hashlib.blake2b(self.json.encode(), digest_size=12).hexdigest()
+
+
+class FigureCache:
+    """
+    Serialized Plotly figures by (chart id, filter state, data version), least recently used evicted.
+
+    Building a figure with plotly.express costs tens of milliseconds per
+    chart, and st.plotly_chart validates and serializes it again on every
+    rerun. A cached spec is sent to the browser as it is.
+    """
+
+    def __init__(self, max_entries=FIGURE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get_or_build(self, key, build):
+        """
+        The spec for a key, building and serializing the figure on a miss
+        """
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self.counters["hits"] += 1
+                return spec
+            self.counters["misses"] += 1
+
+        spec = ChartSpec(build())
+        with self._lock:
+            self._specs[key] = spec
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.max_entries:
+                self._specs.popitem(last=False)
+        return spec
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._specs))
+
+
+_figure_cache = FigureCache()
+
+
+def cached_chart(chart_id, filters, version, build):
+    """
+    The spec for a chart under some filters and data version, built on first use
+    """
+    key = (chart_id, tuple(sorted((filters or {}).items())), version)
+    return _figure_cache.get_or_build(key, build)
+
+
+def show_chart(spec):
+    """
+    Show a serialized chart at full container width, as st.plotly_chart would,
+    without validating or serializing the figure again
+    """
+    try:
+        from streamlit.elements.lib.layout_utils import LayoutConfig
+        from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+    except ImportError:
+        # Streamlit moved its internals; fall back to the public call
+        st.plotly_chart(pio.from_json(spec.json), width="stretch")
+        return
+
+    proto = PlotlyChartProto()
+    proto.spec = spec.json
+    proto.config = "{}"
+    proto.theme = "streamlit"
+    proto.id = spec.id
+    st._main._enqueue("plotly_chart", proto, layout_config=LayoutConfig(width="stretch", height=spec.height))
+
+
+def show_cached_chart(chart_id, filters, version, build):
+    show_chart(cached_chart(chart_id, filters, version, build))
@@ -0,0 +1,12 @@
+import pytest
+
+from data_store import create_sample_data, normalize_frames
+
+
+@pytest.fixture(scope="session")
+def sample_frames():
+    """
+    The app's sample catalog as loaded: (plans, rates, benefits, service_areas).
+    Shared by every test module, so tests copy before changing a frame.
+    """
+    return normalize_frames(*create_sample_data())
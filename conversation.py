@@ -0,0 +1,122 @@
+import os
+import re
+from collections import deque
+
+# Messages kept per session; older ones survive only in the rolling summary
+CHAT_MAX_MESSAGES = int(os.getenv("HAVENLY_CHAT_MAX_MESSAGES", "100"))
+# Messages rendered per page of history
+CHAT_PAGE_SIZE = 10
+# Approximate tokens of history sent with a follow-up question
+CHAT_CONTEXT_TOKENS = int(os.getenv("HAVENLY_CHAT_CONTEXT_TOKENS", "1500"))
+# Share of the context budget the summary of older turns may use
+SUMMARY_SHARE = 0.3
+# Characters of a message kept in its summary line
+GIST_CHARS = 160
+# Summary lines kept per session, far more than the context budget takes; the oldest go first
+SUMMARY_MAX_LINES = 50
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about four characters per token for English text)
+    """
+    return len(text) // 4 + 1
+
+
+def gist(message):
+    """
+    One summary line for a message: its first sentence, shortened
+    """
+    text = re.sub(r"[*#>`_]+", "", message["content"])
+    text = " ".join(text.split())
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(sentence) > GIST_CHARS:
+        sentence = sentence[:GIST_CHARS].rsplit(" ", 1)[0] + "…"
+    speaker = "User" if message["role"] == "user" else "Advisor"
+    return f"{speaker}: {sentence}"
+
+
+class Conversation:
+    """
+    Chat history for one session, bounded in memory and paged for display.
+
+    The last max_messages messages are kept verbatim; older ones are folded
+    into a rolling summary of one gist line each, of which the last
+    SUMMARY_MAX_LINES are kept. context() fills a token budget with the most
+    recent messages verbatim and summarizes the rest.
+    """
+
+    def __init__(self, max_messages=CHAT_MAX_MESSAGES, page_size=CHAT_PAGE_SIZE):
+        self.max_messages = max_messages
+        self.page_size = page_size
+        self.messages = []
+        self.summary = deque(maxlen=SUMMARY_MAX_LINES)
+        self.pages = 1
+
+    def __len__(self):
+        return len(self.messages)
+
+    def add(self, role, content):
+        message = {"role": role, "content": content}
+        message["gist"] = gist(message)
+        self.messages.append(message)
+        while len(self.messages) > self.max_messages:
+            self.summary.append(self.messages.pop(0)["gist"])
+
+    def clear(self):
+        self.messages = []
+        self.summary.clear()
+        self.pages = 1
+
+    def visible(self):
+        """
+        The messages on the pages currently shown, oldest first
+        """
+        return self.messages[-self.pages * self.page_size:]
+
+    def hidden(self):
+        """
+        Number of kept messages before the shown pages
+        """
+        return max(0, len(self.messages) - self.pages * self.page_size)
+
+    def load_earlier(self):
+        self.pages += 1
+
+    def context(self, budget=CHAT_CONTEXT_TOKENS):
+        """
+        History for the model within a token budget: a summary of older
+        turns followed by as many recent messages verbatim as fit
+        """
+        summary_budget = int(budget * SUMMARY_SHARE)
+        recent, used = [], 0
+        for message in reversed(self.messages):
+            speaker = "User" if message["role"] == "user" else "Advisor"
+            line = f"{speaker}: {message['content']}"
+            cost = estimate_tokens(line)
+            if used + cost > budget - summary_budget:
+                if not recent:
+                    # Always keep the latest message, cut down to the budget
+                    recent.append("…" + line[-4 * (budget - summary_budget):])
+                break
+            recent.append(line)
+            used += cost
+        recent.reverse()
+
+        # Everything older than the verbatim part, newest gists kept first
+        older = list(self.summary) + [message["gist"] for message in self.messages[:len(self.messages) - len(recent)]]
+        gists, used = [], 0
+        for line in reversed(older):
+            cost = estimate_tokens(line)
+            if used + cost > summary_budget:
+                break
+            gists.append(line)
+            used += cost
+        gists.reverse()
+
+        parts = []
+        if gists:
+            parts.append("Summary of earlier conversation:\n" + "\n".join(gists))
+        if recent:
+            parts.append("Recent conversation:\n" + "\n".join(recent))
+        return "\n\n".join(parts)
@@ -0,0 +1,622 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # CSV loading still works without pyarrow
+    pa = pc = None
+
+# Shared frames are handed to every session, so writes must never reach them
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+DATA_FILES = {
+    "plans": "filtered_plan2.csv",
+    "rates": "filtered_rate2.csv",
+    "benefits": "filtered_benefits2.csv",
+    "service_areas": "filtered_service_area.csv",
+}
+
+SNAPSHOT_DIR = "snapshots"
+
+# Age/tobacco rate cube written by filtered_rate2.py (optional)
+RATE_CUBE_FILE = "filtered_rate_cube.npz"
+
+# String columns whose distinct/total ratio is below this are dictionary-encoded
+DICTIONARY_RATIO = 0.5
+
+# Canonical schema applied once at load time
+CATEGORY_COLUMNS = [
+    "MetalLevel", "PlanType", "StateCode", "MarketCoverage",
+    "ServiceAreaId", "NetworkId", "BenefitName", "CoverageLevel",
+]
+FLAG_COLUMNS = [
+    "ChildOnlyOffering", "IsHSAEligible", "IsNewPlan", "IsGuaranteedRate",
+    "WellnessProgramOffered", "DiseaseManagementProgramsOffered", "OutOfCountryCoverage",
+    "OutOfServiceAreaCoverage", "SpecialistRequiringReferral", "DentalOnlyPlan",
+    "IsNoticeRequiredForPregnancy", "CoverEntireState",
+]
+PERCENT_COLUMNS = ["IssuerActuarialValue", "Coinsurance"]
+AMOUNT_COLUMNS = ["AvgIndividualRate", "IndividualRate", "IndividualTobaccoRate", "Copay", "Deductible"]
+
+TRUE_VALUES = {"yes", "y", "true", "1", "1.0"}
+
+# Budgeted loading: sample within these strata, never dropping one entirely
+SAMPLE_STRATA = ("StateCode", "MetalLevel")
+MIN_ROWS_PER_STRATUM = 1
+# Rows each stratum keeps while streaming, relative to its current share of the budget
+SAMPLE_OVERSAMPLE = 1.5
+
+
+class Dataset:
+    """
+    Immutable snapshot of the trimmed datasets shared by all pages and sessions
+    """
+
+    def __init__(self, plans, rates, benefits, service_areas, version, load_error=None):
+        self.plans = plans
+        self.rates = rates
+        self.benefits = benefits
+        self.service_areas = service_areas
+        self.version = version
+        self.load_error = load_error
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    @property
+    def is_sample(self):
+        return self.load_error is not None
+
+    def views(self):
+        """
+        Return shallow copies of the frames so callers can add columns freely
+        """
+        return (
+            self.plans.copy(deep=False),
+            self.rates.copy(deep=False),
+            self.benefits.copy(deep=False),
+            self.service_areas.copy(deep=False),
+        )
+
+    def derived(self, key, builder):
+        """
+        Build a structure derived from this dataset once and share it afterwards
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self)
+            return self._derived[key]
+
+
+def _to_flag(series):
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(TRUE_VALUES).astype(bool)
+
+
+def _to_float32(series):
+    if series.dtype == np.float32:
+        return series
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.strip().str.rstrip("%").str.replace(",", "", regex=False)
+    return pd.to_numeric(series, errors="coerce").astype(np.float32)
+
+
+def normalize_frame(df):
+    """
+    Convert a raw frame to the canonical schema: categoricals for low-cardinality
+    labels, bool for Yes/No flags and float32 for percentages and amounts.
+
+    Percentages keep their units, so "65.0%" becomes 65.0.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+        elif col in FLAG_COLUMNS:
+            df[col] = _to_flag(df[col])
+        elif col in PERCENT_COLUMNS or col in AMOUNT_COLUMNS:
+            df[col] = _to_float32(df[col])
+    return df
+
+
+def normalize_rates(df):
+    """
+    Normalize a rate frame, collapsing per-age rows to AvgIndividualRate per plan and state
+    """
+    df = normalize_frame(df)
+    if "AvgIndividualRate" in df.columns or "IndividualRate" not in df.columns:
+        return df
+
+    # Same reduction as filtered_rate2.py: non-tobacco, ages 18-64
+    if "Tobacco" in df.columns:
+        df = df[df["Tobacco"].astype(str).str.lower() == "no"]
+    if "Age" in df.columns:
+        df = df[pd.to_numeric(df["Age"], errors="coerce").between(18, 64)]
+    return (
+        df.groupby(["PlanId", "StateCode"], observed=True)["IndividualRate"]
+        .mean()
+        .astype(np.float32)
+        .reset_index()
+        .rename(columns={"IndividualRate": "AvgIndividualRate"})
+    )
+
+
+def normalize_frames(plans, rates, benefits, service_areas):
+    return (
+        normalize_frame(plans),
+        normalize_rates(rates),
+        normalize_frame(benefits),
+        normalize_frame(service_areas),
+    )
+
+
+def downcast_frame(df):
+    """
+    Canonical schema plus the smallest numeric dtypes and categoricals for repetitive strings
+    """
+    df = normalize_frame(df)
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == bool:
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = series.astype(np.float32)
+        elif len(series) and series.nunique(dropna=False) / len(series) < DICTIONARY_RATIO:
+            df[col] = series.astype("category")
+    return df
+
+
+def _concat_frames(frames):
+    """
+    Concatenate chunks, merging categories so categorical columns stay categorical
+    """
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 1:
+        return frames[0]
+    for col in frames[0].columns:
+        is_category = [isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames]
+        if all(is_category):
+            categories = pd.api.types.union_categoricals([frame[col] for frame in frames]).categories
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+        elif any(is_category):
+            frames = [frame.assign(**{col: frame[col].astype(object)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _stratum_ranks(strata, keys):
+    """
+    Rank of each row by random key within its stratum (0 = smallest key)
+    """
+    order = np.lexsort((keys, strata))
+    sorted_strata = strata[order]
+    starts = np.flatnonzero(np.r_[True, sorted_strata[1:] != sorted_strata[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.repeat(starts, sizes)
+    return ranks
+
+
+def _stratum_quotas(stratum_sizes, rows_per_byte_budget, reserved=0):
+    """
+    Rows each stratum may keep: its share of the budget, at least MIN_ROWS_PER_STRATUM
+    """
+    sizes = np.asarray(stratum_sizes, dtype=np.int64)
+    shares = np.maximum(sizes * rows_per_byte_budget - reserved * sizes / max(sizes.sum(), 1), 0)
+    return np.minimum(np.maximum(np.floor(shares).astype(np.int64), MIN_ROWS_PER_STRATUM), sizes)
+
+
+def load_within_budget(csv_path, budget_mb, columns=None, strata=SAMPLE_STRATA, chunksize=50000, seed=0):
+    """
+    Load a CSV into at most about budget_mb of memory.
+
+    Columns are projected and downcast first. Only if the file still does not
+    fit, a single-pass stratified sample is taken: every row draws a random key
+    and each stratum keeps its smallest keys, in proportion to its size (at
+    least MIN_ROWS_PER_STRATUM), so no state or metal level is lost the way a
+    first-N-rows read loses them. While streaming, each stratum keeps
+    SAMPLE_OVERSAMPLE times its current share, which never falls below its
+    final quota.
+
+    Returns (DataFrame, report) where report gives the footprint and sampling ratio.
+    """
+    budget = budget_mb * 1024 * 1024
+    rng = np.random.default_rng(seed)
+    usecols = (lambda col: col in columns) if columns else None
+
+    # Pruned rows so far, plus chunks read since the last prune
+    kept, keys, kept_strata = None, np.empty(0), np.empty(0, dtype=np.int64)
+    pending, pending_keys, pending_strata = [], [], []
+    pending_rows = 0
+    stratum_ids, stratum_sizes = {}, []
+    rows_read = bytes_read = 0
+    target = np.inf
+
+    def merge_pending():
+        nonlocal kept, keys, kept_strata, pending, pending_keys, pending_strata, pending_rows
+        if pending:
+            kept = _concat_frames([kept, *pending])
+            keys = np.concatenate([keys, *pending_keys])
+            kept_strata = np.concatenate([kept_strata, *pending_strata])
+            pending, pending_keys, pending_strata, pending_rows = [], [], [], 0
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, usecols=usecols, low_memory=False):
+        chunk = downcast_frame(chunk)
+        rows_read += len(chunk)
+        bytes_read += chunk.memory_usage(deep=True, index=False).sum()
+        target = max(1, budget * rows_read / bytes_read) if bytes_read else np.inf
+
+        # Stratum of each row, numbered in order of first appearance
+        present = [col for col in strata if col in chunk.columns]
+        if present:
+            codes, uniques = pd.factorize(pd.MultiIndex.from_frame(chunk[present].astype(str)))
+            ids = np.array([stratum_ids.setdefault(key, len(stratum_ids)) for key in uniques], dtype=np.int64)
+            chunk_strata = ids[codes]
+        else:
+            chunk_strata = np.zeros(len(chunk), dtype=np.int64)
+            stratum_ids.setdefault((), 0)
+        stratum_sizes.extend([0] * (len(stratum_ids) - len(stratum_sizes)))
+        for stratum, count in zip(*np.unique(chunk_strata, return_counts=True)):
+            stratum_sizes[stratum] += int(count)
+
+        pending.append(chunk)
+        pending_keys.append(rng.random(len(chunk)))
+        pending_strata.append(chunk_strata)
+        pending_rows += len(chunk)
+
+        # Over budget and the buffer has doubled: drop rows whose key can no
+        # longer make the final sample. The budget per row read only shrinks,
+        # so a stratum's share now still covers its final quota.
+        if rows_read > target and len(keys) + pending_rows > 2 * SAMPLE_OVERSAMPLE * target:
+            merge_pending()
+            limits = _stratum_quotas(stratum_sizes, SAMPLE_OVERSAMPLE * budget / bytes_read)
+            keep = _stratum_ranks(kept_strata, keys) < limits[kept_strata]
+            kept, keys, kept_strata = kept[keep].reset_index(drop=True), keys[keep], kept_strata[keep]
+
+    merge_pending()
+    if kept is None:
+        kept = pd.read_csv(csv_path, nrows=0, usecols=usecols)
+
+    sampled = bool(rows_read > target)
+    if not sampled:
+        df = downcast_frame(kept)
+        memory = df.memory_usage(deep=True, index=False).sum()
+    else:
+        # Rows guaranteed to small strata come out of everyone else's share;
+        # the sample's bytes per row differ a little from the file's, so
+        # shrink the shares until it fits
+        ranks = _stratum_ranks(kept_strata, keys)
+        rows_per_byte = budget / bytes_read
+        reserved = MIN_ROWS_PER_STRATUM * len(stratum_sizes)
+        previous = None
+        while True:
+            quotas = _stratum_quotas(stratum_sizes, rows_per_byte, reserved=reserved)
+            if previous is not None and quotas.sum() >= previous:
+                break
+            df = downcast_frame(kept[ranks < quotas[kept_strata]].reset_index(drop=True))
+            memory = df.memory_usage(deep=True, index=False).sum()
+            if memory <= budget:
+                break
+            previous = quotas.sum()
+            rows_per_byte *= 0.99 * budget / memory
+
+    memory_mb = float(memory) / (1024 * 1024)
+    return df, {
+        "rows_read": rows_read,
+        "rows_kept": len(df),
+        "sampling_ratio": len(df) / rows_read if rows_read else 1.0,
+        "sampled": sampled,
+        "strata": len(stratum_ids),
+        "memory_mb": memory_mb,
+        "budget_mb": budget_mb,
+    }
+
+
+def yes_no(value):
+    """
+    Display form of a normalized flag
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return "Yes" if value else "No"
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "N/A"
+    return value
+
+
+def snapshot_path(csv_path):
+    """
+    Location of the columnar snapshot compiled from a CSV file
+    """
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(SNAPSHOT_DIR, f"{base}.arrow")
+
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None, None
+
+
+def source_fingerprint():
+    """
+    Cheap (path, size, mtime) signature of the source files, checked on every rerun
+    """
+    fingerprint = []
+    for path in DATA_FILES.values():
+        fingerprint.append((path, *_stat(path)))
+        fingerprint.append((snapshot_path(path), *_stat(snapshot_path(path))))
+    fingerprint.append((RATE_CUBE_FILE, *_stat(RATE_CUBE_FILE)))
+    return tuple(fingerprint)
+
+
+def _content_hash(paths):
+    digest = hashlib.blake2b(digest_size=12)
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(csv_path, compression=None):
+    """
+    Compile a CSV file into a typed Arrow IPC snapshot next to the other snapshots.
+
+    Uncompressed snapshots are memory-mapped zero-copy; "lz4" or "zstd" trade
+    a decode step on load for a smaller file.
+    """
+    df = pd.read_csv(csv_path)
+    name = next((key for key, path in DATA_FILES.items() if path == csv_path), None)
+    df = normalize_rates(df) if name == "rates" else normalize_frame(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            if len(column) and pc.count_distinct(column).as_py() / len(column) < DICTIONARY_RATIO:
+                column = column.dictionary_encode()
+        columns.append(column)
+    table = pa.Table.from_arrays(columns, names=table.column_names)
+
+    size, mtime_ns = _stat(csv_path)
+    table = table.replace_schema_metadata({
+        "source_path": csv_path,
+        "source_size": str(size),
+        "source_mtime_ns": str(mtime_ns),
+        "source_hash": _content_hash([csv_path]),
+    })
+
+    out_path = snapshot_path(csv_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    tmp_path = out_path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, out_path)
+    return out_path, table.num_rows
+
+
+class _HashingReader:
+    """
+    File wrapper hashing the bytes as a parser reads them, like _content_hash
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._digest = hashlib.blake2b(digest_size=12)
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._digest.update(data)
+        return data
+
+    def hexdigest(self):
+        # Whatever the parser left unread still counts
+        for block in iter(lambda: self.read(1 << 20), b""):
+            pass
+        return self._digest.hexdigest()
+
+
+def _read_csv_hashed(csv_path):
+    """
+    Parse a CSV file and hash its content in the same read
+    """
+    with open(csv_path, "rb") as f:
+        reader = _HashingReader(f)
+        df = pd.read_csv(reader)
+        return df, reader.hexdigest()
+
+
+def _verified_path(csv_path):
+    return snapshot_path(csv_path) + ".verified"
+
+
+def _mark_verified(csv_path, source_hash):
+    """
+    Remember that the CSV's current stat has the snapshot's content, so a
+    touched file is hashed once rather than on every load
+    """
+    size, mtime_ns = _stat(csv_path)
+    path = _verified_path(csv_path)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"size": size, "mtime_ns": mtime_ns, "source_hash": source_hash}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _open_snapshot(csv_path):
+    """
+    The snapshot table for a CSV file, its metadata and whether the CSV's stat
+    still matches it, or None if there is no snapshot or the size changed
+    """
+    path = snapshot_path(csv_path)
+    if pa is None or not os.path.exists(path):
+        return None
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+
+    size, mtime_ns = _stat(csv_path)
+    if size is None:
+        return table, metadata, True
+    if str(size) != metadata.get("source_size"):
+        return None
+    if str(mtime_ns) == metadata.get("source_mtime_ns"):
+        return table, metadata, True
+    try:
+        with open(_verified_path(csv_path)) as f:
+            verified = json.load(f)
+    except (OSError, ValueError):
+        verified = {}
+    fresh = (verified.get("size"), verified.get("mtime_ns"), verified.get("source_hash")) == (
+        size, mtime_ns, metadata.get("source_hash"))
+    return table, metadata, fresh
+
+
+def _snapshot_frame(table):
+    # Numeric columns without nulls stay backed by the mapped file
+    return table.to_pandas(split_blocks=True)
+
+
+def read_snapshot(csv_path):
+    """
+    Memory-map the snapshot for a CSV file if it is present and up to date.
+
+    A CSV edited after the build makes the snapshot stale. A changed mtime alone
+    (touch, git checkout) is settled by the content hash, as build.py does.
+
+    Returns (DataFrame, source_hash), or None when the CSV should be parsed instead.
+    """
+    opened = _open_snapshot(csv_path)
+    if opened is None:
+        return None
+    table, metadata, fresh = opened
+    if not fresh:
+        if _content_hash([csv_path]) != metadata.get("source_hash"):
+            return None
+        _mark_verified(csv_path, metadata.get("source_hash"))
+    return _snapshot_frame(table), metadata.get("source_hash", "")
+
+
+def _read_source(csv_path):
+    opened = _open_snapshot(csv_path)
+    if opened is not None and opened[2]:
+        return _snapshot_frame(opened[0]), opened[1].get("source_hash", "")
+
+    # Parse and hash in one read; a touched CSV whose content still matches
+    # the snapshot keeps using the snapshot
+    df, source_hash = _read_csv_hashed(csv_path)
+    if opened is not None and source_hash == opened[1].get("source_hash"):
+        _mark_verified(csv_path, source_hash)
+        return _snapshot_frame(opened[0]), source_hash
+    return df, source_hash
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_dataset(fingerprint):
+    try:
+        frames = {}
+        hashes = []
+        for name, path in DATA_FILES.items():
+            frames[name], source_hash = _read_source(path)
+            hashes.append(source_hash)
+        version = hashlib.blake2b("".join(hashes).encode(), digest_size=12).hexdigest()
+        return Dataset(*normalize_frames(**frames), version=version)
+    except Exception as e:
+        frames = normalize_frames(*create_sample_data())
+        return Dataset(*frames, version="sample", load_error=e)
+
+
+def get_dataset():
+    """
+    Return the process-wide dataset, reloading only when a source file changed
+    """
+    return _load_dataset(source_fingerprint())
+
+
+def create_sample_data():
+    """
+    Create sample data for demonstration when real data is not available
+    """
+    np.random.seed(42)
+
+    # Insurance company names for realistic plan names
+    companies = [
+        "Blue Cross", "Aetna", "Cigna", "UnitedHealth", "Kaiser", "Humana",
+        "Anthem", "Molina", "Centene", "WellCare", "Ambetter", "Oscar"
+    ]
+
+    suffixes = [
+        "Select", "Premier", "Advantage", "Complete", "Essential", "Basic",
+        "Standard", "Premium", "Plus", "Choice", "Flex", "Smart", "Value"
+    ]
+
+    # Generate realistic plan names
+    plan_names = []
+    for i in range(1000):
+        company = np.random.choice(companies)
+        metal_level = np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'])
+        suffix = np.random.choice(suffixes)
+        plan_name = f"{company} {metal_level} {suffix}"
+        plan_names.append(plan_name)
+
+    # Sample plans with realistic names
+    plans_df = pd.DataFrame({
+        'PlanId': range(1, 1001),
+        'PlanMarketingName': plan_names,
+        'MetalLevel': np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'], 1000),
+        'PlanType': np.random.choice(['HMO', 'PPO', 'EPO'], 1000),
+        'WellnessProgramOffered': np.random.choice(['Yes', 'No'], 1000),
+        'DiseaseManagementProgramsOffered': np.random.choice(['Yes', 'No'], 1000),
+        'IsNoticeRequiredForPregnancy': np.random.choice(['Yes', 'No'], 1000),
+        'ChildOnlyOffering': np.random.choice(['Yes', 'No'], 1000),
+        'MarketCoverage': np.random.choice(['Individual', 'Family', 'Child-only'], 1000),
+        'IsHSAEligible': np.random.choice(['Yes', 'No'], 1000),
+        'DentalOnlyPlan': np.random.choice(['Yes', 'No'], 1000)
+    })
+
+    # Sample rates
+    rates_df = pd.DataFrame({
+        'PlanId': np.random.choice(range(1, 1001), 5000),
+        'Age': np.random.randint(18, 65, 5000),
+        'IndividualRate': np.random.uniform(200, 800, 5000),
+        'StateCode': np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL'], 5000),
+        'Tobacco': np.random.choice(['Yes', 'No'], 5000)
+    })
+
+    # Sample benefits
+    benefits_df = pd.DataFrame({
+        'PlanId': np.random.choice(range(1, 1001), 3000),
+        'BenefitName': np.random.choice(['Primary Care', 'Specialist', 'Emergency', 'Prescription', 'Dental', 'Vision'], 3000),
+        'Copay': np.random.uniform(10, 50, 3000),
+        'Deductible': np.random.uniform(500, 5000, 3000)
+    })
+
+    # Sample service areas
+    service_areas_df = pd.DataFrame({
+        'StateCode': np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL'], 1000),
+        'ServiceAreaId': [f"{state}S001" for state in np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL'], 1000)],
+        'CoverEntireState': np.random.choice(['Yes', 'No'], 1000),
+        'County': np.random.randint(10000, 99999, 1000),
+        'ZipCodes': [f"{np.random.randint(10000, 99999)}" for _ in range(1000)]
+    })
+
+    return plans_df, rates_df, benefits_df, service_areas_df
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Parallel streaming ETL for the raw CMS files.
+
+Each stage streams its input with Arrow's multithreaded CSV reader, filters
+blocks in a process pool and writes zstd-compressed Parquet partitioned by
+StateCode (data/<stage>/StateCode=XX/part-NNNNN.parquet). The column lists
+and required columns come from the matching trim_*.py script. build.py runs
+the stages, and filtered_rate2.py and filtered_services.py read the output
+back with read_stage().
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as pds
+import pyarrow.parquet as pq
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import trim_benefits
+import trim_business_rules
+import trim_rate
+import trim_service
+
+STAGES = {
+    "benefits": trim_benefits,
+    "rate": trim_rate,
+    "service": trim_service,
+    "business_rules": trim_business_rules,
+}
+
+OUTPUT_DIR = "data"
+PARTITION_COLUMN = "StateCode"
+UNKNOWN_PARTITION = "unknown"
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and its finished workers, in MB
+    """
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / divisor
+
+
+def read_header(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f))
+
+
+def open_batches(path, columns, block_size_mb):
+    """
+    Stream record batches of the selected columns, parsed on Arrow's thread pool
+    """
+    # Reading everything as text keeps block-by-block type inference from
+    # disagreeing between early and late blocks; numbers are cast per chunk.
+    return pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(use_threads=True, block_size=block_size_mb << 20),
+        convert_options=pv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in columns},
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def process_chunk(batch, chunk_no, stage_dir, required, numeric):
+    """
+    Drop invalid rows, cast numeric columns and write one Parquet file per state.
+
+    Runs in a worker process; returns the number of rows written.
+    """
+    table = pa.Table.from_batches([batch])
+
+    keep = None
+    for col in required:
+        if col in table.column_names:
+            valid = pc.and_(pc.is_valid(table[col]), pc.not_equal(pc.utf8_trim_whitespace(table[col]), ""))
+            keep = valid if keep is None else pc.and_(keep, valid)
+    if keep is not None:
+        table = table.filter(pc.fill_null(keep, False))
+
+    for col in numeric:
+        if col in table.column_names:
+            cleaned = pc.replace_substring_regex(table[col], r"[$,\s]", "")
+            parsed = pc.if_else(pc.match_substring_regex(cleaned, r"^-?\d+(\.\d+)?$"), cleaned, None)
+            table = table.set_column(table.column_names.index(col), col, pc.cast(parsed, pa.float64()))
+
+    if PARTITION_COLUMN in table.column_names:
+        states = pc.fill_null(table[PARTITION_COLUMN], UNKNOWN_PARTITION)
+        table = table.drop_columns([PARTITION_COLUMN])
+    else:
+        states = pa.array([UNKNOWN_PARTITION] * table.num_rows)
+
+    for state in pc.unique(states).to_pylist():
+        part = table.filter(pc.equal(states, state))
+        part_dir = os.path.join(stage_dir, f"{PARTITION_COLUMN}={state}")
+        os.makedirs(part_dir, exist_ok=True)
+        pq.write_table(part, os.path.join(part_dir, f"part-{chunk_no:05d}.parquet"), compression="zstd")
+
+    return table.num_rows
+
+
+def stage_output(name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, name)
+
+
+def run_stage(name, workers, block_size_mb, output_dir=OUTPUT_DIR):
+    """
+    Run one stage end to end and return its throughput report
+    """
+    spec = STAGES[name]
+    header = read_header(spec.input_path)
+    columns = [col for col in spec.columns_to_keep if col in header]
+    required = [col for col in spec.required_columns if col in columns]
+    numeric = [col for col in getattr(spec, "numeric_columns", []) if col in columns]
+
+    # Build into a scratch directory so a failed run never leaves half a dataset
+    stage_dir = stage_output(name, output_dir)
+    tmp_dir = stage_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    start = time.perf_counter()
+    rows_in = rows_out = 0
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk_no, batch in enumerate(open_batches(spec.input_path, columns, block_size_mb)):
+            rows_in += batch.num_rows
+            pending.add(pool.submit(process_chunk, batch, chunk_no, tmp_dir, required, numeric))
+
+            # Bound memory: never hold more than a couple of blocks per worker
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                rows_out += sum(f.result() for f in done)
+
+        rows_out += sum(f.result() for f in pending)
+
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    os.replace(tmp_dir, stage_dir)
+
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(spec.input_path) / (1024 * 1024)
+    return {
+        "stage": name,
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "seconds": elapsed,
+        "rows_per_s": rows_in / elapsed if elapsed else float("nan"),
+        "mb_per_s": size_mb / elapsed if elapsed else float("nan"),
+        "peak_rss_mb": peak_rss_mb(),
+        "output": stage_dir,
+    }
+
+
+def read_stage(name, columns=None, batch_rows=100000, output_dir=OUTPUT_DIR):
+    """
+    Stream a stage's Parquet output back as DataFrame chunks, StateCode restored
+    from the partition directories (missing where the source had none)
+    """
+    partitioning = pds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+    dataset = pds.dataset(stage_output(name, output_dir), format="parquet", partitioning=partitioning)
+    if columns is not None:
+        columns = [col for col in columns if col in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_rows):
+        chunk = batch.to_pandas()
+        if PARTITION_COLUMN in chunk.columns:
+            chunk[PARTITION_COLUMN] = chunk[PARTITION_COLUMN].mask(chunk[PARTITION_COLUMN] == UNKNOWN_PARTITION)
+        yield chunk
+
+
+def print_report(report):
+    print(
+        f"✅ {report['stage']:<15} {report['rows_in']:>12,} rows in  {report['rows_out']:>12,} rows out  "
+        f"{report['seconds']:7.1f}s  {report['rows_per_s']:>12,.0f} rows/s  "
+        f"{report['mb_per_s']:7.1f} MB/s  peak RSS {report['peak_rss_mb']:,.0f} MB  → {report['output']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream the raw CMS files into partitioned Parquet")
+    parser.add_argument("stages", nargs="*", help=f"stages to run: {', '.join(STAGES)} (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--block-size", type=int, default=64, help="CSV block size in MB")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    for name in args.stages or list(STAGES):
+        if not os.path.exists(STAGES[name].input_path):
+            print(f"⚠️ Skipping {name}: {STAGES[name].input_path} not found")
+            continue
+        print_report(run_stage(name, args.workers, args.block_size, args.output_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini REST API, for running and load-testing the chat offline.
+
+Serves generateContent and streamGenerateContent (SSE) with configurable
+latency and injected faults. Start it, then run the app against it:
+
+    python fake_gemini_server.py --latency 0.8 --error-rate 0.05
+    GEMINI_API_BASE=http://localhost:8765 GOOGLE_API_KEY=fake streamlit run Home.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTE = re.compile(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$")
+
+DEFAULTS = {
+    "latency": 0.5,          # seconds before the first token
+    "jitter": 0.2,           # +/- uniform noise on latency
+    "token_delay": 0.03,     # seconds between streamed pieces
+    "error_rate": 0.0,       # share of requests answered with 503
+    "rate_limit_rate": 0.0,  # share answered with 429 and Retry-After
+    "stall_rate": 0.0,       # share that wait stall_seconds first (tail latency)
+    "stall_seconds": 10.0,
+}
+
+
+def make_answer(prompt):
+    question = " ".join(prompt.split("User:")[-1].split())[:120]
+    return (
+        f"(Simulated answer) You asked: \"{question}\". A Silver plan usually balances premium "
+        "and deductible well; compare HMO and PPO networks, check that your doctors are in-network, "
+        "and look at the out-of-pocket maximum before you enroll."
+    )
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = DEFAULTS
+    counters = {"requests": 0, "errors": 0, "rate_limited": 0, "stalled": 0}
+    lock = threading.Lock()
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": {"code": status, "message": message}}, headers)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        try:
+            self._answer()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (deadline, or a hedged request that lost the race)
+            self.close_connection = True
+
+    def _answer(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        match = ROUTE.match(self.path.split("?")[0])
+        if not match:
+            self._send_error(404, f"Unknown path {self.path}")
+            return
+        self._count("requests")
+        if not self.headers.get("x-goog-api-key"):
+            self._send_error(403, "Method doesn't allow unregistered callers. Please use an API key.")
+            return
+
+        config = self.config
+        roll = random.random()
+        if roll < config["error_rate"]:
+            self._count("errors")
+            self._send_error(503, "The model is overloaded. Please try again later.")
+            return
+        if roll < config["error_rate"] + config["rate_limit_rate"]:
+            self._count("rate_limited")
+            self._send_error(429, "Resource has been exhausted.", {"Retry-After": "1"})
+            return
+        if random.random() < config["stall_rate"]:
+            self._count("stalled")
+            time.sleep(config["stall_seconds"])
+
+        try:
+            prompt = json.loads(body)["contents"][-1]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send_error(400, "Invalid request body")
+            return
+
+        time.sleep(max(0.0, config["latency"] + random.uniform(-config["jitter"], config["jitter"])))
+        answer = make_answer(prompt)
+
+        if match.group(2) == "generateContent":
+            self._send_json(200, {"candidates": [{"content": {"role": "model", "parts": [{"text": answer}]}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = answer.split(" ")
+        for i in range(0, len(words), 4):
+            piece = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+            event = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            time.sleep(config["token_delay"])
+        self._write_chunk(b"")
+
+
+def start_server(host="127.0.0.1", port=8765, verbose=False, **config):
+    """
+    Serve in a background thread and return the server (call shutdown() to stop)
+    """
+    handler = type("Handler", (FakeGeminiHandler,), {
+        "config": {**DEFAULTS, **config},
+        "counters": dict(FakeGeminiHandler.counters),
+        "verbose": verbose,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini API with latency and fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for name, value in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    config = {name: getattr(args, name) for name in DEFAULTS}
+    server = start_server(args.host, args.port, args.verbose, **config)
+    print(f"🤖 Fake Gemini API on http://{args.host}:{server.server_port} {config}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"✅ Served {server.RequestHandlerClass.counters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,70 @@
-import pandas as pd
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
-# Load existing file
-df = pd.read_csv("filtered_rate.csv")
+from rate_cube import RateAccumulator
+from data_store import RATE_CUBE_FILE
+from etl import read_stage
 
-# Convert Age to numeric
-df["Age"] = pd.to_numeric(df["Age"], errors="coerce")
-df = df.dropna(subset=["Age"])
+output_path = "filtered_rate2.csv"
+stats_path = "filtered_rate2_stats.csv"
 
-# Filter valid age range
-df = df[df["Age"].between(18, 64)]
+rate_columns = ["PlanId", "StateCode", "Age", "Tobacco", "IndividualRate", "IndividualTobaccoRate"]
 
-# Keep only non-tobacco for simplicity
-df = df[df["Tobacco"].str.lower() == "no"]
 
-# Drop rows without rate info
-df = df.dropna(subset=["IndividualRate"])
+def read_chunks(chunksize):
+    """
+    Stream the rate stage of etl.py, only the columns the aggregation needs
+    """
+    return read_stage("rate", rate_columns, chunksize)
 
-# Average rate per PlanId and State
-avg_rates = (
-    df.groupby(["PlanId", "StateCode"])["IndividualRate"]
-    .mean()
-    .reset_index()
-    .rename(columns={"IndividualRate": "AvgIndividualRate"})
-)
 
-# Save cleaned and compressed rate file
-avg_rates.to_csv("filtered_rate2.csv", index=False)
-print("✅ Super-trimmed: filtered_rate2.csv")
+def aggregate_chunk(chunk):
+    return RateAccumulator().add(chunk)
+
+
+def aggregate(chunksize, workers):
+    """
+    One pass over the rate file; partial totals from workers are merged as they finish
+    """
+    totals = RateAccumulator()
+    if workers <= 1:
+        for chunk in read_chunks(chunksize):
+            totals.add(chunk)
+        return totals
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in read_chunks(chunksize):
+            pending.add(pool.submit(aggregate_chunk, chunk))
+            # Bound memory: never hold more than a couple of chunks per worker
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    totals.merge(future.result())
+        for future in pending:
+            totals.merge(future.result())
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Average rates per plan and state in one streaming pass")
+    parser.add_argument("--chunksize", type=int, default=100000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="processes aggregating chunks in parallel")
+    args = parser.parse_args()
+
+    totals = aggregate(args.chunksize, args.workers)
+
+    # Keep per-age, per-tobacco rates for personalized quotes
+    cube = totals.to_cube()
+    cube.save(RATE_CUBE_FILE)
+    print(f"✅ Rate cube: {RATE_CUBE_FILE} ({len(cube):,} plan/state pairs)")
+
+    # Average non-tobacco rate for ages 18-64 per PlanId and State
+    avg_rates = totals.averages()
+    avg_rates.to_csv(output_path, index=False)
+    print(f"✅ Super-trimmed: {output_path}")
+
+    # Spread of each plan's rates across ages, from the same pass
+    stats = totals.summary()
+    stats.to_csv(stats_path, index=False)
+    print(f"✅ Rate summary: {stats_path} (median rate {stats['P50IndividualRate'].median():,.2f})")
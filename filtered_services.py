@@ -1,13 +1,16 @@
 import pandas as pd
 
-# Load service area file
-df = pd.read_csv("filtered_service_area.csv", low_memory=False)
+from data_store import DATA_FILES
+from etl import read_stage
 
+# The columns the app reads, in its order; County and ZipCodes back the ZIP/county lookups
 keep_cols = [
-    "ServiceAreaId", "StateCode", "CoverEntireState"
+    "StateCode", "ServiceAreaId", "CoverEntireState", "County", "ZipCodes"
 ]
+output_path = DATA_FILES["service_areas"]
 
-df = df[keep_cols]
+# Load the service stage of etl.py
+df = pd.concat(read_stage("service", keep_cols), ignore_index=True)[keep_cols]
 
 # Drop rows missing ServiceAreaId
 df.dropna(subset=["ServiceAreaId"], inplace=True)
@@ -16,5 +19,5 @@ df.dropna(subset=["ServiceAreaId"], inplace=True)
 df.drop_duplicates(inplace=True)
 
 # Save cleaned file
-df.to_csv("filtered_service_area2.csv", index=False)
-print("✅ Cleaned: filtered_service_area_clean.csv")
+df.to_csv(output_path, index=False)
+print(f"✅ Cleaned: {output_path}")
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# On-disk store shared by all sessions and restarts
+LLM_CACHE_FILE = os.getenv("HAVENLY_LLM_CACHE_FILE", "llm_cache.sqlite3")
+# Seconds before a cached answer is asked again
+LLM_CACHE_TTL = float(os.getenv("HAVENLY_LLM_CACHE_TTL", str(24 * 60 * 60)))
+# Answers kept on disk; the least recently used are evicted beyond this
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("HAVENLY_LLM_CACHE_MAX_ENTRIES", "5000"))
+# Answers kept in process memory in front of SQLite
+LLM_CACHE_MEMORY_ENTRIES = 256
+# Memory hits whose last_used is written to SQLite in one batch
+LLM_CACHE_TOUCH_BATCH = 32
+
+
+def normalize_prompt(prompt):
+    """
+    Fold trivially different prompts together: case, whitespace and trailing punctuation
+    """
+    text = re.sub(r"\s+", " ", str(prompt)).strip().lower()
+    return text.rstrip(" ?!.")
+
+
+def cache_key(prompt, model_name, prompt_version):
+    payload = json.dumps([normalize_prompt(prompt), model_name, prompt_version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM answers by cache key: an in-memory LRU in front of a SQLite table.
+
+    Entries expire after ttl seconds; the table keeps at most max_entries
+    rows, evicting the least recently used. Memory hits update last_used in
+    batches, always before an eviction, so hot answers are not evicted first.
+    Hit and miss counts are kept per process for stats().
+    """
+
+    def __init__(self, path=LLM_CACHE_FILE, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 memory_entries=LLM_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, prompt TEXT, response TEXT, "
+            "created REAL, expires REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def _remember(self, key, response, expires):
+        self._memory[key] = (response, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Cached answer for a key, or None if missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    self._touched[key] = now
+                    if len(self._touched) >= LLM_CACHE_TOUCH_BATCH:
+                        self._flush_touched()
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._db.execute("SELECT response, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self.counters["disk_hits"] += 1
+            return row[0]
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def put(self, key, response, model_name="", prompt=""):
+        """
+        Cache an answer; empty answers are not cached
+        """
+        if not response or not response.strip():
+            return
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            self._remember(key, response, expires)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, normalize_prompt(prompt), response, now, expires, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._flush_touched()
+        self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.counters["evictions"] += cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Process-wide response cache, opened on first use
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,286 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Gemini REST endpoint; point at fake_gemini_server.py to run offline
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+# Deadline for a whole call, retries and streaming included, in seconds
+LLM_TIMEOUT = float(os.getenv("HAVENLY_LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = 5.0
+LLM_MAX_RETRIES = int(os.getenv("HAVENLY_LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE, LLM_BACKOFF_MAX = 0.5, 8.0
+# Send a second identical request if the first has not answered after this many seconds (0 disables)
+LLM_HEDGE_AFTER = float(os.getenv("HAVENLY_LLM_HEDGE_AFTER", "0"))
+# Requests in flight across all sessions of this process, hedges included
+LLM_MAX_CONCURRENCY = int(os.getenv("HAVENLY_LLM_MAX_CONCURRENCY", "8"))
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(LLMError):
+    def __init__(self, message="LLM call deadline exceeded"):
+        super().__init__(message)
+
+
+class Chunk:
+    """
+    A piece of generated text, shaped like the SDK's response objects
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+
+def _payload_text(payload):
+    candidates = payload.get("candidates") or []
+    if not candidates:
+        reason = (payload.get("promptFeedback") or {}).get("blockReason")
+        if reason:
+            raise LLMError(f"Prompt blocked: {reason}")
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _http_error(response):
+    try:
+        message = response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        message = response.text[:200]
+    retry_after = response.headers.get("Retry-After")
+    return LLMError(
+        f"HTTP {response.status_code}: {message}",
+        retryable=response.status_code in RETRY_STATUSES,
+        retry_after=float(retry_after) if retry_after and retry_after.replace(".", "", 1).isdigit() else None,
+    )
+
+
+def _sse_payloads(response):
+    response.encoding = "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield json.loads(line[5:].strip())
+
+
+class _OpenResponse:
+    """
+    An HTTP response that holds a concurrency slot until it is read to the end or closed
+    """
+
+    def __init__(self, response, payloads, release, deadline):
+        self.response = response
+        self.payloads = payloads
+        self.release = release
+        self.deadline = deadline
+        self.first = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def prime(self):
+        # For a stream this waits for the first token, which is what hedging races on
+        self.first = next(self.payloads, None)
+
+    def __iter__(self):
+        try:
+            if self.first is not None:
+                yield self.first
+            for payload in self.payloads:
+                if time.monotonic() > self.deadline:
+                    raise DeadlineExceeded()
+                yield payload
+        except requests.RequestException as e:
+            raise LLMError(f"Stream interrupted ({type(e).__name__})") from e
+        finally:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.response.close()
+        self.release()
+
+
+def _discard(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class GeminiClient:
+    """
+    Gemini REST client shared by every session in the process.
+
+    One pooled HTTP session, a global limit on requests in flight, a deadline
+    per call, retries with jittered exponential backoff on transient errors
+    and, optionally, a hedged second request when the first is slow to answer.
+    generate_content() mirrors the SDK method the chat code calls.
+    """
+
+    def __init__(self, api_key, model_name, base_url=GEMINI_API_BASE, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, hedge_after=LLM_HEDGE_AFTER, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.max_concurrency = max_concurrency
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=2 * max_concurrency, thread_name_prefix="llm")
+
+        self.counters = {"calls": 0, "requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "errors": 0}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._counter_lock:
+            return dict(self.counters)
+
+    def _url(self, method):
+        return f"{self.base_url}/v1beta/models/{self.model_name}:{method}"
+
+    def _acquire(self, deadline):
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise DeadlineExceeded("No free LLM slot before the deadline")
+
+    def _request(self, method, body, deadline, stream, slot_held=False):
+        """
+        One HTTP attempt, returned open and primed with its first payload
+        """
+        if not slot_held:
+            self._acquire(deadline)
+        self._count("requests")
+
+        response = None
+        opened = False
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded()
+            # The key travels in a header so it never appears in a URL or an error message
+            params = {"alt": "sse"} if stream else {}
+            response = self.session.post(
+                self._url(method), params=params, headers={"x-goog-api-key": self.api_key}, json=body, stream=stream,
+                timeout=(min(LLM_CONNECT_TIMEOUT, remaining), remaining),
+            )
+            if response.status_code != 200:
+                raise _http_error(response)
+
+            payloads = _sse_payloads(response) if stream else iter([response.json()])
+            result = _OpenResponse(response, payloads, self._slots.release, deadline)
+            result.prime()
+            opened = True
+            return result
+        except requests.Timeout as e:
+            raise LLMError(f"Request timed out ({type(e).__name__})", retryable=True) from e
+        except requests.ConnectionError as e:
+            raise LLMError(f"Connection failed ({type(e).__name__})", retryable=True) from e
+        finally:
+            if not opened:
+                if response is not None:
+                    response.close()
+                self._slots.release()
+
+    def _hedged(self, method, body, deadline, stream):
+        """
+        Race a second request against a slow first one and keep whichever answers first
+        """
+        if not self.hedge_after:
+            return self._request(method, body, deadline, stream)
+
+        # The hedge timer starts once the first request is actually on the wire
+        self._acquire(deadline)
+        first = self._executor.submit(self._request, method, body, deadline, stream, True)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        # Only hedge with spare capacity; when saturated a duplicate would just queue
+        while not self._slots.acquire(blocking=False):
+            done, _ = wait([first], timeout=min(0.05, max(0.0, deadline - time.monotonic())))
+            if done or time.monotonic() >= deadline:
+                return first.result()
+        self._count("hedges")
+        second = self._executor.submit(self._request, method, body, deadline, stream, True)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            winner = None
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif winner is None:
+                    winner = future
+                else:
+                    future.result().close()
+            if winner is not None:
+                if winner is second:
+                    self._count("hedge_wins")
+                for future in pending:
+                    future.add_done_callback(_discard)
+                return winner.result()
+
+        for future in pending:
+            future.add_done_callback(_discard)
+        raise error or DeadlineExceeded()
+
+    def _open(self, method, body, stream, timeout):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._hedged(method, body, deadline, stream)
+            except LLMError as e:
+                delay = e.retry_after
+                if delay is None:
+                    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                if not e.retryable or attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(delay)
+
+    def generate_content(self, prompt, stream=False, timeout=None):
+        """
+        Generate a reply; with stream=True, an iterator of Chunks as tokens arrive
+        """
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if stream:
+            return self._stream(body, timeout)
+        response = self._open("generateContent", body, False, timeout)
+        return Chunk("".join(_payload_text(payload) for payload in response))
+
+    def _stream(self, body, timeout):
+        # Retries and hedges only happen before the first token; a stream
+        # that breaks midway is reported rather than replayed
+        response = self._open("streamGenerateContent", body, True, timeout)
+        try:
+            for payload in response:
+                yield Chunk(_payload_text(payload))
+        finally:
+            response.close()
@@ -7,6 +7,9 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 from utils import load_trimmed_data, create_sample_data
+from plan_cube import get_plan_cube
+from charts import show_cached_chart
+from data_store import get_dataset
 
 st.set_page_config(page_title="Dashboard - Havenly", layout="wide")
 
@@ -72,24 +75,36 @@ with st.sidebar:
         ["Last 30 days", "Last 3 months", "Last 6 months", "Last year", "All time"]
     )
     
+    # Filter options and every chart below come from the pre-aggregated cube
+    dataset = get_dataset()
+    data_version = dataset.version
+    cube = get_plan_cube(dataset)
+
     # State filter
-    states = ["All States"] + sorted(rates_df['StateCode'].unique().tolist())
+    states = ["All States"] + cube.labels["StateCode"]
     selected_state = st.selectbox("State", states)
     
     # Metal level filter
-    metal_levels = ["All Levels"] + sorted(plans_df['MetalLevel'].unique().tolist())
+    metal_levels = ["All Levels"] + cube.labels["MetalLevel"]
     selected_metal = st.selectbox("Metal Level", metal_levels)
     
     # Plan type filter
-    plan_types = ["All Types"] + sorted(plans_df['PlanType'].unique().tolist())
+    plan_types = ["All Types"] + cube.labels["PlanType"]
     selected_plan_type = st.selectbox("Plan Type", plan_types)
+
+    filters = {
+        "StateCode": None if selected_state == "All States" else selected_state,
+        "MetalLevel": None if selected_metal == "All Levels" else selected_metal,
+        "PlanType": None if selected_plan_type == "All Types" else selected_plan_type,
+    }
+    premium_stats = cube.premium_stats(**filters)
     
     st.markdown("---")
     
     # Quick stats
     st.markdown("## 📈 Quick Stats")
-    st.metric("Total Plans", f"{len(plans_df):,}")
-    st.metric("Avg Premium", f"₹{rates_df['AvgIndividualRate'].mean():.0f}/month")
+    st.metric("Total Plans", f"{cube.plan_total(**filters):,}")
+    st.metric("Avg Premium", f"₹{premium_stats['mean']:.0f}/month" if premium_stats["count"] else "N/A")
     st.metric("Coverage Score", "92%")
 
 # Main dashboard content
@@ -142,33 +157,41 @@ with tab1:
     
     with col1:
         # Plan distribution by metal level
-        metal_counts = plans_df['MetalLevel'].value_counts()
-        fig_metal = px.pie(
-            values=metal_counts.values,
-            names=metal_counts.index,
-            title="Plan Distribution by Metal Level",
-            color_discrete_map={
-                'Bronze': '#8B4513',
-                'Silver': '#A0522D',
-                'Gold': '#DAA520',
-                'Platinum': '#B8860B'
-            }
-        )
-        fig_metal.update_layout(height=400)
-        st.plotly_chart(fig_metal, use_container_width=True)
+        def metal_chart():
+            metal_counts = cube.plans_by("MetalLevel", **filters)
+            fig_metal = px.pie(
+                values=metal_counts.values,
+                names=metal_counts.index,
+                title="Plan Distribution by Metal Level",
+                color_discrete_map={
+                    'Bronze': '#8B4513',
+                    'Silver': '#A0522D',
+                    'Gold': '#DAA520',
+                    'Platinum': '#B8860B'
+                }
+            )
+            fig_metal.update_layout(height=400)
+            return fig_metal
+
+        show_cached_chart("dashboard_metal", filters, data_version, metal_chart)
     
     with col2:
         # Premium distribution
         try:
-            fig_premium = px.histogram(
-                rates_df,
-                x='AvgIndividualRate',
-                nbins=20,
-                title="Premium Distribution",
-                color_discrete_sequence=['#8B4513']
-            )
-            fig_premium.update_layout(height=400, xaxis_title="Monthly Premium (₹)", yaxis_title="Number of Plans")
-            st.plotly_chart(fig_premium, use_container_width=True)
+            # Binned when the cube was built; only the bar heights reach the browser
+            def premium_chart():
+                bin_counts, bin_edges = cube.histogram(**filters)
+                fig_premium = px.bar(
+                    x=(bin_edges[:-1] + bin_edges[1:]) / 2,
+                    y=bin_counts,
+                    title="Premium Distribution",
+                    color_discrete_sequence=['#8B4513']
+                )
+                fig_premium.update_traces(width=np.diff(bin_edges))
+                fig_premium.update_layout(height=400, bargap=0, xaxis_title="Monthly Premium (₹)", yaxis_title="Number of Plans")
+                return fig_premium
+
+            show_cached_chart("dashboard_premium", filters, data_version, premium_chart)
         except Exception as e:
             st.warning(f"Could not generate premium chart: {e}")
 
@@ -177,27 +200,33 @@ with tab1:
     
     with col1:
         # Plan types
-        plan_type_counts = plans_df['PlanType'].value_counts()
-        fig_plan_type = px.bar(
-            x=plan_type_counts.index,
-            y=plan_type_counts.values,
-            title="Plan Types Distribution",
-            color_discrete_sequence=['#228B22']
-        )
-        fig_plan_type.update_layout(height=400, xaxis_title="Plan Type", yaxis_title="Number of Plans")
-        st.plotly_chart(fig_plan_type, use_container_width=True)
+        def plan_type_chart():
+            plan_type_counts = cube.plans_by("PlanType", **filters)
+            fig_plan_type = px.bar(
+                x=plan_type_counts.index,
+                y=plan_type_counts.values,
+                title="Plan Types Distribution",
+                color_discrete_sequence=['#228B22']
+            )
+            fig_plan_type.update_layout(height=400, xaxis_title="Plan Type", yaxis_title="Number of Plans")
+            return fig_plan_type
+
+        show_cached_chart("dashboard_plan_type", filters, data_version, plan_type_chart)
     
     with col2:
         # State distribution
-        state_counts = rates_df['StateCode'].value_counts().head(10)
-        fig_state = px.bar(
-            x=state_counts.index,
-            y=state_counts.values,
-            title="Top 10 States by Plan Availability",
-            color_discrete_sequence=['#8B4513']
-        )
-        fig_state.update_layout(height=400, xaxis_title="State", yaxis_title="Number of Plans")
-        st.plotly_chart(fig_state, use_container_width=True)
+        def state_chart():
+            state_counts = cube.rates_by("StateCode", **filters).head(10)
+            fig_state = px.bar(
+                x=state_counts.index,
+                y=state_counts.values,
+                title="Top 10 States by Plan Availability",
+                color_discrete_sequence=['#8B4513']
+            )
+            fig_state.update_layout(height=400, xaxis_title="State", yaxis_title="Number of Plans")
+            return fig_state
+
+        show_cached_chart("dashboard_state", filters, data_version, state_chart)
 
 with tab2:
     st.markdown("## 💰 Financial Overview")
@@ -206,32 +235,38 @@ with tab2:
     
     with col1:
         # Monthly premium trend
-        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
-        premiums = [320, 325, 318, 322, 320, 320]
-        
-        fig_trend = px.line(
-            x=months,
-            y=premiums,
-            title="Monthly Premium Trend",
-            markers=True
-        )
-        fig_trend.update_layout(height=400, xaxis_title="Month", yaxis_title="Premium (₹)")
-        fig_trend.update_traces(line_color='#8B4513', marker_color='#228B22')
-        st.plotly_chart(fig_trend, use_container_width=True)
+        def trend_chart():
+            months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
+            premiums = [320, 325, 318, 322, 320, 320]
+            
+            fig_trend = px.line(
+                x=months,
+                y=premiums,
+                title="Monthly Premium Trend",
+                markers=True
+            )
+            fig_trend.update_layout(height=400, xaxis_title="Month", yaxis_title="Premium (₹)")
+            fig_trend.update_traces(line_color='#8B4513', marker_color='#228B22')
+            return fig_trend
+
+        show_cached_chart("dashboard_trend", {}, None, trend_chart)
     
     with col2:
         # Cost breakdown
-        categories = ['Premium', 'Deductible', 'Copays', 'Other']
-        costs = [320, 150, 80, 50]
-        
-        fig_breakdown = px.pie(
-            values=costs,
-            names=categories,
-            title="Monthly Cost Breakdown",
-            color_discrete_sequence=['#8B4513', '#A0522D', '#DAA520', '#B8860B']
-        )
-        fig_breakdown.update_layout(height=400)
-        st.plotly_chart(fig_breakdown, use_container_width=True)
+        def breakdown_chart():
+            categories = ['Premium', 'Deductible', 'Copays', 'Other']
+            costs = [320, 150, 80, 50]
+            
+            fig_breakdown = px.pie(
+                values=costs,
+                names=categories,
+                title="Monthly Cost Breakdown",
+                color_discrete_sequence=['#8B4513', '#A0522D', '#DAA520', '#B8860B']
+            )
+            fig_breakdown.update_layout(height=400)
+            return fig_breakdown
+
+        show_cached_chart("dashboard_breakdown", {}, None, breakdown_chart)
 
 with tab3:
     st.markdown("## 🎯 Health Goals")
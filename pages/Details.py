@@ -1,5 +1,7 @@
 import streamlit as st
-import pandas as pd
+from data_store import get_dataset, yes_no
+from plan_details import get_plan_details
+from plan_search import get_plan_name_index
 
 st.set_page_config(page_title="Plan Details", layout="centered")
 
@@ -29,17 +31,31 @@ st.markdown("""
 
 st.markdown("# 📝 Plan Details")
 
-# Load dataset
-df = pd.read_csv("filtered_plan2.csv")
+# Shared dataset and its search indexes, built once per server process
+dataset = get_dataset()
+name_index = get_plan_name_index(dataset)
+details = get_plan_details(dataset)
+plan_ids = dataset.plans["PlanId"].astype(str).to_numpy()
+
+# Search as you type: only the best matches are sent to the page
+query = st.text_input("Search plans by name, issuer or plan ID", placeholder="e.g. Aetna Gold, Kaiser, 193")
+positions = name_index.search(query)
+
+if not positions:
+    st.info("No plans match your search. Try part of the plan or issuer name.")
+    st.stop()
+
+
+def plan_label(position):
+    plan = details.get(plan_ids[position])["plan"]
+    return f"{plan.get('PlanMarketingName')} · {plan.get('MetalLevel')} {plan.get('PlanType')}, {plan.get('StateCode')} (Plan {plan_ids[position]})"
 
-# Get unique plan names
-plan_names = sorted(df["PlanMarketingName"].dropna().unique())
 
 # Let user select a plan
-selected = st.selectbox("Select a plan to explore", plan_names)
+selected = st.selectbox(f"Select a plan to explore ({name_index.size:,} plans)", positions, format_func=plan_label)
 
 # Get selected plan details
-plan = df[df["PlanMarketingName"] == selected].iloc[0]
+plan = details.get(plan_ids[selected])["plan"]
 
 st.markdown(f"""
 <div class="plan-card">
@@ -47,15 +63,15 @@ st.markdown(f"""
     <ul style='font-size:1.1rem;line-height:1.7;'>
         <li><span class="plan-attr">Metal Level:</span> {plan.get('MetalLevel', 'N/A')}</li>
         <li><span class="plan-attr">Plan Type:</span> {plan.get('PlanType', 'N/A')}</li>
-        <li><span class="plan-attr">Wellness Program:</span> {plan.get('WellnessProgramOffered', 'N/A')}</li>
-        <li><span class="plan-attr">Disease Management:</span> {plan.get('DiseaseManagementProgramsOffered', 'N/A')}</li>
-        <li><span class="plan-attr">Maternity Support:</span> {plan.get('IsNoticeRequiredForPregnancy', 'N/A')}</li>
-        <li><span class="plan-attr">Dental Coverage:</span> {plan.get('DentalOnlyPlan', 'N/A')}</li>
-        <li><span class="plan-attr">Specialist Referral Needed:</span> {plan.get('SpecialistRequiringReferral', 'N/A')}</li>
-        <li><span class="plan-attr">Out-of-Network Coverage:</span> {plan.get('OutOfServiceAreaCoverage', 'N/A')}</li>
-        <li><span class="plan-attr">Out-of-Country Coverage:</span> {plan.get('OutOfCountryCoverage', 'N/A')}</li>
-        <li><span class="plan-attr">HSA Contribution from Employer:</span> {plan.get('HSAOrHRAEmployerContribution', 'N/A')}</li>
-        <li><span class="plan-attr">Child-Only Plan:</span> {plan.get('ChildOnlyOffering', 'N/A')}</li>
+        <li><span class="plan-attr">Wellness Program:</span> {yes_no(plan.get('WellnessProgramOffered'))}</li>
+        <li><span class="plan-attr">Disease Management:</span> {yes_no(plan.get('DiseaseManagementProgramsOffered'))}</li>
+        <li><span class="plan-attr">Maternity Support:</span> {yes_no(plan.get('IsNoticeRequiredForPregnancy'))}</li>
+        <li><span class="plan-attr">Dental Coverage:</span> {yes_no(plan.get('DentalOnlyPlan'))}</li>
+        <li><span class="plan-attr">Specialist Referral Needed:</span> {yes_no(plan.get('SpecialistRequiringReferral'))}</li>
+        <li><span class="plan-attr">Out-of-Network Coverage:</span> {yes_no(plan.get('OutOfServiceAreaCoverage'))}</li>
+        <li><span class="plan-attr">Out-of-Country Coverage:</span> {yes_no(plan.get('OutOfCountryCoverage'))}</li>
+        <li><span class="plan-attr">HSA Contribution from Employer:</span> {yes_no(plan.get('HSAOrHRAEmployerContribution'))}</li>
+        <li><span class="plan-attr">Child-Only Plan:</span> {yes_no(plan.get('ChildOnlyOffering'))}</li>
     </ul>
 </div>
 """, unsafe_allow_html=True)
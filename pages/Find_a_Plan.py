@@ -1,8 +1,9 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import os
 from utils import load_trimmed_data, create_sample_data
+from plan_index import get_plan_index, get_plan_scorer, get_premium_matrix, get_service_area_index, top_k
+from rate_cube import get_plan_quotes
+from plan_cards import get_plan_cards
 
 st.set_page_config(page_title="Find Your Best Plan", layout="wide")
 
@@ -99,6 +100,8 @@ with col1:
 
         state = st.selectbox("State (optional)", ["Any"] + sorted(service_df["StateCode"].dropna().unique()))
 
+        zip_code = st.text_input("ZIP Code (optional)", max_chars=10)
+
         needs = st.multiselect(
             "Coverage Preferences (optional)",
             ["Wellness", "Maternity", "Mental Health", "Dental"]
@@ -112,86 +115,64 @@ with col2:
         
         with st.spinner("Finding your perfect plans..."):
             try:
-                filtered = plan_df.copy()
+                conditions = []
 
-                # Optional state filter
+                # Optional state filter: plans sold in a whole-state service area
                 if state != "Any":
-                    valid_services = service_df[
-                        (service_df["StateCode"] == state)
-                        & (service_df["CoverEntireState"].astype(str).str.lower() == "true")
-                    ]["ServiceAreaId"].unique()
-                    filtered = filtered[filtered["ServiceAreaId"].isin(valid_services)]
+                    conditions.append(("ServiceState", state))
 
                 # Plan type filter
                 if plan_type == "Child-only":
-                    filtered = filtered[filtered["ChildOnlyOffering"].astype(str).str.lower() == "true"]
-                elif plan_type == "Family":
-                    filtered = filtered[filtered["MarketCoverage"].str.contains("Family", na=False)]
+                    conditions.append(("ChildOnlyOffering", True))
                 else:
-                    filtered = filtered[filtered["MarketCoverage"].str.contains("Individual", na=False)]
+                    conditions.append(("MarketCoverage", plan_type))
 
-                # Merge with rate data
-                rate_filtered = rate_df.copy()
+                plan_index = get_plan_index()
+                bits = plan_index.select(conditions)
 
-                if state != "Any":
-                    rate_filtered = rate_filtered[rate_filtered["StateCode"] == state]
+                # Optional ZIP filter: plans sold in any service area listing the ZIP
+                if zip_code.strip():
+                    bits = bits & get_service_area_index().plans_for_zip(zip_code)
+
+                positions = plan_index.positions(bits)
+                filtered = plan_df.take(positions)
+
+                # Attach premiums from the precomputed plan x state matrix
+                premiums = get_premium_matrix().premiums(positions, state)
+
+                # Personalize for the age band and tobacco use when a rate cube is available
+                # ("Prefer not to say" is quoted at non-tobacco rates); plans
+                # without a quote keep their average, marked on their card
+                plan_quotes = get_plan_quotes()
+                averaged = np.ones(len(positions), dtype=bool)
+                if plan_quotes is not None:
+                    quotes = plan_quotes.quotes(positions, state, min(selected_ages), max(selected_ages), tobacco == "Yes")
+                    averaged = np.isnan(quotes)
+                    premiums = np.where(averaged, premiums, quotes)
 
-                # Use AvgIndividualRate from trimmed data
-                rate_avg = rate_filtered.groupby("PlanId")["AvgIndividualRate"].mean().reset_index()
-                filtered = pd.merge(filtered, rate_avg, on="PlanId", how="left")
+                filtered["AvgIndividualRate"] = premiums
 
                 # Scoring based on needs
-                score_map = {
-                    "Wellness": "WellnessProgramOffered",
-                    "Maternity": "IsNoticeRequiredForPregnancy",
-                    "Mental Health": "DiseaseManagementProgramsOffered",
-                    "Dental": "DentalOnlyPlan"
-                }
-
-                def calculate_score(row):
-                    score = 0
-                    for need in needs:
-                        col = score_map.get(need)
-                        if col and col in row and str(row[col]).lower() in ["yes", "true", "1"]:
-                            score += 1
-                    return score
-
-                filtered["match_score"] = filtered.apply(calculate_score, axis=1)
-                filtered = filtered.sort_values(["match_score", "AvgIndividualRate"], ascending=[False, True])
+                scores = get_plan_scorer().scores(positions, needs)
+                filtered["match_score"] = scores
 
                 # Display top 5 plans
-                top_plans = filtered.head(5)
+                top = top_k(scores, filtered["AvgIndividualRate"].to_numpy(dtype=float), 5)
+                top_plans = filtered.iloc[top]
 
                 if len(top_plans) == 0:
                     st.warning("No plans found matching your criteria. Try adjusting your preferences.")
                 else:
-                    for idx, plan in top_plans.iterrows():
+                    if averaged[top].all():
+                        st.caption("ℹ️ Premiums shown are plan averages; rates for your age and tobacco use are not available.")
+                    elif averaged[top].any():
+                        st.caption("ℹ️ Premiums marked \"plan average\" are averages across ages; rates for your age and tobacco use are not available for those plans.")
+                    if tobacco == "Prefer not to say" and not averaged[top].all():
+                        st.caption("ℹ️ You preferred not to say whether you use tobacco, so quotes are non-tobacco rates. Tobacco users may pay more.")
+                    cards = get_plan_cards()
+                    for j in top:
                         with st.container():
-                            st.markdown(f"""
-                            <div class="plan-card">
-                                <h3>🏥 {plan['PlanMarketingName']}</h3>
-                                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 1rem; margin: 1rem 0;">
-                                    <div>
-                                        <p><strong>Metal Level:</strong> <span class="metric-highlight">{plan.get('MetalLevel', 'N/A')}</span></p>
-                                        <p><strong>Plan Type:</strong> {plan.get('PlanType', 'N/A')}</p>
-                                        <p><strong>Monthly Premium:</strong> <span class="metric-highlight">₹{plan.get('AvgIndividualRate', 0):.0f}</span></p>
-                                    </div>
-                                    <div>
-                                        <p><strong>Wellness Programs:</strong> {plan.get('WellnessProgramOffered', 'N/A')}</p>
-                                        <p><strong>Disease Management:</strong> {plan.get('DiseaseManagementProgramsOffered', 'N/A')}</p>
-                                        <p><strong>Match Score:</strong> <span class="success-text">{plan.get('match_score', 0)}/4</span></p>
-                                    </div>
-                                </div>
-                                <div style="margin-top: 1rem;">
-                                    <strong>Why this plan?</strong>
-                                    <ul>
-                                        <li>Comprehensive coverage for your selected preferences</li>
-                                        <li>Competitive pricing in your area</li>
-                                        <li>Strong network of healthcare providers</li>
-                                    </ul>
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                            st.markdown(cards.result_card(positions[j], premiums[j], scores[j], averaged[j]), unsafe_allow_html=True)
 
                     # Summary statistics
                     st.markdown("---")
@@ -201,7 +182,7 @@ with col2:
                     with col2:
                         st.metric("Lowest Premium", f"₹{top_plans['AvgIndividualRate'].min():.0f}/month")
                     with col3:
-                        st.metric("Highest Match Score", f"{top_plans['match_score'].max()}/4")
+                        st.metric("Highest Match Score", f"{top_plans['match_score'].max():g}/4")
 
                     # Start over button
                     if st.button("🔄 Start Over", use_container_width=True):
@@ -1,11 +1,20 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
-from utils import get_gemini_response, lookup_plan_details, load_trimmed_data, create_sample_data
+from utils import stream_gemini_response, suggest_plan_names, lookup_plan_details, detail_request_name, load_trimmed_data, create_sample_data
+from llm_cache import get_response_cache
+from retrieval import get_plan_retriever
+from plan_cards import get_plan_cards
+from conversation import Conversation
 import os
+from collections import deque
 
 load_dotenv()
 
+# Timing records kept per session, most recent answers only
+RESPONSE_METRICS_KEPT = 50
+
 st.set_page_config(page_title="AI Insurance Advisor", layout="wide")
 
 # Custom CSS with earthy color scheme
@@ -56,6 +65,8 @@ def load_policy_data():
     try:
         # Use trimmed datasets for deployment
         plans_df, rates_df, benefits_df, service_areas_df = load_trimmed_data()
+        # Build the plan retrieval index with the data rather than on the first question
+        get_plan_retriever()
         
         # If any file failed to load, use sample data
         if plans_df is None:
@@ -74,9 +85,12 @@ def load_policy_data():
 policy_df = load_policy_data()
 
 # Initialize session state
-for key in ["messages", "last_user_input", "last_followup_prompt", "shown_plans"]:
+if "conversation" not in st.session_state:
+    st.session_state.conversation = Conversation()
+for key in ["shown_plans", "response_metrics"]:
     if key not in st.session_state:
-        st.session_state[key] = [] if key == "messages" else set() if key == "shown_plans" else ""
+        st.session_state[key] = deque(maxlen=RESPONSE_METRICS_KEPT) if key == "response_metrics" else set()
+conversation = st.session_state.conversation
 
 # Two-column layout
 col1, col2 = st.columns([2, 1])
@@ -84,9 +98,13 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.markdown("### 🤖 Chat Interface")
     
-    # Display previous messages
-    if st.session_state.messages:
-        for msg in st.session_state.messages:
+    # Display the most recent messages, older ones a page at a time
+    if len(conversation):
+        if conversation.hidden():
+            if st.button(f"⬆️ Load earlier messages ({conversation.hidden():,} more)"):
+                conversation.load_earlier()
+                st.rerun()
+        for msg in conversation.visible():
             with st.chat_message(msg["role"]):
                 st.markdown(msg["content"])
     else:
@@ -108,10 +126,15 @@ with col1:
 
     # Chat input
     if prompt := st.chat_input("Tell me about your insurance needs..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        # Earlier turns, summarized to fit the context budget, for follow-up questions
+        history = conversation.context()
+        conversation.add("user", prompt)
         with st.chat_message("user"):
             st.markdown(prompt)
 
+        response_stream = None
+        new_plan_names = []
+
         # Process the input
         with st.spinner("🤔 Thinking..."):
             try:
@@ -135,16 +158,11 @@ with col1:
                         detected_type = query_type
                         break
 
-                # Recognize request for more details
-                detail_phrases = [
-                    "can you elaborate on", "tell me more about", "more info on",
-                    "details of", "i want more info on"
-                ]
-                match_phrase = next((p for p in detail_phrases if prompt_lower.startswith(p)), None)
+                # Recognize request for more details about a catalog plan
+                plan_name = detail_request_name(prompt)
+                response = lookup_plan_details(plan_name) if plan_name else None
 
-                if match_phrase:
-                    plan_name = prompt_lower.replace(match_phrase, "").strip(" ?")
-                    response = lookup_plan_details(plan_name)
+                if response is not None:
                     new_plan_names = []
                 else:
                     followup_keywords = [
@@ -153,11 +171,10 @@ with col1:
                     ]
                     is_followup = any(word in prompt_lower for word in followup_keywords)
 
-                    if is_followup and st.session_state.last_followup_prompt:
-                        full_prompt = f"{st.session_state.last_user_input} FOLLOW-UP: {prompt}"
-                    else:
-                        full_prompt = prompt
-                        st.session_state.last_user_input = prompt
+                    # Standalone questions are sent alone so their answers stay cacheable
+                    if not is_followup:
+                        history = ""
+                    full_prompt = prompt
 
                     # Enhanced prompt with query type context
                     if detected_type:
@@ -165,15 +182,9 @@ with col1:
                     else:
                         enhanced_prompt = full_prompt
 
-                    response, new_plan_names = get_gemini_response(
-                        enhanced_prompt,
-                        exclude_names=list(st.session_state.shown_plans)
-                    )
-
-                    for name in new_plan_names:
-                        st.session_state.shown_plans.add(name)
-
-                    st.session_state.last_followup_prompt = response
+                    # Tokens are rendered into the assistant message as they arrive
+                    response_metrics = {}
+                    response_stream = stream_gemini_response(enhanced_prompt, response_metrics, history)
 
             except Exception as e:
                 st.error(f"❌ Error processing request: {str(e)}")
@@ -200,9 +211,22 @@ I encountered an error while processing your request. This might be due to:
 - Compare deductibles and out-of-pocket maximums"""
 
         # Display AI response
-        st.session_state.messages.append({"role": "assistant", "content": response})
         with st.chat_message("assistant"):
-            st.markdown(response)
+            if response_stream is not None:
+                response = st.write_stream(response_stream)
+
+                if not response_metrics["error"]:
+                    new_plan_names = suggest_plan_names(enhanced_prompt, history)
+                    for name in new_plan_names:
+                        st.session_state.shown_plans.add(name)
+
+                st.session_state.response_metrics.append(response_metrics)
+                if not response_metrics["error"]:
+                    timing = f"⏱️ First token {response_metrics['ttft_s'] or response_metrics['total_s']:.2f}s · total {response_metrics['total_s']:.2f}s"
+                    st.caption(timing + (" · cached" if response_metrics["cached"] else ""))
+            else:
+                st.markdown(response)
+        conversation.add("assistant", response)
 
         # Display recommended plans if any
         if new_plan_names:
@@ -210,9 +234,9 @@ I encountered an error while processing your request. This might be due to:
             st.markdown("### 🎯 **Recommended Plans for You**")
             
             # Get plan details for recommended plans
-            df_compare = policy_df[policy_df["PlanMarketingName"].isin(new_plan_names)].copy()
+            compare_positions = np.flatnonzero(policy_df["PlanMarketingName"].isin(new_plan_names))
             
-            if len(df_compare) > 0:
+            if len(compare_positions) > 0:
                 # Display plan comparison
                 st.markdown("""
                 <div class="plan-comparison">
@@ -220,17 +244,8 @@ I encountered an error while processing your request. This might be due to:
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # Create a nice comparison table
-                comparison_data = []
-                for _, plan in df_compare.iterrows():
-                    comparison_data.append({
-                        "Plan Name": plan["PlanMarketingName"],
-                        "Metal Level": plan.get("MetalLevel", "N/A"),
-                        "Plan Type": plan.get("PlanType", "N/A"),
-                        "Wellness Programs": plan.get("WellnessProgramOffered", "N/A"),
-                        "Disease Management": plan.get("DiseaseManagementProgramsOffered", "N/A"),
-                        "Maternity Support": plan.get("IsNoticeRequiredForPregnancy", "N/A")
-                    })
+                # Comparison rows are prerendered per plan
+                comparison_data = get_plan_cards().comparison_rows(compare_positions)
                 
                 if comparison_data:
                     comparison_df = pd.DataFrame(comparison_data)
@@ -282,6 +297,9 @@ with col2:
         st.markdown("**Plan Types:**")
         for plan_type, count in plan_type_counts.head(3).items():
             st.markdown(f"- {plan_type}: {count:,}")
+
+    cache_stats = get_response_cache().stats()
+    st.caption(f"⚡ Cached answers: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.0%} hit rate)")
     
     st.markdown("---")
     
@@ -312,10 +330,9 @@ with col2:
     
     st.markdown("### 🔄 Clear Chat")
     if st.button("Clear Chat History", use_container_width=True):
-        st.session_state.messages = []
+        conversation.clear()
         st.session_state.shown_plans = set()
-        st.session_state.last_user_input = ""
-        st.session_state.last_followup_prompt = ""
+        st.session_state.response_metrics = deque(maxlen=RESPONSE_METRICS_KEPT)
         st.rerun()
 
 # Footer
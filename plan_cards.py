@@ -0,0 +1,113 @@
+from data_store import get_dataset, yes_no
+
+# Columns of the chat comparison table and the plan field behind each
+COMPARISON_COLUMNS = {
+    "Plan Name": "PlanMarketingName",
+    "Metal Level": "MetalLevel",
+    "Plan Type": "PlanType",
+    "Wellness Programs": "WellnessProgramOffered",
+    "Disease Management": "DiseaseManagementProgramsOffered",
+    "Maternity Support": "IsNoticeRequiredForPregnancy",
+}
+FLAG_FIELDS = {"WellnessProgramOffered", "DiseaseManagementProgramsOffered", "IsNoticeRequiredForPregnancy"}
+
+
+def policy_markdown(plan):
+    return f"""🔹 **{plan['PlanMarketingName']}**
+- Metal Level: {plan.get('MetalLevel', 'N/A')}
+- Plan Type: {plan.get('PlanType', 'N/A')}
+- Wellness: {yes_no(plan.get('WellnessProgramOffered'))}
+- Disease Mgmt: {yes_no(plan.get('DiseaseManagementProgramsOffered'))}
+- Maternity Support: {yes_no(plan.get('IsNoticeRequiredForPregnancy'))}
+"""
+
+
+def comparison_row(plan):
+    return {
+        label: yes_no(plan.get(field)) if field in FLAG_FIELDS else plan.get(field, "N/A")
+        for label, field in COMPARISON_COLUMNS.items()
+    }
+
+
+def result_card_parts(plan):
+    """
+    The Find_a_Plan result card split around its premium and match score,
+    which depend on the search
+    """
+    head = f"""
+                            <div class="plan-card">
+                                <h3>🏥 {plan['PlanMarketingName']}</h3>
+                                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 1rem; margin: 1rem 0;">
+                                    <div>
+                                        <p><strong>Metal Level:</strong> <span class="metric-highlight">{plan.get('MetalLevel', 'N/A')}</span></p>
+                                        <p><strong>Plan Type:</strong> {plan.get('PlanType', 'N/A')}</p>
+                                        <p><strong>Monthly Premium:</strong> <span class="metric-highlight">₹"""
+    middle = f"""</span></p>
+                                    </div>
+                                    <div>
+                                        <p><strong>Wellness Programs:</strong> {yes_no(plan.get('WellnessProgramOffered'))}</p>
+                                        <p><strong>Disease Management:</strong> {yes_no(plan.get('DiseaseManagementProgramsOffered'))}</p>
+                                        <p><strong>Match Score:</strong> <span class="success-text">"""
+    tail = """/4</span></p>
+                                    </div>
+                                </div>
+                                <div style="margin-top: 1rem;">
+                                    <strong>Why this plan?</strong>
+                                    <ul>
+                                        <li>Comprehensive coverage for your selected preferences</li>
+                                        <li>Competitive pricing in your area</li>
+                                        <li>Strong network of healthcare providers</li>
+                                    </ul>
+                                </div>
+                            </div>
+                            """
+    return head, middle, tail
+
+
+class PlanCards:
+    """
+    Display fragments for every plan, rendered once per dataset version.
+
+    Each plan's chat markdown, comparison-table row and result card are kept
+    by row position, with PlanId -> position alongside, so rendering a list
+    of results is a lookup and a join instead of materializing pandas rows.
+    """
+
+    def __init__(self, plans, version):
+        self.version = version
+        records = plans.to_dict("records")
+        self.markdown = [policy_markdown(plan) for plan in records]
+        self.rows = [comparison_row(plan) for plan in records]
+        self.cards = [result_card_parts(plan) for plan in records]
+        plan_ids = plans["PlanId"].astype(str) if "PlanId" in plans.columns else []
+        self.positions_by_id = {plan_id: position for position, plan_id in enumerate(plan_ids)}
+
+    def positions(self, plan_ids):
+        """
+        Row positions of the given PlanIds, or None if any is not in this dataset
+        """
+        positions = [self.positions_by_id.get(str(plan_id)) for plan_id in plan_ids]
+        return None if None in positions else positions
+
+    def policies_markdown(self, positions):
+        return "\n".join(self.markdown[position] for position in positions)
+
+    def comparison_rows(self, positions):
+        return [self.rows[position] for position in positions]
+
+    def result_card(self, position, premium, match_score, average=False):
+        """
+        The card with this search's premium, marked when it is the plan's
+        average rather than a quote for the user's age and tobacco use
+        """
+        head, middle, tail = self.cards[position]
+        note = " <small>(plan average)</small>" if average else ""
+        return f"{head}{premium:.0f}{note}{middle}{match_score:g}{tail}"
+
+
+def get_plan_cards(dataset=None):
+    """
+    Plan display fragments for the current dataset, shared by all sessions
+    """
+    dataset = dataset or get_dataset()
+    return dataset.derived("plan_cards", lambda ds: PlanCards(ds.plans, ds.version))
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from data_store import get_dataset
+
+CUBE_DIMENSIONS = ["StateCode", "MetalLevel", "PlanType"]
+# Premium histogram bins, shared by every cell so slices can be added up
+HIST_BINS = 20
+
+
+def _codes(frame, labels):
+    """
+    Cube coordinates of each row, -1 where a label is missing
+    """
+    return np.stack(
+        [pd.Index(labels[dim]).get_indexer(frame[dim].astype("string")) for dim in CUBE_DIMENSIONS], axis=1
+    )
+
+
+class PlanCube:
+    """
+    Dashboard aggregates by StateCode x MetalLevel x PlanType, built once per dataset.
+
+    Each cell holds its plan count and, over the rates of those plans, the
+    rate count, premium sum, min, max and a histogram on shared bin edges.
+    Plans count under their own state and rates under the rate's state. Any
+    filter combination is a slice of the cube added up along the other
+    dimensions, so the Dashboard never scans the plan or rate tables.
+    """
+
+    def __init__(self, plans, rates):
+        plan_labels = plans.reindex(columns=CUBE_DIMENSIONS)
+        rate_frame = rates.reindex(columns=["PlanId", "StateCode", "AvgIndividualRate"])
+        if "PlanId" in plans.columns:
+            joined = plans.drop_duplicates("PlanId").set_index("PlanId").reindex(columns=CUBE_DIMENSIONS[1:])
+            rate_labels = joined.reindex(rate_frame["PlanId"]).reset_index(drop=True)
+        else:
+            rate_labels = pd.DataFrame(index=range(len(rate_frame)), columns=CUBE_DIMENSIONS[1:])
+        rate_labels.insert(0, "StateCode", rate_frame["StateCode"].to_numpy())
+
+        self.labels = {
+            dim: sorted({str(v) for v in pd.concat([plan_labels[dim], rate_labels[dim]]).dropna().unique()})
+            for dim in CUBE_DIMENSIONS
+        }
+        shape = tuple(len(self.labels[dim]) for dim in CUBE_DIMENSIONS)
+
+        plan_codes = _codes(plan_labels, self.labels)
+        plan_codes = plan_codes[(plan_codes >= 0).all(axis=1)]
+        self.plan_count = np.zeros(shape, dtype=np.int64)
+        np.add.at(self.plan_count, tuple(plan_codes.T), 1)
+
+        premiums = pd.to_numeric(rate_frame["AvgIndividualRate"], errors="coerce").to_numpy(dtype=float)
+        rate_codes = _codes(rate_labels, self.labels)
+        keep = (rate_codes >= 0).all(axis=1) & ~np.isnan(premiums)
+        rate_codes, premiums = rate_codes[keep], premiums[keep]
+        cells = tuple(rate_codes.T)
+
+        self.rate_count = np.zeros(shape, dtype=np.int64)
+        self.rate_sum = np.zeros(shape)
+        self.rate_min = np.full(shape, np.inf)
+        self.rate_max = np.full(shape, -np.inf)
+        np.add.at(self.rate_count, cells, 1)
+        np.add.at(self.rate_sum, cells, premiums)
+        np.minimum.at(self.rate_min, cells, premiums)
+        np.maximum.at(self.rate_max, cells, premiums)
+
+        self.bin_edges = np.histogram_bin_edges(premiums, bins=HIST_BINS) if len(premiums) else np.linspace(0, 1, HIST_BINS + 1)
+        bins = np.clip(np.searchsorted(self.bin_edges, premiums, side="right") - 1, 0, HIST_BINS - 1)
+        self.hist = np.zeros(shape + (HIST_BINS,), dtype=np.int64)
+        np.add.at(self.hist, cells + (bins,), 1)
+
+    def _positions(self, filters):
+        """
+        Positions along each dimension kept by {dimension: label or None}; None keeps all
+        """
+        positions = []
+        for dim in CUBE_DIMENSIONS:
+            labels = self.labels[dim]
+            value = filters.get(dim)
+            if value is None:
+                positions.append(np.arange(len(labels)))
+            else:
+                positions.append(np.array([labels.index(value)] if value in labels else [], dtype=int))
+        return positions
+
+    def _slice(self, filters):
+        return np.ix_(*self._positions(filters))
+
+    def plans_by(self, dim, **filters):
+        """
+        Plan counts per label of one dimension under the filters, largest first
+        """
+        return self._by(self.plan_count, dim, filters)
+
+    def rates_by(self, dim, **filters):
+        """
+        Rate counts per label of one dimension under the filters, largest first
+        """
+        return self._by(self.rate_count, dim, filters)
+
+    def _by(self, array, dim, filters):
+        axis = CUBE_DIMENSIONS.index(dim)
+        positions = self._positions(filters)
+        totals = array[np.ix_(*positions)].sum(axis=tuple(i for i in range(len(CUBE_DIMENSIONS)) if i != axis))
+        labels = np.asarray(self.labels[dim], dtype=object)[positions[axis]]
+        counts = pd.Series(totals, index=labels, dtype=np.int64)
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def plan_total(self, **filters):
+        return int(self.plan_count[self._slice(filters)].sum())
+
+    def premium_stats(self, **filters):
+        """
+        Count, mean, min and max premium under the filters (mean/min/max are NaN without rates)
+        """
+        index = self._slice(filters)
+        count = int(self.rate_count[index].sum())
+        if not count:
+            return {"count": 0, "mean": np.nan, "min": np.nan, "max": np.nan}
+        return {
+            "count": count,
+            "mean": float(self.rate_sum[index].sum() / count),
+            "min": float(self.rate_min[index].min()),
+            "max": float(self.rate_max[index].max()),
+        }
+
+    def histogram(self, **filters):
+        """
+        Premium histogram under the filters as (counts, bin edges)
+        """
+        return self.hist[self._slice(filters)].sum(axis=(0, 1, 2)), self.bin_edges
+
+
+def get_plan_cube(dataset=None):
+    """
+    Dashboard cube for the current dataset, shared by all sessions
+    """
+    dataset = dataset or get_dataset()
+    return dataset.derived("plan_cube", lambda ds: PlanCube(ds.plans, ds.rates))
@@ -0,0 +1,126 @@
+import re
+
+import numpy as np
+
+from data_store import get_dataset, yes_no
+from plan_index import get_premium_matrix
+
+BENEFIT_FIELDS = ["BenefitName", "Copay", "Deductible", "Coinsurance", "CoverageLevel"]
+
+
+def normalize_name(name):
+    """
+    Lowercase a plan name and reduce punctuation and spacing to single spaces
+    """
+    return " ".join(re.findall(r"[a-z0-9]+", str(name).lower()))
+
+
+def _number(value):
+    return None if value is None or value != value else float(value)
+
+
+class PlanDetailView:
+    """
+    Everything shown about a plan, joined once per dataset: its plan row,
+    average monthly premium and benefit rows.
+
+    Details are kept by PlanId, with normalized marketing name -> PlanIds
+    alongside, so a lookup is a dictionary hit rather than a DataFrame scan.
+    """
+
+    def __init__(self, plans, benefits, premiums):
+        benefit_rows = {}
+        if len(benefits) and "PlanId" in benefits.columns:
+            fields = [field for field in BENEFIT_FIELDS if field in benefits.columns]
+            for plan_id, *values in zip(benefits["PlanId"].astype(str), *(benefits[field] for field in fields)):
+                benefit_rows.setdefault(plan_id, []).append(dict(zip(fields, values)))
+
+        self.by_id = {}
+        self.by_name = {}
+        for plan, premium in zip(plans.to_dict("records"), np.asarray(premiums, dtype=float)):
+            plan_id = str(plan.get("PlanId"))
+            rows = sorted(benefit_rows.get(plan_id, []), key=lambda row: str(row.get("BenefitName")))
+            self.by_id[plan_id] = {
+                "plan": plan,
+                "premium": None if np.isnan(premium) else float(premium),
+                "benefits": rows,
+            }
+            self.by_name.setdefault(normalize_name(plan.get("PlanMarketingName", "")), []).append(plan_id)
+
+    def get(self, plan_id):
+        return self.by_id.get(str(plan_id))
+
+    def find(self, name_or_id):
+        """
+        Details of every plan with this PlanId or marketing name, cheapest first
+        """
+        detail = self.get(str(name_or_id).strip())
+        if detail is not None:
+            return [detail]
+        return self.for_ids(self.by_name.get(normalize_name(name_or_id), []))
+
+    def for_ids(self, plan_ids):
+        """
+        Details of the given plans, cheapest first
+        """
+        details = [self.by_id[str(plan_id)] for plan_id in plan_ids if str(plan_id) in self.by_id]
+        return sorted(details, key=lambda d: np.inf if d["premium"] is None else d["premium"])
+
+    def markdown(self, detail, others=()):
+        """
+        Chat answer describing one plan, listing any other plans that share its name
+        """
+        plan = detail["plan"]
+        premium = f"₹{detail['premium']:,.0f}" if detail["premium"] is not None else "Not available"
+        lines = [
+            f"**Plan Details for {plan.get('PlanMarketingName')}** (Plan ID {plan.get('PlanId')})",
+            "",
+            f"**Coverage Level:** {plan.get('MetalLevel', 'N/A')}",
+            f"**Monthly Premium:** {premium} (average individual rate)",
+            f"**Market Coverage:** {plan.get('MarketCoverage', 'N/A')} in {plan.get('StateCode', 'N/A')}",
+            "",
+            "**Key Benefits:**",
+        ]
+        for row in detail["benefits"]:
+            terms = []
+            if _number(row.get("Copay")) is not None:
+                terms.append(f"₹{_number(row['Copay']):,.0f} copay")
+            if _number(row.get("Deductible")) is not None:
+                terms.append(f"₹{_number(row['Deductible']):,.0f} deductible")
+            if _number(row.get("Coinsurance")) is not None:
+                terms.append(f"{_number(row['Coinsurance']):g}% coinsurance")
+            level = f" ({row['CoverageLevel']})" if row.get("CoverageLevel") == row.get("CoverageLevel") and row.get("CoverageLevel") else ""
+            lines.append(f"- {row.get('BenefitName')}{level}: {', '.join(terms) or 'Covered'}")
+        if not detail["benefits"]:
+            lines.append("- No benefit details on file for this plan")
+        lines += [
+            "",
+            f"**Network:** {plan.get('PlanType', 'N/A')}",
+            f"**Wellness Programs:** {yes_no(plan.get('WellnessProgramOffered'))}",
+            f"**Disease Management:** {yes_no(plan.get('DiseaseManagementProgramsOffered'))}",
+            f"**Maternity Support:** {yes_no(plan.get('IsNoticeRequiredForPregnancy'))}",
+            f"**HSA Eligible:** {yes_no(plan.get('IsHSAEligible'))}",
+        ]
+        if others:
+            lines += ["", "**Other plans with this name:**"]
+            for other in others:
+                other_plan = other["plan"]
+                other_premium = f"₹{other['premium']:,.0f}/month" if other["premium"] is not None else "premium n/a"
+                lines.append(
+                    f"- Plan ID {other_plan.get('PlanId')}: {other_plan.get('MetalLevel')} {other_plan.get('PlanType')} "
+                    f"in {other_plan.get('StateCode')}, {other_premium}"
+                )
+        return "\n".join(lines)
+
+
+def get_plan_details(dataset=None):
+    """
+    Plan detail view for the current dataset, shared by all sessions
+    """
+    dataset = dataset or get_dataset()
+
+    def build(ds):
+        matrix = get_premium_matrix(ds)
+        return PlanDetailView(ds.plans, ds.benefits, matrix.values[:, matrix.any_col])
+
+    return dataset.derived("plan_details", build)
@@ -0,0 +1,416 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_store import FLAG_COLUMNS, get_dataset
+
+# Label columns that get one bitset per distinct value
+BITMAP_COLUMNS = ["StateCode", "MarketCoverage", "PlanType", "MetalLevel"]
+
+# Coverage needs offered on Find_a_Plan and the flag that satisfies each
+NEED_COLUMNS = {
+    "Wellness": "WellnessProgramOffered",
+    "Maternity": "IsNoticeRequiredForPregnancy",
+    "Mental Health": "DiseaseManagementProgramsOffered",
+    "Dental": "DentalOnlyPlan",
+}
+NEED_WEIGHTS = {need: 1.0 for need in NEED_COLUMNS}
+
+# Chat keywords and the plans each one selects: a flag column, or a PlanType value
+KEYWORD_FILTERS = {
+    "wellness": "WellnessProgramOffered",
+    "maternity": "IsNoticeRequiredForPregnancy",
+    "pregnancy": "IsNoticeRequiredForPregnancy",
+    "child": "ChildOnlyOffering",
+    "disease": "DiseaseManagementProgramsOffered",
+    "ppo": "PlanType",
+    "hmo": "PlanType",
+}
+METAL_LEVELS = ["Gold", "Silver", "Bronze", "Platinum"]
+
+
+def _pack(mask):
+    """
+    Pack a boolean mask into uint64 words (padding bits are zero)
+    """
+    packed = np.packbits(np.asarray(mask, dtype=bool))
+    pad = -len(packed) % 8
+    if pad:
+        packed = np.concatenate([packed, np.zeros(pad, dtype=np.uint8)])
+    return packed.view(np.uint64)
+
+
+class PlanBitmapIndex:
+    """
+    One bitset per (column, value) over the plan table, built once per dataset.
+
+    A filter is an AND of bitsets followed by a gather of the surviving
+    positions, so no DataFrame is copied or scanned per request.
+    """
+
+    def __init__(self, plans, service_areas):
+        self.size = len(plans)
+        self.bitsets = {}
+        self.all = _pack(np.ones(self.size, dtype=bool))
+        self.none = np.zeros_like(self.all)
+
+        for col in BITMAP_COLUMNS:
+            if col not in plans.columns:
+                continue
+            codes, values = pd.factorize(plans[col])
+            for code, value in enumerate(values):
+                self.bitsets[(col, value)] = _pack(codes == code)
+
+        for col in FLAG_COLUMNS:
+            if col in plans.columns:
+                mask = plans[col].to_numpy(dtype=bool)
+                self.bitsets[(col, True)] = _pack(mask)
+                self.bitsets[(col, False)] = _pack(~mask)
+
+        # Plans sold in a service area that covers the entire state
+        if "ServiceAreaId" in plans.columns and {"ServiceAreaId", "StateCode", "CoverEntireState"} <= set(service_areas.columns):
+            whole_state = service_areas[service_areas["CoverEntireState"]]
+            for state, areas in whole_state.groupby("StateCode", observed=True)["ServiceAreaId"]:
+                mask = plans["ServiceAreaId"].isin(areas.unique()).to_numpy(dtype=bool)
+                self.bitsets[("ServiceState", state)] = _pack(mask)
+
+    def get(self, column, value):
+        return self.bitsets.get((column, value), self.none)
+
+    def select(self, conditions):
+        """
+        AND together the bitsets for a list of (column, value) conditions
+        """
+        bits = self.all
+        for column, value in conditions:
+            bits = bits & self.get(column, value)
+        return bits
+
+    def positions(self, bits):
+        """
+        Row positions set in a bitset
+        """
+        return np.flatnonzero(np.unpackbits(bits.view(np.uint8), count=self.size))
+
+    def count(self, bits):
+        return int(np.unpackbits(bits.view(np.uint8), count=self.size).sum())
+
+
+class PlanScorer:
+    """
+    Need-match scoring as one product of the plan feature matrix with a weight vector
+    """
+
+    def __init__(self, plans, need_columns=NEED_COLUMNS):
+        self.needs = list(need_columns)
+        self.features = np.zeros((len(plans), len(self.needs)), dtype=np.float32)
+        for j, col in enumerate(need_columns.values()):
+            if col in plans.columns:
+                self.features[:, j] = plans[col].to_numpy(dtype=bool)
+
+    def weights(self, needs, weights=None):
+        weights = NEED_WEIGHTS if weights is None else weights
+        return np.array(
+            [weights.get(need, 1.0) if need in needs else 0.0 for need in self.needs],
+            dtype=np.float32
+        )
+
+    def scores(self, positions, needs, weights=None):
+        """
+        Scores of the plans at the given positions for the selected needs
+        """
+        return self.features[positions] @ self.weights(needs, weights)
+
+
+class KeywordMatcher:
+    """
+    Plans matching the keywords and metal levels mentioned in free text.
+
+    One compiled pattern finds every keyword (whole words) and metal level
+    (anywhere) in a single pass over the text; the boolean mask for each is
+    precomputed, so a query is a few ORs followed by a walk over the matches
+    that stops as soon as enough distinct plan names are found.
+    """
+
+    PATTERN = re.compile(
+        r"\b(?P<keyword>" + "|".join(KEYWORD_FILTERS) + r")\b|(?P<metal>" + "|".join(METAL_LEVELS) + ")",
+        re.IGNORECASE,
+    )
+
+    def __init__(self, plans):
+        self.size = len(plans)
+        self.names = plans["PlanMarketingName"].to_numpy(dtype=object) if "PlanMarketingName" in plans.columns else np.full(self.size, None)
+        self.named = pd.notna(self.names)
+        self.masks = {}
+        for word, col in KEYWORD_FILTERS.items():
+            if col not in plans.columns:
+                continue
+            if col == "PlanType":
+                self.masks[word] = (plans[col] == word.upper()).to_numpy(dtype=bool)
+            else:
+                self.masks[word] = plans[col].to_numpy(dtype=bool)
+        for level in METAL_LEVELS:
+            if "MetalLevel" in plans.columns:
+                self.masks[level.lower()] = (plans["MetalLevel"] == level).to_numpy(dtype=bool)
+
+    def terms(self, text):
+        """
+        Keywords and metal levels found in the text, lowercased
+        """
+        keywords, metals = set(), set()
+        for match in self.PATTERN.finditer(text):
+            if match.group("keyword"):
+                keywords.add(match.group("keyword").lower())
+            else:
+                metals.add(match.group("metal").lower())
+        return keywords, metals
+
+    def match(self, text, exclude_names=(), limit=3):
+        """
+        Positions of up to limit plans with distinct names, in table order.
+
+        A plan matches if it has any mentioned keyword and, when metal levels
+        are mentioned, one of those levels.
+        """
+        keywords, metals = self.terms(text)
+        mask = np.zeros(self.size, dtype=bool)
+        for word in keywords:
+            if word in self.masks:
+                mask |= self.masks[word]
+        if metals:
+            mask &= np.logical_or.reduce([self.masks.get(level, np.zeros(self.size, dtype=bool)) for level in metals])
+        mask &= self.named
+
+        positions, seen = [], set(exclude_names)
+        for position in np.flatnonzero(mask):
+            name = self.names[position]
+            if name not in seen:
+                seen.add(name)
+                positions.append(int(position))
+                if len(positions) == limit:
+                    break
+        return positions
+
+
+def top_k(scores, premiums, k):
+    """
+    Indices of the k best rows by score (descending) then premium (ascending).
+
+    Missing premiums sort last and remaining ties keep their original order,
+    matching a stable sort. Only the rows that can reach the top k are sorted.
+    """
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    premiums = np.where(np.isnan(premiums), np.inf, premiums)
+    if n > k:
+        # Rows strictly above the k-th best score always make it
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)
+
+        # Among rows tied at the threshold, keep only the cheapest candidates
+        remaining = k - len(above)
+        if len(tied) > remaining:
+            tied_premiums = premiums[tied]
+            cutoff = np.partition(tied_premiums, remaining - 1)[remaining - 1]
+            tied = tied[tied_premiums <= cutoff]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, premiums[candidates], -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def normalize_zip(value):
+    """
+    Five-digit ZIP from free text, ZIP+4 or a float-parsed CSV value
+    """
+    digits = re.sub(r"\D", "", str(value).split("-")[0].split(".")[0])
+    return digits.zfill(5)[:5] if digits else None
+
+
+def normalize_county(value):
+    text = str(value).strip().split(".")[0]
+    if text.lower() in ("", "nan", "none"):
+        return None
+    return text.zfill(5) if text.isdigit() else text.lower()
+
+
+class ServiceAreaIndex:
+    """
+    Inverted index from ZIP code and county to service areas, and from
+    service areas to plan bitsets.
+
+    Multi-valued ZipCodes cells are exploded once here, and areas that
+    cover the entire state are attached to every ZIP and county of that state.
+    """
+
+    def __init__(self, plans, service_areas):
+        self.size = len(plans)
+        self.none = _pack(np.zeros(self.size, dtype=bool))
+        self.area_plans = {}
+        self.zip_areas = {}
+        self.county_areas = {}
+
+        if "ServiceAreaId" not in plans.columns or "ServiceAreaId" not in service_areas.columns:
+            return
+
+        codes, areas = pd.factorize(plans["ServiceAreaId"])
+        for code, area in enumerate(areas):
+            self.area_plans[area] = _pack(codes == code)
+
+        sa = service_areas.dropna(subset=["ServiceAreaId"])
+        whole_state = {}
+        if {"StateCode", "CoverEntireState"} <= set(sa.columns):
+            for state, group in sa[sa["CoverEntireState"]].groupby("StateCode", observed=True):
+                whole_state[state] = set(group["ServiceAreaId"])
+
+        for key_col, target, normalize in (
+            ("ZipCodes", self.zip_areas, normalize_zip),
+            ("County", self.county_areas, normalize_county),
+        ):
+            if key_col not in sa.columns:
+                continue
+            keys = sa[key_col].astype(str).str.split(r"[,;\s]+", regex=True)
+            exploded = pd.DataFrame({
+                "key": keys,
+                "area": sa["ServiceAreaId"].astype(str),
+                "state": sa["StateCode"].astype(str) if "StateCode" in sa.columns else "",
+            }).explode("key")
+            exploded["key"] = exploded["key"].map(normalize, na_action="ignore")
+            exploded = exploded.dropna(subset=["key"]).drop_duplicates()
+
+            for key, group in exploded.groupby("key", sort=False):
+                found = set(group["area"])
+                for state in group["state"].unique():
+                    found |= whole_state.get(state, set())
+                target[key] = tuple(sorted(found))
+
+    def areas_for_zip(self, zip_code):
+        return self.zip_areas.get(normalize_zip(zip_code), ())
+
+    def areas_for_county(self, county):
+        return self.county_areas.get(normalize_county(county), ())
+
+    def plans_in_areas(self, areas):
+        """
+        Bitset of plans sold in any of the given service areas
+        """
+        bits = self.none
+        for area in areas:
+            bits = bits | self.area_plans.get(area, self.none)
+        return bits
+
+    def plans_for_zip(self, zip_code):
+        return self.plans_in_areas(self.areas_for_zip(zip_code))
+
+    def plans_for_county(self, county):
+        return self.plans_in_areas(self.areas_for_county(county))
+
+
+def plan_positions(plans, plan_ids):
+    """
+    Position of each PlanId in the plan table (first occurrence), -1 if absent.
+
+    Both sides are compared as strings, so int PlanIds from the plan table
+    match the string PlanIds stored in the rate cube.
+    """
+    first = ~plans["PlanId"].duplicated().to_numpy()
+    index = pd.Index(plans["PlanId"].astype(str).to_numpy()[first])
+    found = index.get_indexer(pd.Index(plan_ids).astype(str))
+    return np.where(found >= 0, np.flatnonzero(first)[found], -1)
+
+
+class PremiumMatrix:
+    """
+    Dense float32 premiums indexed by (plan position, state), NaN where a plan
+    has no rate in a state. The last column holds the plan's mean over all states.
+    """
+
+    def __init__(self, plans, rates):
+        self.states = sorted(rates["StateCode"].dropna().astype(str).unique()) if "StateCode" in rates.columns else []
+        self.state_col = {state: j for j, state in enumerate(self.states)}
+        self.any_col = len(self.states)
+
+        n, m = len(plans), len(self.states) + 1
+        rows = plan_positions(plans, rates["PlanId"])
+        cols = pd.Index(self.states).get_indexer(rates["StateCode"].astype(str)) if self.states else np.full(len(rates), -1)
+        rate = rates["AvgIndividualRate"].to_numpy(dtype=np.float64)
+        valid = (rows >= 0) & ~np.isnan(rate)
+        rows, cols, rate = rows[valid], cols[valid], rate[valid]
+
+        sums = np.zeros((n, m))
+        counts = np.zeros((n, m))
+        state_rows = cols >= 0
+        np.add.at(sums, (rows[state_rows], cols[state_rows]), rate[state_rows])
+        np.add.at(counts, (rows[state_rows], cols[state_rows]), 1)
+        np.add.at(sums[:, self.any_col], rows, rate)
+        np.add.at(counts[:, self.any_col], rows, 1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.values = (sums / counts).astype(np.float32)
+
+        # Per-plan totals over every rate row, for grouped averages
+        self.plan_sums = sums[:, self.any_col]
+        self.plan_counts = counts[:, self.any_col]
+        self.overall_mean = float(rate.mean()) if len(rate) else float("nan")
+
+    def column(self, state):
+        if state in (None, "Any"):
+            return self.any_col
+        return self.state_col.get(state)
+
+    def premiums(self, positions, state=None):
+        """
+        Premiums of the plans at the given positions in a state (or across all states)
+        """
+        col = self.column(state)
+        if col is None:
+            return np.full(len(positions), np.nan, dtype=np.float32)
+        return self.values[positions, col]
+
+    def average_by(self, labels):
+        """
+        Mean premium over all rate rows, grouped by a plan-level label column
+        """
+        codes, groups = pd.factorize(labels)
+        valid = codes >= 0
+        sums = np.bincount(codes[valid], weights=self.plan_sums[valid], minlength=len(groups))
+        counts = np.bincount(codes[valid], weights=self.plan_counts[valid], minlength=len(groups))
+        has_rates = counts > 0
+        return pd.DataFrame({
+            labels.name: np.asarray(groups)[has_rates],
+            "AvgIndividualRate": sums[has_rates] / counts[has_rates],
+        }).sort_values(labels.name, ignore_index=True)
+
+
+def get_premium_matrix(dataset=None):
+    dataset = dataset or get_dataset()
+    return dataset.derived("premium_matrix", lambda ds: PremiumMatrix(ds.plans, ds.rates))
+
+
+def get_service_area_index(dataset=None):
+    dataset = dataset or get_dataset()
+    return dataset.derived("service_area_index", lambda ds: ServiceAreaIndex(ds.plans, ds.service_areas))
+
+
+def get_plan_scorer(dataset=None):
+    dataset = dataset or get_dataset()
+    return dataset.derived("plan_scorer", lambda ds: PlanScorer(ds.plans))
+
+
+def get_keyword_matcher(dataset=None):
+    dataset = dataset or get_dataset()
+    return dataset.derived("keyword_matcher", lambda ds: KeywordMatcher(ds.plans))
+
+
+def get_plan_index(dataset=None):
+    """
+    Bitmap index for the current dataset, shared by all sessions
+    """
+    dataset = dataset or get_dataset()
+    return dataset.derived("plan_bitmap_index", lambda ds: PlanBitmapIndex(ds.plans, ds.service_areas))
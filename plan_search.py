@@ -0,0 +1,269 @@
+import bisect
+
+import numpy as np
+
+from data_store import get_dataset
+from plan_details import normalize_name
+
+# Plans listed by the typeahead before anything is typed, and at most after
+SEARCH_LIMIT = 20
+# Extra score for names in which every typed word starts a word
+PREFIX_BONUS = 1.0
+# Names re-scored by edit similarity when resolving free text
+RESOLVE_CANDIDATES = 6
+# Lowest score a resolved name may have, and the lead it needs over the runner-up
+RESOLVE_MIN_SCORE = 0.55
+RESOLVE_MARGIN = 0.08
+# Names offered back when the text is ambiguous
+RESOLVE_ALTERNATIVES = 8
+FILLER_WORDS = {"a", "an", "the", "plan", "plans", "policy", "insurance", "one", "please"}
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_pattern(text):
+    """
+    Per-character bit masks of a text, for edit_distance()
+    """
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+def edit_distance(pattern, length, text):
+    """
+    Levenshtein distance between a text and the pattern of a string of the
+    given length, with Myers' bit-parallel algorithm (one pass over text)
+    """
+    if not length:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    vp, vn, distance = full, 0, length
+    for char in text:
+        eq = pattern.get(char, 0)
+        xv = eq | vn
+        xh = (((eq & vp) + vp) ^ vp) | eq
+        hp = vn | (~(xh | vp) & full)
+        hn = vp & xh
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(xv | hp) & full)
+        vn = hp & xv
+    return distance
+
+
+class PlanNameIndex:
+    """
+    Word-prefix and trigram index over plan marketing names, plus PlanIds.
+
+    Each distinct normalized name is one entry holding the positions of the
+    plans that carry it. Typed text is matched by word prefix (a bisect into
+    the sorted vocabulary) and by trigram overlap (a bincount over the
+    postings of the query's trigrams), so a search never scans the names.
+    """
+
+    def __init__(self, plans):
+        self.size = len(plans)
+        names = plans["PlanMarketingName"] if "PlanMarketingName" in plans.columns else []
+        plan_ids = plans["PlanId"].astype(str).tolist() if "PlanId" in plans.columns else [""] * self.size
+
+        self.keys, self.names, self.positions = [], [], []
+        entry_of = {}
+        for position, name in enumerate(names):
+            if name != name or name is None:
+                continue
+            key = normalize_name(name)
+            if key not in entry_of:
+                entry_of[key] = len(self.keys)
+                self.keys.append(key)
+                self.names.append(str(name))
+                self.positions.append([])
+            self.positions[entry_of[key]].append(position)
+
+        # Trigram postings and each entry's trigram count, for Dice similarity
+        postings = {}
+        self.trigram_counts = np.zeros(len(self.keys), dtype=np.int32)
+        for entry, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.trigram_counts[entry] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(entry)
+        self.postings = {gram: np.array(entries, dtype=np.int32) for gram, entries in postings.items()}
+
+        # Sorted vocabulary with the entries using each word, for prefix ranges
+        word_entries = {}
+        for entry, key in enumerate(self.keys):
+            for word in set(key.split()):
+                word_entries.setdefault(word, []).append(entry)
+        self.words = sorted(word_entries)
+        self.vocabulary = set(self.words)
+        self.word_entries = [np.array(word_entries[word], dtype=np.int32) for word in self.words]
+
+        # PlanIds and StandardComponentIds, sorted for prefix ranges
+        ids = {plan_id.lower(): position for position, plan_id in enumerate(plan_ids)}
+        if "StandardComponentId" in plans.columns:
+            for position, component_id in enumerate(plans["StandardComponentId"].astype(str)):
+                ids.setdefault(component_id.lower(), position)
+        self.positions_by_id = ids
+        self.ids = sorted(ids)
+        self.id_positions = [ids[plan_id] for plan_id in self.ids]
+        self.plan_ids = plan_ids
+        self.entry_of = np.full(self.size, -1, dtype=np.int32)
+        for entry, positions in enumerate(self.positions):
+            self.entry_of[positions] = entry
+        self.first_positions = [self.positions[entry][0] for entry in np.argsort(self.keys, kind="stable")]
+
+    def _id_matches(self, text, limit):
+        text = text.strip().lower()
+        start = bisect.bisect_left(self.ids, text)
+        end = bisect.bisect_left(self.ids, text + "\uffff", start, min(len(self.ids), start + limit))
+        return self.id_positions[start:end]
+
+    def _prefix_entries(self, word):
+        start = bisect.bisect_left(self.words, word)
+        end = bisect.bisect_left(self.words, word + "\uffff", start)
+        if start == end:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(self.word_entries[start:end]))
+
+    def _word_prefix_entries(self, key):
+        """
+        Entries in which every word of a normalized text starts a word
+        """
+        prefix = None
+        for word in key.split():
+            entries = self._prefix_entries(word)
+            prefix = entries if prefix is None else np.intersect1d(prefix, entries, assume_unique=True)
+        return np.zeros(0, dtype=np.int32) if prefix is None else prefix
+
+    def similarity(self, key):
+        """
+        Dice similarity of every entry's trigrams to those of a normalized text
+        """
+        grams = [gram for gram in trigrams(key) if gram in self.postings]
+        if not grams:
+            return np.zeros(len(self.keys))
+        shared = np.bincount(np.concatenate([self.postings[gram] for gram in grams]), minlength=len(self.keys))
+        return 2.0 * shared / (len(trigrams(key)) + self.trigram_counts)
+
+    def match(self, text, limit=SEARCH_LIMIT):
+        """
+        Best entries for typed text as (entry, score), best first
+        """
+        key = normalize_name(text)
+        if not key or not self.keys:
+            return []
+        scores = self.similarity(key)
+        prefix = self._word_prefix_entries(key)
+        if len(prefix):
+            scores[prefix] += PREFIX_BONUS
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        order = sorted(candidates, key=lambda entry: (-scores[entry], self.keys[entry]))
+        return [(int(entry), float(scores[entry])) for entry in order]
+
+    def resolve(self, text):
+        """
+        Map free text to a plan name, tolerating typos and partial names.
+
+        An exact name or PlanId wins. Otherwise names in which every typed
+        word starts a word are taken, as in the typeahead, and only if none
+        are the few names closest by trigrams are re-scored by edit
+        similarity. Returns the resolved name and its PlanIds, or no name and
+        up to RESOLVE_ALTERNATIVES candidates (with the count left out in
+        "more") when the text is ambiguous.
+        """
+        resolution = {"name": None, "plan_ids": [], "alternatives": [], "more": 0}
+        # PlanIds keep their hyphens, e.g. "12345AK0010001-01", so check them before normalizing
+        position = self.positions_by_id.get(str(text).strip().lower())
+        if position is not None and self.entry_of[position] >= 0:
+            return dict(resolution, name=self.names[self.entry_of[position]], plan_ids=[self.plan_ids[position]])
+
+        # Filler words the catalog does not use, as in "the Oscar Select plan"
+        key = " ".join(word for word in normalize_name(text).split() if word not in FILLER_WORDS or word in self.vocabulary)
+        if not key or not self.keys:
+            return resolution
+
+        # An id among filler words, as in "plan 12345AK0010001"
+        position = self.positions_by_id.get(key)
+        if position is not None and self.entry_of[position] >= 0:
+            return dict(resolution, name=self.names[self.entry_of[position]], plan_ids=[self.plan_ids[position]])
+
+        dice = self.similarity(key)
+        prefix = self._word_prefix_entries(key)
+        exact = [entry for entry in prefix if self.keys[entry] == key]
+        if exact:
+            prefix = exact
+        if len(prefix) == 1:
+            return self._resolved(prefix[0])
+        if len(prefix) > 1:
+            # "Aetna" or "Bright Health Premium" name several plans; ask which one
+            # Names that begin with the text come first, then by trigram similarity
+            ranked = sorted(prefix, key=lambda entry: (not self.keys[entry].startswith(key), -dice[entry], self.keys[entry]))
+            resolution["alternatives"] = [self.names[entry] for entry in ranked[:RESOLVE_ALTERNATIVES]]
+            resolution["more"] = max(0, len(ranked) - RESOLVE_ALTERNATIVES)
+            return resolution
+
+        candidates = np.flatnonzero(dice > 0)
+        if len(candidates) > RESOLVE_CANDIDATES:
+            candidates = candidates[np.argpartition(-dice[candidates], RESOLVE_CANDIDATES - 1)[:RESOLVE_CANDIDATES]]
+        pattern = edit_pattern(key)
+        scored = []
+        for entry in candidates:
+            name = self.keys[entry]
+            similarity = 1 - edit_distance(pattern, len(key), name) / max(len(key), len(name))
+            scored.append((0.5 * dice[entry] + 0.5 * similarity, int(entry)))
+        scored.sort(key=lambda item: (-item[0], self.keys[item[1]]))
+        scored = [(score, entry) for score, entry in scored if score >= RESOLVE_MIN_SCORE]
+        if not scored:
+            return resolution
+
+        best_score, best = scored[0]
+        close = [entry for score, entry in scored if best_score - score < RESOLVE_MARGIN]
+        if len(close) > 1:
+            resolution["alternatives"] = [self.names[entry] for entry in close]
+            return resolution
+        return self._resolved(best)
+
+    def _resolved(self, entry):
+        return {
+            "name": self.names[entry],
+            "plan_ids": [self.plan_ids[position] for position in self.positions[entry]],
+            "alternatives": [],
+            "more": 0,
+        }
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """
+        Plan positions for the typeahead: plans whose ID starts with the text
+        first, then plans under the best-matching names; the first names A-Z
+        if nothing is typed
+        """
+        if not text.strip():
+            return self.first_positions[:limit]
+        results = list(dict.fromkeys(self._id_matches(text, limit)))
+        seen = set(results)
+        for entry, _ in self.match(text, limit):
+            results += [position for position in self.positions[entry] if position not in seen]
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+def get_plan_name_index(dataset=None):
+    """
+    Plan name search index for the current dataset, shared by all sessions
+    """
+    dataset = dataset or get_dataset()
+    return dataset.derived("plan_name_index", lambda ds: PlanNameIndex(ds.plans))
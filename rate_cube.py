@@ -0,0 +1,304 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import RATE_CUBE_FILE, get_dataset
+from plan_index import plan_positions
+
+# Age axis of the cube, same range filtered_rate2.py keeps
+MIN_AGE, MAX_AGE = 18, 64
+AGES = np.arange(MIN_AGE, MAX_AGE + 1)
+
+NON_TOBACCO, TOBACCO = 0, 1
+
+
+def parse_age(series):
+    """
+    Numeric age from CMS values such as "30" or "64 and over"; bands like "0-14" drop out
+    """
+    return pd.to_numeric(series.astype(str).str.extract(r"^\s*(\d+)(?: and over)?\s*$")[0], errors="coerce")
+
+
+class RateCube:
+    """
+    IndividualRate and IndividualTobaccoRate by (PlanId, StateCode, Age) in one
+    contiguous float32 array of shape (pairs, ages, 2), NaN where no rate was filed.
+
+    Prefix sums over the age axis make the average over any age band O(1).
+    """
+
+    def __init__(self, plan_ids, state_codes, rates):
+        self.plan_ids = np.asarray(plan_ids).astype(str)
+        self.state_codes = np.asarray(state_codes).astype(str)
+        self.rates = np.ascontiguousarray(rates, dtype=np.float32)
+        self.row = {key: i for i, key in enumerate(zip(self.plan_ids.tolist(), self.state_codes.tolist()))}
+
+        present = ~np.isnan(self.rates)
+        zeros = np.zeros((len(self.rates), 1, 2))
+        self._sums = np.concatenate([zeros, np.cumsum(np.where(present, self.rates, 0), axis=1)], axis=1).astype(np.float32)
+        self._counts = np.concatenate([zeros, np.cumsum(present, axis=1)], axis=1).astype(np.uint8)
+
+    def __len__(self):
+        return len(self.rates)
+
+    @classmethod
+    def from_sums(cls, plan_ids, state_codes, sums, counts):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = sums / counts
+        # Plans without a tobacco surcharge bill smokers the standard rate
+        rates[:, :, TOBACCO] = np.where(np.isnan(rates[:, :, TOBACCO]), rates[:, :, NON_TOBACCO], rates[:, :, TOBACCO])
+        return cls(plan_ids, state_codes, rates)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a cube from raw rate rows (PlanId, StateCode, Age, IndividualRate[, IndividualTobaccoRate])
+        """
+        return RateAccumulator().add(df).to_cube()
+
+    def save(self, path=RATE_CUBE_FILE):
+        np.savez(path, plan_ids=self.plan_ids, state_codes=self.state_codes, rates=self.rates)
+
+    @classmethod
+    def load(cls, path=RATE_CUBE_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["plan_ids"], data["state_codes"], data["rates"])
+
+    def lookup(self, plan_id, state, age, tobacco=False):
+        """
+        Single rate for a plan, state and age, or NaN
+        """
+        row = self.row.get((str(plan_id), str(state)))
+        if row is None or not MIN_AGE <= age <= MAX_AGE:
+            return float("nan")
+        return float(self.rates[row, age - MIN_AGE, TOBACCO if tobacco else NON_TOBACCO])
+
+    def band_mean(self, rows, min_age, max_age, tobacco=False):
+        """
+        Average rate over an inclusive age band for each cube row (-1 rows give NaN)
+        """
+        rows = np.asarray(rows)
+        lo = int(np.clip(min_age, MIN_AGE, MAX_AGE + 1)) - MIN_AGE
+        hi = int(np.clip(max_age, MIN_AGE - 1, MAX_AGE)) - MIN_AGE + 1
+        if hi <= lo:
+            return np.full(len(rows), np.nan, dtype=np.float32)
+
+        kind = TOBACCO if tobacco else NON_TOBACCO
+        valid = rows >= 0
+        safe = np.where(valid, rows, 0)
+        sums = self._sums[safe, hi, kind] - self._sums[safe, lo, kind]
+        counts = self._counts[safe, hi, kind].astype(np.int32) - self._counts[safe, lo, kind]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(valid & (counts > 0), sums / counts, np.nan).astype(np.float32)
+
+
+class RateAccumulator:
+    """
+    Running totals of raw rate rows per (PlanId, StateCode), fed one chunk at a time.
+
+    Keeps the per-age sums and counts behind the rate cube, plus count, sum, min,
+    max and a log-spaced histogram of the standard rate for the averaged rate
+    file. Memory grows with the number of plan/state pairs, never with rows, and
+    partial accumulators built by separate workers combine with merge().
+    """
+
+    # Histogram over log10(rate) from $1 to $100,000; a bin spans about 9%
+    HIST_BINS = 128
+    HIST_LOG_MIN, HIST_LOG_MAX = 0.0, 5.0
+
+    ARRAYS = ("sums", "counts", "n", "total", "min", "max", "hist")
+
+    def __init__(self):
+        self.keys = []
+        self.row = {}
+        self._allocate(0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _allocate(self, capacity):
+        self.sums = np.zeros((capacity, len(AGES), 2))
+        self.counts = np.zeros((capacity, len(AGES), 2), dtype=np.int64)
+        self.n = np.zeros(capacity, dtype=np.int64)
+        self.total = np.zeros(capacity)
+        self.min = np.full(capacity, np.inf)
+        self.max = np.full(capacity, -np.inf)
+        self.hist = np.zeros((capacity, self.HIST_BINS), dtype=np.int64)
+
+    def _rows(self, keys):
+        """
+        Accumulator rows for (PlanId, StateCode) keys, adding rows for new keys
+        """
+        rows = np.empty(len(keys), dtype=np.intp)
+        for i, key in enumerate(keys):
+            row = self.row.get(key)
+            if row is None:
+                row = self.row[key] = len(self.keys)
+                self.keys.append(key)
+            rows[i] = row
+
+        capacity = len(self.n)
+        if len(self.keys) > capacity:
+            old = {name: getattr(self, name) for name in self.ARRAYS}
+            self._allocate(max(len(self.keys), 2 * capacity, 1024))
+            for name, values in old.items():
+                getattr(self, name)[:capacity] = values
+        return rows
+
+    def _bins(self, rate):
+        scaled = (np.log10(np.maximum(rate, 1.0)) - self.HIST_LOG_MIN) / (self.HIST_LOG_MAX - self.HIST_LOG_MIN)
+        return np.clip((scaled * self.HIST_BINS).astype(np.intp), 0, self.HIST_BINS - 1)
+
+    def add(self, df):
+        """
+        Fold one chunk of raw rate rows into the totals; returns self
+        """
+        df = df.dropna(subset=["PlanId", "StateCode"])
+        codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([df["PlanId"].astype(str), df["StateCode"].astype(str)]))
+        rows = self._rows(list(uniques))[codes]
+
+        # Cube: both rates by parsed age (so "64 and over" counts as 64)
+        ages = parse_age(df["Age"]).to_numpy(dtype=float)
+        in_cube = (ages >= MIN_AGE) & (ages <= MAX_AGE)
+        age_idx = np.where(in_cube, ages - MIN_AGE, 0).astype(np.intp)
+        for kind, col in ((NON_TOBACCO, "IndividualRate"), (TOBACCO, "IndividualTobaccoRate")):
+            if col not in df.columns:
+                continue
+            rate = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            ok = in_cube & ~np.isnan(rate)
+            np.add.at(self.sums, (rows[ok], age_idx[ok], kind), rate[ok])
+            np.add.at(self.counts, (rows[ok], age_idx[ok], kind), 1)
+
+        # Averaged file: non-tobacco rows with a plain numeric age of 18-64
+        rate = pd.to_numeric(df["IndividualRate"], errors="coerce").to_numpy(dtype=float)
+        ok = pd.to_numeric(df["Age"], errors="coerce").between(MIN_AGE, MAX_AGE).to_numpy() & ~np.isnan(rate)
+        if "Tobacco" in df.columns:
+            ok &= (df["Tobacco"].astype(str).str.lower() == "no").to_numpy()
+        rows, rate = rows[ok], rate[ok]
+        np.add.at(self.n, rows, 1)
+        np.add.at(self.total, rows, rate)
+        np.minimum.at(self.min, rows, rate)
+        np.maximum.at(self.max, rows, rate)
+        np.add.at(self.hist, (rows, self._bins(rate)), 1)
+        return self
+
+    def merge(self, other):
+        """
+        Fold another accumulator's totals into this one; returns self
+        """
+        rows = self._rows(other.keys)
+        m = len(other)
+        self.sums[rows] += other.sums[:m]
+        self.counts[rows] += other.counts[:m]
+        self.n[rows] += other.n[:m]
+        self.total[rows] += other.total[:m]
+        self.min[rows] = np.minimum(self.min[rows], other.min[:m])
+        self.max[rows] = np.maximum(self.max[rows], other.max[:m])
+        self.hist[rows] += other.hist[:m]
+        return self
+
+    def to_cube(self):
+        m = len(self)
+        rated = self.counts[:m].any(axis=(1, 2))
+        keys = np.array(self.keys, dtype=str).reshape(m, 2)[rated]
+        return RateCube.from_sums(keys[:, 0], keys[:, 1], self.sums[:m][rated], self.counts[:m][rated])
+
+    def percentile(self, q):
+        """
+        Approximate q-th percentile (0-100) of the standard rate for each pair, from the histogram
+        """
+        m = len(self)
+        hist, n = self.hist[:m], self.n[:m]
+        cum = hist.cumsum(axis=1)
+        target = n * q / 100
+        bins = (cum < target[:, None]).sum(axis=1).clip(max=self.HIST_BINS - 1)
+        before = np.take_along_axis(cum, bins[:, None], axis=1)[:, 0] - hist[np.arange(m), bins]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.clip((target - before) / hist[np.arange(m), bins], 0, 1)
+        width = (self.HIST_LOG_MAX - self.HIST_LOG_MIN) / self.HIST_BINS
+        value = 10 ** (self.HIST_LOG_MIN + (bins + frac) * width)
+        # The exact extremes are known, so never report past them
+        return np.where(n > 0, np.clip(value, self.min[:m], self.max[:m]), np.nan)
+
+    def _frame(self, columns):
+        m = len(self)
+        keys = np.array(self.keys, dtype=object).reshape(m, 2)
+        df = pd.DataFrame({"PlanId": keys[:, 0], "StateCode": keys[:, 1], **columns})
+        return df[self.n[:m] > 0].sort_values(["PlanId", "StateCode"], ignore_index=True)
+
+    def averages(self):
+        """
+        AvgIndividualRate per plan and state, the filtered_rate2.csv layout
+        """
+        m = len(self)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._frame({"AvgIndividualRate": self.total[:m] / self.n[:m]})
+
+    def summary(self, percentiles=(50, 90)):
+        """
+        Row count, min, max and approximate percentiles of the standard rate per plan and state
+        """
+        m = len(self)
+        columns = {"RateCount": self.n[:m], "MinIndividualRate": self.min[:m]}
+        for q in percentiles:
+            columns[f"P{q}IndividualRate"] = self.percentile(q)
+        columns["MaxIndividualRate"] = self.max[:m]
+        return self._frame(columns)
+
+
+class PlanQuotes:
+    """
+    Maps plan-table positions to cube rows so a page can quote many plans at once.
+
+    The "any state" quote uses a second cube averaging each plan's states per age.
+    """
+
+    def __init__(self, plans, cube):
+        self.cube = cube
+        self.states = sorted(set(cube.state_codes.tolist()))
+        self.state_col = {state: j for j, state in enumerate(self.states)}
+
+        positions = plan_positions(plans, cube.plan_ids)
+        cols = pd.Index(self.states).get_indexer(cube.state_codes)
+        known = positions >= 0
+        self.rows = np.full((len(plans), len(self.states)), -1, dtype=np.int32)
+        self.rows[positions[known], cols[known]] = np.flatnonzero(known)
+
+        # Average each plan's states age by age
+        present = ~np.isnan(cube.rates)
+        plan_codes, plan_ids = pd.factorize(cube.plan_ids)
+        sums = np.zeros((len(plan_ids), len(AGES), 2))
+        counts = np.zeros((len(plan_ids), len(AGES), 2))
+        np.add.at(sums, plan_codes, np.where(present, cube.rates, 0))
+        np.add.at(counts, plan_codes, present)
+        self.any_cube = RateCube.from_sums(plan_ids, np.full(len(plan_ids), "*"), sums, counts)
+
+        any_positions = plan_positions(plans, plan_ids)
+        self.any_rows = np.full(len(plans), -1, dtype=np.int32)
+        self.any_rows[any_positions[any_positions >= 0]] = np.flatnonzero(any_positions >= 0)
+
+    def quotes(self, positions, state, min_age, max_age, tobacco=False):
+        """
+        Average premium over the age band for the plans at the given positions, NaN if unrated
+        """
+        if state in (None, "Any"):
+            return self.any_cube.band_mean(self.any_rows[positions], min_age, max_age, tobacco)
+        col = self.state_col.get(state)
+        if col is None:
+            return np.full(len(positions), np.nan, dtype=np.float32)
+        return self.cube.band_mean(self.rows[positions, col], min_age, max_age, tobacco)
+
+
+def get_plan_quotes(dataset=None):
+    """
+    Personalized quotes for the current dataset, or None when no rate cube has been built
+    """
+    dataset = dataset or get_dataset()
+
+    def build(ds):
+        if ds.is_sample or not os.path.exists(RATE_CUBE_FILE):
+            return None
+        return PlanQuotes(ds.plans, RateCube.load(RATE_CUBE_FILE))
+
+    return dataset.derived("plan_quotes", build)
@@ -0,0 +1,198 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import get_dataset
+from plan_index import get_premium_matrix, top_k
+
+# BM25 parameters
+K1, B = 1.5, 0.75
+
+# Extra words a plan's flags contribute to its document
+FLAG_TERMS = {
+    "WellnessProgramOffered": "wellness program fitness preventive",
+    "DiseaseManagementProgramsOffered": "disease management chronic condition mental health diabetes",
+    "IsNoticeRequiredForPregnancy": "maternity pregnancy pregnant prenatal baby",
+    "ChildOnlyOffering": "child children kids pediatric",
+    "IsHSAEligible": "hsa health savings account",
+    "DentalOnlyPlan": "dental teeth",
+    "OutOfCountryCoverage": "international abroad travel",
+    "OutOfServiceAreaCoverage": "nationwide travel",
+    "SpecialistRequiringReferral": "referral",
+    "IsNewPlan": "new",
+}
+LABEL_COLUMNS = ["PlanMarketingName", "MetalLevel", "PlanType", "MarketCoverage", "StateCode"]
+
+# Query words that say nothing about which plan fits
+STOPWORDS = set("""
+a an and are as at be best can do does for from get give good have how i in is it me my need of on or
+our plan please recommend show some suggest tell that the their there this to type us user want we
+what which with would you your query question follow up
+""".split())
+
+
+def tokenize(text):
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", str(text).lower()):
+        # Light stemming so "plans"/"benefits" match "plan"/"benefit"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _row_signatures(plans, benefits):
+    """
+    One hash per plan over its own row and its benefit rows, to spot unchanged plans
+    """
+    signatures = pd.util.hash_pandas_object(plans.astype(str), index=False).to_numpy()
+    if len(benefits) and "PlanId" in benefits.columns:
+        benefit_hashes = pd.Series(pd.util.hash_pandas_object(benefits.astype(str), index=False).to_numpy())
+        per_plan = benefit_hashes.groupby(benefits["PlanId"].astype(str).to_numpy()).sum()
+        signatures = signatures ^ per_plan.reindex(plans["PlanId"].astype(str)).fillna(0).to_numpy(dtype=np.uint64)
+    return signatures
+
+
+def _document(plan, plan_benefits):
+    words = [plan.get(col, "") for col in LABEL_COLUMNS]
+    words += [terms for col, terms in FLAG_TERMS.items() if bool(plan.get(col, False))]
+    for benefit in plan_benefits:
+        words += [benefit.get("BenefitName", ""), benefit.get("CoverageLevel", "")]
+    return tokenize(" ".join(str(word) for word in words if word is not None and word == word))
+
+
+class PlanRetriever:
+    """
+    BM25 index over one document per plan: its name, labels, flag keywords and
+    the benefits listed for it.
+
+    Postings store each document's precomputed BM25 weight per term, so a query
+    is one bincount over the postings of its terms. Tokenized documents are
+    kept by a hash of each plan's rows, and the next build reuses them for
+    every plan that did not change.
+    """
+
+    def __init__(self, plans, benefits, premiums, previous=None):
+        self.size = len(plans)
+        self.names = plans["PlanMarketingName"].astype(str).to_numpy() if "PlanMarketingName" in plans.columns else np.full(self.size, "")
+        self.premiums = np.asarray(premiums, dtype=float)
+        self.signatures = _row_signatures(plans, benefits)
+
+        # Benefit names and coverage levels per plan, in one pass over the benefits
+        by_plan = {}
+        if len(benefits) and "PlanId" in benefits.columns:
+            columns = [col for col in ("BenefitName", "CoverageLevel") if col in benefits.columns]
+            for plan_id, *values in zip(benefits["PlanId"].astype(str), *(benefits[col] for col in columns)):
+                by_plan.setdefault(plan_id, []).append(dict(zip(columns, values)))
+        plan_ids = plans["PlanId"].astype(str).tolist() if "PlanId" in plans.columns else [""] * self.size
+        self.benefit_names = [
+            sorted({str(b["BenefitName"]) for b in by_plan.get(plan_id, []) if b.get("BenefitName") == b.get("BenefitName")})
+            for plan_id in plan_ids
+        ]
+
+        cached = previous.documents_by_signature if previous is not None else {}
+        self.documents_by_signature = {}
+        self.reused = 0
+        documents = []
+        for plan, plan_id, signature in zip(plans.to_dict("records"), plan_ids, self.signatures.tolist()):
+            document = cached.get(signature)
+            if document is None:
+                document = _document(plan, by_plan.get(plan_id, []))
+            else:
+                self.reused += 1
+            self.documents_by_signature[signature] = document
+            documents.append(document)
+
+        self._build_postings(documents)
+
+    def _build_postings(self, documents):
+        lengths = np.array([len(document) for document in documents], dtype=float)
+        avg_length = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+
+        doc_ids, terms = [], []
+        for doc_id, document in enumerate(documents):
+            doc_ids.extend([doc_id] * len(document))
+            terms.extend(document)
+        pairs = pd.DataFrame({"doc": doc_ids, "term": terms}).value_counts().reset_index(name="tf")
+
+        self.postings = {}
+        for term, group in pairs.groupby("term", sort=False):
+            docs = group["doc"].to_numpy()
+            tf = group["tf"].to_numpy(dtype=float)
+            idf = np.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            weight = idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[docs] / avg_length))
+            self.postings[term] = (docs, weight)
+
+    def scores(self, query):
+        terms = [term for term in tokenize(query) if term not in STOPWORDS and term in self.postings]
+        if not terms:
+            return np.zeros(self.size)
+        docs = np.concatenate([self.postings[term][0] for term in terms])
+        weights = np.concatenate([self.postings[term][1] for term in terms])
+        return np.bincount(docs, weights=weights, minlength=self.size)
+
+    def search(self, query, k=5):
+        """
+        Positions of the k best-matching plans with distinct names; ties (and
+        queries that match nothing) go to the lowest premium
+        """
+        scores = self.scores(query)
+        best = top_k(scores, self.premiums, min(self.size, 4 * k))
+        results, seen = [], set()
+        for position in best:
+            if self.names[position] not in seen:
+                seen.add(self.names[position])
+                results.append(int(position))
+                if len(results) == k:
+                    break
+        return results
+
+    def summarize(self, plans, positions):
+        """
+        Compact one-line-per-plan summary of catalog rows for the model prompt
+        """
+        lines = []
+        for position in positions:
+            plan = plans.iloc[position]
+            features = [label for col, label in (
+                ("WellnessProgramOffered", "wellness program"),
+                ("DiseaseManagementProgramsOffered", "disease management"),
+                ("IsNoticeRequiredForPregnancy", "maternity support"),
+                ("IsHSAEligible", "HSA eligible"),
+                ("DentalOnlyPlan", "dental only"),
+            ) if bool(plan.get(col, False))]
+            line = (
+                f"- {self.names[position]}: {plan.get('MetalLevel')} {plan.get('PlanType')}, "
+                f"{plan.get('MarketCoverage')} coverage in {plan.get('StateCode')}"
+            )
+            if not np.isnan(self.premiums[position]):
+                line += f", avg premium ₹{self.premiums[position]:.0f}/month"
+            if features:
+                line += f"; {', '.join(features)}"
+            if self.benefit_names[position]:
+                line += f"; benefits: {', '.join(self.benefit_names[position][:6])}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+_last_retriever = None
+_last_retriever_lock = threading.Lock()
+
+
+def get_plan_retriever(dataset=None):
+    """
+    Retrieval index for the current dataset, built incrementally from the previous one
+    """
+    dataset = dataset or get_dataset()
+
+    def build(ds):
+        global _last_retriever
+        with _last_retriever_lock:
+            matrix = get_premium_matrix(ds)
+            premiums = matrix.values[:, matrix.any_col]
+            _last_retriever = PlanRetriever(ds.plans, ds.benefits, premiums, previous=_last_retriever)
+            return _last_retriever
+
+    return dataset.derived("plan_retriever", build)
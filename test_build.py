@@ -0,0 +1,38 @@
+import os
+
+import build
+
+
+def _stage():
+    return build.Stage("example", "example.py", ["in.csv"], ["out.csv"])
+
+
+def test_cache_keeps_last_runs_per_stage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(build, "BUILD_CACHE_KEYS", 2)
+    stage = _stage()
+    for i, key in enumerate(["k1", "k2", "k3", "k4"]):
+        (tmp_path / "out.csv").write_text(key)
+        build.store_in_cache(stage, key)
+        # Distinct mtimes even on coarse filesystem clocks
+        os.utime(os.path.join(build.CACHE_DIR, stage.name, key), ns=(0, (i + 1) * 10**9))
+    assert sorted(os.listdir(os.path.join(build.CACHE_DIR, stage.name))) == ["k3", "k4"]
+
+    # Restoring a run marks it recently used
+    assert build.restore_from_cache(stage, "k3")
+    assert (tmp_path / "out.csv").read_text() == "k3"
+    (tmp_path / "out.csv").write_text("k5")
+    build.store_in_cache(stage, "k5")
+    assert sorted(os.listdir(os.path.join(build.CACHE_DIR, stage.name))) == ["k3", "k5"]
+    assert not build.restore_from_cache(stage, "k4")
+
+
+def test_eviction_can_keep_fewer_runs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stage = _stage()
+    for i, key in enumerate(["k1", "k2"]):
+        (tmp_path / "out.csv").write_text(key)
+        build.store_in_cache(stage, key)
+        os.utime(os.path.join(build.CACHE_DIR, stage.name, key), ns=(0, (i + 1) * 10**9))
+    build.evict_from_cache(stage, keep=1)
+    assert os.listdir(os.path.join(build.CACHE_DIR, stage.name)) == ["k2"]
@@ -0,0 +1,73 @@
+import plotly.express as px
+import plotly.io as pio
+
+import charts
+from charts import FigureCache, cached_chart
+
+
+def _builder(calls, value):
+    def build():
+        calls.append(value)
+        return px.bar(x=["a"], y=[value])
+    return build
+
+
+def test_figures_are_built_once_per_key():
+    cache = FigureCache()
+    calls = []
+    first = cache.get_or_build(("metal", (), "v1"), _builder(calls, 1))
+    again = cache.get_or_build(("metal", (), "v1"), _builder(calls, 2))
+    assert again is first
+    assert calls == [1]
+
+    # A new data version is a new figure
+    cache.get_or_build(("metal", (), "v2"), _builder(calls, 3))
+    assert calls == [1, 3]
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 2}
+
+
+def test_least_recently_used_figure_is_evicted():
+    cache = FigureCache(max_entries=2)
+    calls = []
+    cache.get_or_build("a", _builder(calls, 1))
+    cache.get_or_build("b", _builder(calls, 2))
+    cache.get_or_build("a", _builder(calls, 3))
+    cache.get_or_build("c", _builder(calls, 4))
+    cache.get_or_build("a", _builder(calls, 5))
+    cache.get_or_build("b", _builder(calls, 6))
+    assert calls == [1, 2, 4, 6]
+
+
+def test_spec_is_the_figure_json():
+    figure = px.bar(x=["a", "b"], y=[1, 2], height=300)
+    spec = FigureCache().get_or_build("bar", lambda: figure)
+    assert spec.json == pio.to_json(figure, validate=False)
+    assert spec.height == 300
+    assert FigureCache().get_or_build("bar", lambda: px.bar(x=["a"], y=[1])).height == charts.DEFAULT_CHART_HEIGHT
+
+
+def test_hit_does_not_serialize_again(monkeypatch):
+    serialized = []
+    to_json = pio.to_json
+
+    def counting_to_json(*args, **kwargs):
+        serialized.append(1)
+        return to_json(*args, **kwargs)
+
+    monkeypatch.setattr(charts.pio, "to_json", counting_to_json)
+    cache = FigureCache()
+    calls = []
+    first = cache.get_or_build("metal", _builder(calls, 1))
+    assert len(serialized) == 1
+    again = cache.get_or_build("metal", _builder(calls, 2))
+    assert again is first
+    assert len(serialized) == 1 and calls == [1]
+
+
+def test_filter_order_does_not_matter():
+    calls = []
+    first = cached_chart("test_state", {"StateCode": "CA", "MetalLevel": None}, "v1", _builder(calls, 1))
+    again = cached_chart("test_state", {"MetalLevel": None, "StateCode": "CA"}, "v1", _builder(calls, 2))
+    other = cached_chart("test_state", {"StateCode": "NY", "MetalLevel": None}, "v1", _builder(calls, 3))
+    assert again is first and other is not first
+    assert calls == [1, 3]
@@ -0,0 +1,21 @@
+from conversation import SUMMARY_MAX_LINES, Conversation, estimate_tokens
+
+
+def test_summary_is_bounded():
+    conversation = Conversation(max_messages=4)
+    for i in range(SUMMARY_MAX_LINES + 40):
+        conversation.add("user", f"Question number {i}?")
+    assert len(conversation) == 4
+    assert len(conversation.summary) == SUMMARY_MAX_LINES
+    assert conversation.summary[-1] == f"User: Question number {SUMMARY_MAX_LINES + 35}?"
+
+
+def test_context_fits_budget_and_keeps_latest_turn():
+    conversation = Conversation(max_messages=6)
+    for i in range(20):
+        conversation.add("user", f"Which plan covers item {i}? " + "detail " * 30)
+        conversation.add("assistant", f"Plan {i} covers it. " + "because " * 30)
+    context = conversation.context(budget=300)
+    assert estimate_tokens(context) <= 300 + 20
+    assert "Plan 19 covers it." in context
+    assert "Summary of earlier conversation:" in context
@@ -0,0 +1,174 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_store
+
+
+def _write_csv(path, rate=320.0):
+    pd.DataFrame({"PlanId": [1, 2], "MetalLevel": ["Gold", "Silver"], "AvgIndividualRate": [rate, 210.5]}).to_csv(path, index=False)
+
+
+def test_snapshot_survives_touch(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    csv_path = str(tmp_path / "plans.csv")
+    _write_csv(csv_path)
+    data_store.write_snapshot(csv_path)
+
+    # Same content with a new mtime, as after touch or git checkout
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    snapshot = data_store.read_snapshot(csv_path)
+    assert snapshot is not None
+    assert snapshot[0]["PlanId"].tolist() == [1, 2]
+
+
+def test_snapshot_rejected_after_edit(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    csv_path = str(tmp_path / "plans.csv")
+    _write_csv(csv_path)
+    data_store.write_snapshot(csv_path)
+
+    # Same size, different content
+    stat = os.stat(csv_path)
+    _write_csv(csv_path, rate=321.0)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert data_store.read_snapshot(csv_path) is None
+
+
+def _write_rates_csv(path, rows=60000, seed=1):
+    # Skewed strata: one large state, a few small ones, one with only a handful of rows
+    rng = np.random.default_rng(seed)
+    states = rng.choice(["TX", "FL", "OH", "AK"], size=rows, p=[0.8, 0.15, 0.0499, 0.0001])
+    metals = rng.choice(["Bronze", "Silver", "Gold"], size=rows, p=[0.5, 0.4, 0.1])
+    pd.DataFrame({
+        "StateCode": states,
+        "MetalLevel": metals,
+        "PlanId": [f"{i:05d}TX00100{i % 100:02d}" for i in range(rows)],
+        "IndividualRate": rng.uniform(100, 900, rows).round(2),
+    }).to_csv(path, index=False)
+    return pd.read_csv(path)
+
+
+def test_budgeted_load_keeps_every_stratum_in_proportion(tmp_path):
+    csv_path = str(tmp_path / "rates.csv")
+    full = _write_rates_csv(csv_path)
+    budget_mb = 0.5
+    df, report = data_store.load_within_budget(csv_path, budget_mb, chunksize=4000)
+
+    assert report["sampled"]
+    assert report["rows_read"] == len(full)
+    assert report["rows_kept"] == len(df)
+    assert report["sampling_ratio"] == len(df) / len(full)
+    assert len(df) < len(full)
+    assert report["memory_mb"] <= budget_mb
+
+    # Every state and metal level survives with its share of the rows
+    strata = ["StateCode", "MetalLevel"]
+    expected = full.groupby(strata).size() / len(full)
+    shares = df.groupby(strata, observed=True).size().reindex(expected.index, fill_value=0) / len(df)
+    assert (shares > 0).all()
+    large = expected >= 0.01
+    assert (abs(shares[large] - expected[large]) <= 0.1 * expected[large] + 0.002).all()
+
+
+def _write_small_strata_csv(path, seed=0):
+    # One large stratum and sixty of twenty rows each, shuffled together
+    rng = np.random.default_rng(seed)
+    small = [(f"S{i:02d}", metal) for i in range(20) for metal in ("Bronze", "Silver", "Gold")]
+    rows = [("TX", "Silver")] * 40000 + [stratum for stratum in small for _ in range(20)]
+    rows = [rows[i] for i in rng.permutation(len(rows))]
+    pd.DataFrame({
+        "StateCode": [state for state, _ in rows],
+        "MetalLevel": [metal for _, metal in rows],
+        "PlanId": [f"{i:05d}TX00100{i % 100:02d}" for i in range(len(rows))],
+        "IndividualRate": rng.uniform(100, 900, len(rows)).round(2),
+    }).to_csv(path, index=False)
+    return pd.read_csv(path)
+
+
+def test_budgeted_load_fills_quotas_of_small_strata(tmp_path):
+    csv_path = str(tmp_path / "rates.csv")
+    full = _write_small_strata_csv(csv_path)
+    df, report = data_store.load_within_budget(csv_path, 0.3, chunksize=2000)
+    assert report["sampled"] and report["memory_mb"] <= report["budget_mb"]
+
+    # Each stratum gets its proportional share of the kept rows, however few
+    # of its rows happened to draw small keys while streaming
+    strata = ["StateCode", "MetalLevel"]
+    sizes = full.groupby(strata).size()
+    kept = df.groupby(strata, observed=True).size().reindex(sizes.index, fill_value=0)
+    share = len(df) * sizes / len(full)
+    assert (kept >= np.minimum(np.floor(share) - 1, sizes)).all()
+    assert (kept <= np.maximum(share + len(sizes), data_store.MIN_ROWS_PER_STRATUM)).all()
+
+
+def test_budgeted_load_reads_whole_file_when_it_fits(tmp_path):
+    csv_path = str(tmp_path / "rates.csv")
+    full = _write_rates_csv(csv_path, rows=2000)
+    df, report = data_store.load_within_budget(csv_path, 50)
+    assert not report["sampled"]
+    assert report["rows_kept"] == len(full) and report["sampling_ratio"] == 1.0
+    assert df["PlanId"].tolist() == full["PlanId"].tolist()
+
+
+def _touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_touched_csv_is_hashed_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    csv_path = str(tmp_path / "plans.csv")
+    _write_csv(csv_path)
+    data_store.write_snapshot(csv_path)
+    _touch(csv_path)
+
+    hashed = []
+    content_hash = data_store._content_hash
+    monkeypatch.setattr(data_store, "_content_hash", lambda paths: hashed.append(paths) or content_hash(paths))
+    assert data_store.read_snapshot(csv_path) is not None
+    assert data_store.read_snapshot(csv_path) is not None
+    assert len(hashed) == 1
+
+    # Touched again: the recorded stat no longer matches
+    _touch(csv_path)
+    assert data_store.read_snapshot(csv_path) is not None
+    assert len(hashed) == 2
+
+
+def test_source_is_parsed_and_hashed_in_one_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    csv_path = str(tmp_path / "plans.csv")
+    _write_csv(csv_path)
+    data_store.write_snapshot(csv_path)
+    _write_csv(csv_path, rate=321.0)
+    _touch(csv_path)
+    expected_hash = data_store._content_hash([csv_path])
+
+    def fail(paths):
+        raise AssertionError("hashed separately")
+
+    monkeypatch.setattr(data_store, "_content_hash", fail)
+    df, source_hash = data_store._read_source(csv_path)
+    assert source_hash == expected_hash
+    assert df["AvgIndividualRate"].tolist() == [321.0, 210.5]
+
+
+def test_touched_source_keeps_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    csv_path = str(tmp_path / "plans.csv")
+    _write_csv(csv_path)
+    data_store.write_snapshot(csv_path)
+    _touch(csv_path)
+
+    df, source_hash = data_store._read_source(csv_path)
+    assert source_hash == data_store._content_hash([csv_path])
+    assert df["PlanId"].tolist() == [1, 2]
+    # Recorded, so the next load maps the snapshot without reading the CSV
+    def fail(path):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(data_store, "_read_csv_hashed", fail)
+    assert data_store._read_source(csv_path)[1] == source_hash
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import etl
+
+
+def _write_raw_rates(path, rows=40000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "BusinessYear": 2024,
+        "StateCode": rng.choice(["CA", "NY", "TX", ""], size=rows),
+        "PlanId": [f"{i % 500:05d}CA0010001" for i in range(rows)],
+        "Age": rng.choice(["21", "40", "64 and over", "Family Option"], size=rows),
+        "Tobacco": rng.choice(["No Preference", "Tobacco User/Non-Tobacco User"], size=rows),
+        "IndividualRate": [f"${rate:,.2f}" for rate in rng.uniform(100, 1500, rows)],
+        "IndividualTobaccoRate": "",
+    })
+    # Rows missing a required column never reach the output
+    df.loc[::97, "PlanId"] = ""
+    df.loc[::101, "IndividualRate"] = " "
+    df.to_csv(path, index=False)
+    return pd.read_csv(path, keep_default_na=False, dtype=str)
+
+
+def test_stage_round_trip(tmp_path, monkeypatch):
+    raw_path = str(tmp_path / "Rate.csv")
+    raw = _write_raw_rates(raw_path)
+    monkeypatch.setattr(etl.STAGES["rate"], "input_path", raw_path)
+    output_dir = str(tmp_path / "data")
+
+    # A 1 MB block size splits the file across several worker processes
+    report = etl.run_stage("rate", workers=2, block_size_mb=1, output_dir=output_dir)
+    valid = raw[(raw["PlanId"].str.strip() != "") & (raw["IndividualRate"].str.strip() != "")]
+    assert report["rows_in"] == len(raw)
+    assert report["rows_out"] == len(valid)
+    assert sorted(os.listdir(report["output"])) == ["StateCode=CA", "StateCode=NY", "StateCode=TX", "StateCode=unknown"]
+    assert len(os.listdir(os.path.join(report["output"], "StateCode=CA"))) > 1
+    assert not os.path.exists(report["output"] + ".tmp")
+
+    columns = ["PlanId", "Age", "IndividualRate", "IndividualTobaccoRate", "StateCode", "BusinessYear"]
+    back = pd.concat(etl.read_stage("rate", columns, batch_rows=5000, output_dir=output_dir), ignore_index=True)
+    # Columns outside trim_rate's list were never written
+    assert list(back.columns) == ["PlanId", "Age", "IndividualRate", "IndividualTobaccoRate", "StateCode"]
+    assert len(back) == len(valid)
+
+    expected = valid.assign(
+        IndividualRate=valid["IndividualRate"].str.replace(r"[$,]", "", regex=True).astype(float),
+        StateCode=valid["StateCode"].replace("", np.nan),
+    )
+    key = ["PlanId", "Age", "IndividualRate"]
+    got = back.sort_values(key).reset_index(drop=True)
+    expected = expected.sort_values(key).reset_index(drop=True)
+    assert got["PlanId"].tolist() == expected["PlanId"].tolist()
+    assert got["Age"].tolist() == expected["Age"].tolist()
+    np.testing.assert_allclose(got["IndividualRate"], expected["IndividualRate"])
+    assert got["IndividualTobaccoRate"].isna().all()
+    # The partition column comes back, missing where the source had none
+    assert got["StateCode"].isna().sum() == (expected["StateCode"].isna()).sum()
+    assert (got["StateCode"].fillna("") == expected["StateCode"].fillna("")).all()
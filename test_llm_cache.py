@@ -0,0 +1,49 @@
+import time
+
+from llm_cache import ResponseCache, cache_key
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_normalized_prompts_share_a_key():
+    assert cache_key("Recommend a GOLD plan?", "m", "v1") == cache_key("  recommend a gold   plan", "m", "v1")
+    assert cache_key("Recommend a gold plan", "m", "v1") != cache_key("Recommend a gold plan", "m", "v2")
+
+
+def test_memory_hits_keep_entries_from_eviction(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", "answer a")
+    time.sleep(0.01)
+    cache.put("b", "answer b")
+    time.sleep(0.01)
+    # Served from memory, never reading SQLite
+    assert cache.get("a") == "answer a"
+    assert cache.counters["memory_hits"] == 1
+    time.sleep(0.01)
+    cache.put("c", "answer c")
+
+    # A fresh process sees what SQLite kept
+    reopened = _cache(tmp_path, max_entries=2)
+    assert reopened.get("a") == "answer a"
+    assert reopened.get("b") is None
+    assert reopened.get("c") == "answer c"
+
+
+def test_empty_answers_are_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("a", "")
+    cache.put("b", "  \n")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_answers_are_misses(tmp_path):
+    cache = _cache(tmp_path, ttl=0.01)
+    cache.put("a", "answer a")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,32 @@
+import socket
+
+import pytest
+
+from fake_gemini_server import start_server
+from llm_client import GeminiClient, LLMError
+
+API_KEY = "SECRET-KEY-123"
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_api_key_sent_as_header():
+    server = start_server(port=0, latency=0, jitter=0, token_delay=0)
+    try:
+        client = GeminiClient(API_KEY, "gemini-1.5-flash", base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        text = "".join(chunk.text for chunk in client.generate_content("Which plan?", stream=True))
+        assert "Which plan?" in text
+    finally:
+        server.shutdown()
+
+
+def test_connection_error_does_not_reveal_api_key():
+    client = GeminiClient(API_KEY, "gemini-1.5-flash", base_url=f"http://127.0.0.1:{_closed_port()}", max_retries=0)
+    with pytest.raises(LLMError) as error:
+        list(client.generate_content("Which plan?", stream=True))
+    assert API_KEY not in str(error.value)
+    assert "127.0.0.1" not in str(error.value)
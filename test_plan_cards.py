@@ -0,0 +1,50 @@
+from data_store import Dataset
+from plan_cards import COMPARISON_COLUMNS, PlanCards, get_plan_cards, policy_markdown
+
+
+def _dataset(frames, version, plans=None):
+    if plans is not None:
+        frames = (plans, *frames[1:])
+    return Dataset(*frames, version=version)
+
+
+def test_cards_match_policy_markdown(sample_frames):
+    plans = sample_frames[0]
+    cards = PlanCards(plans, "v1")
+    for position in [0, 1, 17, len(plans) - 1]:
+        row = plans.iloc[position]
+        assert cards.markdown[position] == policy_markdown(row)
+        assert cards.comparison_rows([position])[0]["Plan Name"] == row["PlanMarketingName"]
+        assert list(cards.comparison_rows([position])[0]) == list(COMPARISON_COLUMNS)
+
+    # Markdown for several plans is the per-plan markdown joined
+    assert cards.policies_markdown([3, 1]) == "\n".join([policy_markdown(plans.iloc[3]), policy_markdown(plans.iloc[1])])
+    plan_ids = plans["PlanId"].iloc[[5, 2]].tolist()
+    assert cards.positions(plan_ids) == [5, 2]
+    assert cards.positions([*plan_ids, "no such plan"]) is None
+
+
+def test_result_card_fills_in_the_search_values(sample_frames):
+    plans = sample_frames[0]
+    cards = PlanCards(plans, "v1")
+    card = cards.result_card(4, 312.4, 2.0)
+    assert f"🏥 {plans.iloc[4]['PlanMarketingName']}</h3>" in card
+    assert "₹312</span>" in card and ">2/4</span>" in card
+    assert "(plan average)" not in card
+    assert "₹312 <small>(plan average)</small></span>" in cards.result_card(4, 312.4, 2.0, average=True)
+
+
+def test_new_version_rebuilds_cards(sample_frames):
+    first = _dataset(sample_frames, "v1")
+    cards = get_plan_cards(first)
+    assert get_plan_cards(first) is cards
+    assert cards.version == "v1"
+
+    renamed = first.plans.copy()
+    renamed.loc[0, "PlanMarketingName"] = "Renamed Gold Plan"
+    second = _dataset(sample_frames, "v2", renamed)
+    rebuilt = get_plan_cards(second)
+    assert rebuilt is not cards and rebuilt.version == "v2"
+    assert rebuilt.markdown[0].startswith("🔹 **Renamed Gold Plan**")
+    assert not cards.markdown[0].startswith("🔹 **Renamed Gold Plan**")
+    assert rebuilt.markdown[1:] == cards.markdown[1:]
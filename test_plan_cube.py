@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from plan_cube import PlanCube
+
+FILTERS = [
+    {},
+    {"StateCode": "CA"},
+    {"MetalLevel": "Gold"},
+    {"StateCode": "TX", "MetalLevel": "Silver", "PlanType": "HMO"},
+    {"StateCode": "ZZ"},
+]
+
+
+@pytest.fixture(scope="module")
+def frames(sample_frames):
+    plans, rates, _, _ = sample_frames
+    rng = np.random.default_rng(0)
+    plans = plans.assign(StateCode=rng.choice(["CA", "FL", "IL", "NY", "TX"], len(plans)))
+    return plans, rates, PlanCube(plans, rates)
+
+
+def _where(df, filters):
+    for dim, value in filters.items():
+        df = df[df[dim].astype(str) == value]
+    return df
+
+
+def _rate_rows(plans, rates, filters):
+    """
+    Rates labelled with their plan's metal level and type, as the Dashboard merged them
+    """
+    merged = rates.merge(plans[["PlanId", "MetalLevel", "PlanType"]], on="PlanId", how="inner")
+    return _where(merged, filters)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_plan_counts_match_value_counts(frames, filters):
+    plans, _, cube = frames
+    for dim in ["StateCode", "MetalLevel", "PlanType"]:
+        expected = _where(plans, filters)[dim].astype(str).value_counts()
+        assert cube.plans_by(dim, **filters).to_dict() == expected[expected > 0].to_dict()
+    assert cube.plan_total(**filters) == len(_where(plans, filters))
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_rate_aggregates_match_merged_rates(frames, filters):
+    plans, rates, cube = frames
+    rows = _rate_rows(plans, rates, filters)
+    premiums = rows["AvgIndividualRate"].to_numpy(dtype=float)
+
+    expected = rows["StateCode"].astype(str).value_counts()
+    assert cube.rates_by("StateCode", **filters).to_dict() == expected[expected > 0].to_dict()
+
+    stats = cube.premium_stats(**filters)
+    assert stats["count"] == len(rows)
+    if len(rows):
+        assert stats["mean"] == pytest.approx(premiums.mean(), rel=1e-6)
+        assert stats["min"] == pytest.approx(premiums.min())
+        assert stats["max"] == pytest.approx(premiums.max())
+    else:
+        assert np.isnan(stats["mean"])
+
+    counts, edges = cube.histogram(**filters)
+    np.testing.assert_array_equal(counts, np.histogram(premiums, bins=edges)[0])
+
+
+def test_counts_sorted_largest_first(frames):
+    _, _, cube = frames
+    counts = cube.plans_by("MetalLevel")
+    assert list(counts) == sorted(counts, reverse=True)
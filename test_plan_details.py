@@ -0,0 +1,100 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from plan_details import PlanDetailView
+
+
+def _view():
+    plans = pd.DataFrame({
+        "PlanId": ["11111CA0010001", "22222NY0020001", "33333TX0030001"],
+        "PlanMarketingName": ["Blue Shield Gold PPO", "Blue  Shield gold-PPO", "Care Silver HMO"],
+        "MetalLevel": ["Gold", "Gold", "Silver"],
+        "PlanType": ["PPO", "PPO", "HMO"],
+        "MarketCoverage": ["Individual", "Individual", "SHOP"],
+        "StateCode": ["CA", "NY", "TX"],
+        "WellnessProgramOffered": [True, False, True],
+        "DiseaseManagementProgramsOffered": [False, False, True],
+        "IsNoticeRequiredForPregnancy": [True, True, False],
+        "IsHSAEligible": [False, True, False],
+    })
+    benefits = pd.DataFrame({
+        "PlanId": ["11111CA0010001", "11111CA0010001", "33333TX0030001"],
+        "BenefitName": ["Primary Care Visit", "Emergency Room", "Generic Drugs"],
+        "Copay": [25.0, np.nan, 10.0],
+        "Deductible": [np.nan, 500.0, np.nan],
+        "Coinsurance": [np.nan, 20.0, np.nan],
+        "CoverageLevel": ["In Network", np.nan, "In Network"],
+    })
+    return PlanDetailView(plans, benefits, [420.0, 380.0, np.nan])
+
+
+def test_details_by_id():
+    view = _view()
+    detail = view.get("11111CA0010001")
+    assert detail["plan"]["PlanMarketingName"] == "Blue Shield Gold PPO"
+    assert detail["premium"] == 420.0
+    # Benefits sorted by name
+    assert [row["BenefitName"] for row in detail["benefits"]] == ["Emergency Room", "Primary Care Visit"]
+    assert view.get("33333TX0030001")["premium"] is None
+    assert view.get("33333TX0030001")["benefits"][0]["Copay"] == 10.0
+    assert view.get("99999XX0000000") is None
+    assert view.find(" 11111CA0010001 ") == [detail]
+
+
+def test_details_by_name_cheapest_first():
+    view = _view()
+    # Names differing only in case, spacing and punctuation are one plan name
+    assert view.by_name["blue shield gold ppo"] == ["11111CA0010001", "22222NY0020001"]
+    found = view.find("BLUE shield, gold ppo")
+    assert [d["plan"]["PlanId"] for d in found] == ["22222NY0020001", "11111CA0010001"]
+    assert view.find("Unknown Plan") == []
+    # Plans without a premium sort last
+    ids = ["33333TX0030001", "11111CA0010001", "missing"]
+    assert [d["plan"]["PlanId"] for d in view.for_ids(ids)] == ["11111CA0010001", "33333TX0030001"]
+
+
+def test_markdown():
+    view = _view()
+    first, *others = view.find("Blue Shield Gold PPO")
+    text = view.markdown(first, others=others)
+    assert text.startswith("**Plan Details for Blue  Shield gold-PPO** (Plan ID 22222NY0020001)")
+    assert "**Monthly Premium:** ₹380 (average individual rate)" in text
+    assert "- No benefit details on file for this plan" in text
+    assert "**HSA Eligible:** Yes" in text
+    assert "**Other plans with this name:**\n- Plan ID 11111CA0010001: Gold PPO in CA, ₹420/month" in text
+
+    text = view.markdown(view.get("11111CA0010001"))
+    assert "- Emergency Room: ₹500 deductible, 20% coinsurance" in text
+    assert "- Primary Care Visit (In Network): ₹25 copay" in text
+    assert "Other plans" not in text
+
+    text = view.markdown(view.get("33333TX0030001"))
+    assert "**Monthly Premium:** Not available" in text
+    assert "**Market Coverage:** SHOP in TX" in text
+
+
+@pytest.mark.parametrize("prompt, name", [
+    ("Tell me more about Oscar Select Care EPO", "Oscar Select Care EPO"),
+    ("  please elaborate on 12345AK0010001-01?", "12345AK0010001-01"),
+    ("Details for Kaiser Gold Flex!", "Kaiser Gold Flex"),
+    ("can you tell me more about gold plans for families", None),
+    ("Which plans have details on maternity coverage?", None),
+])
+def test_detail_request_only_at_start_of_message(prompt, name):
+    assert utils.detail_request_name(prompt) == name
+
+
+def test_lookup_failure_is_logged_not_shown(monkeypatch, caplog):
+    def broken_index():
+        raise RuntimeError("secret path /srv/data/filtered_plan2.csv")
+
+    monkeypatch.setattr(utils, "get_plan_name_index", broken_index)
+    with caplog.at_level(logging.ERROR, logger="utils"):
+        reply = utils.lookup_plan_details("Blue Shield Gold PPO")
+    assert "secret" not in reply and "RuntimeError" not in reply
+    assert "Blue Shield Gold PPO" in reply
+    assert "Plan details lookup failed" in caplog.text
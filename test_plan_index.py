@@ -0,0 +1,190 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import create_sample_data
+from plan_index import NEED_COLUMNS, KeywordMatcher, PlanBitmapIndex, PlanScorer, PremiumMatrix, ServiceAreaIndex, top_k
+
+
+@pytest.fixture(scope="module")
+def frames(sample_frames):
+    plans, rates, benefits, service_areas = sample_frames
+    rng = np.random.default_rng(0)
+    areas = service_areas["ServiceAreaId"].astype(str).unique()
+    plans = plans.assign(ServiceAreaId=rng.choice(areas, len(plans)))
+    return plans, rates, service_areas
+
+
+def _pandas_filter(plans, service_areas, state, plan_type):
+    """
+    The Find_a_Plan filter as the page computed it before the bitmap index
+    """
+    filtered = plans
+    if state != "Any":
+        valid_services = service_areas[
+            (service_areas["StateCode"] == state) & service_areas["CoverEntireState"]
+        ]["ServiceAreaId"].unique()
+        filtered = filtered[filtered["ServiceAreaId"].isin(valid_services)]
+    if plan_type == "Child-only":
+        filtered = filtered[filtered["ChildOnlyOffering"]]
+    else:
+        filtered = filtered[filtered["MarketCoverage"].astype(str).str.contains(plan_type, na=False)]
+    return np.flatnonzero(plans.index.isin(filtered.index))
+
+
+@pytest.mark.parametrize("state", ["Any", "CA", "NY", "ZZ"])
+@pytest.mark.parametrize("plan_type", ["Individual", "Family", "Child-only"])
+def test_bitmap_filter_matches_pandas(frames, state, plan_type):
+    plans, _, service_areas = frames
+    index = PlanBitmapIndex(plans, service_areas)
+    conditions = [] if state == "Any" else [("ServiceState", state)]
+    conditions.append(("ChildOnlyOffering", True) if plan_type == "Child-only" else ("MarketCoverage", plan_type))
+
+    bits = index.select(conditions)
+    expected = _pandas_filter(plans, service_areas, state, plan_type)
+    np.testing.assert_array_equal(index.positions(bits), expected)
+    assert index.count(bits) == len(expected)
+
+
+def test_flag_bitsets_partition_the_table(frames):
+    plans, _, service_areas = frames
+    index = PlanBitmapIndex(plans, service_areas)
+    wellness = index.positions(index.get("WellnessProgramOffered", True))
+    others = index.positions(index.get("WellnessProgramOffered", False))
+    np.testing.assert_array_equal(wellness, np.flatnonzero(plans["WellnessProgramOffered"]))
+    assert len(wellness) + len(others) == len(plans)
+    assert index.count(index.get("MetalLevel", "Diamond")) == 0
+
+
+@pytest.mark.parametrize("needs", [[], ["Wellness"], ["Maternity", "Dental"], list(NEED_COLUMNS)])
+def test_scores_match_row_by_row_scoring(frames, needs):
+    plans, _, _ = frames
+    positions = np.arange(0, len(plans), 3)
+    expected = [
+        sum(str(plans.iloc[p][NEED_COLUMNS[need]]).lower() in ["yes", "true", "1"] for need in needs)
+        for p in positions
+    ]
+    np.testing.assert_array_equal(PlanScorer(plans).scores(positions, needs), expected)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_matches_stable_sort(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 60))
+    scores = rng.integers(0, 3, n).astype(np.float32)
+    premiums = rng.choice([100.0, 200.0, 300.0, np.nan], n)
+    k = int(rng.integers(1, 8))
+
+    frame = pd.DataFrame({"score": scores, "premium": premiums})
+    expected = frame.sort_values(["score", "premium"], ascending=[False, True], kind="stable", na_position="last").index[:k]
+    np.testing.assert_array_equal(top_k(scores, premiums, k), expected.to_numpy())
+
+
+def test_zip_lookup_matches_scan():
+    plans = pd.DataFrame({"PlanId": range(6), "ServiceAreaId": ["A1", "A2", "B1", "B2", "C1", "A1"]})
+    service_areas = pd.DataFrame({
+        "ServiceAreaId": ["A1", "A2", "B1", "B2", "C1"],
+        "StateCode": ["CA", "CA", "NY", "NY", "TX"],
+        "CoverEntireState": [False, True, False, False, True],
+        "County": ["06001", "06003", "36061", "36047", "48201"],
+        "ZipCodes": ["94105, 94107", "", "10001;10002", "11201-1234", "77002"],
+    })
+    index = ServiceAreaIndex(plans, service_areas)
+
+    def scan(zip_code):
+        rows = service_areas[service_areas["ZipCodes"].str.contains(zip_code)]
+        whole_state = service_areas[service_areas["CoverEntireState"] & service_areas["StateCode"].isin(rows["StateCode"])]
+        areas = set(rows["ServiceAreaId"]) | set(whole_state["ServiceAreaId"])
+        return np.flatnonzero(plans["ServiceAreaId"].isin(areas))
+
+    for zip_code in ["94105", "94107", "10002", "11201", "77002", "99999"]:
+        np.testing.assert_array_equal(PlanBitmapIndex(plans, service_areas).positions(index.plans_for_zip(zip_code)), scan(zip_code))
+    # ZIP+4 and numbers parsed from a CSV normalize to the same key
+    assert index.areas_for_zip("11201-1234") == index.areas_for_zip(11201.0)
+    assert index.areas_for_county("6001") == ("A1", "A2")
+
+
+@pytest.mark.parametrize("state", ["Any", "CA", "TX", "ZZ"])
+def test_premiums_match_grouped_merge(frames, state):
+    plans, rates, _ = frames
+    positions = np.arange(len(plans))
+    premiums = PremiumMatrix(plans, rates).premiums(positions, state)
+
+    # Find_a_Plan before the matrix: mean rate per plan in the state, left-merged
+    rate_filtered = rates if state == "Any" else rates[rates["StateCode"] == state]
+    rate_avg = rate_filtered.groupby("PlanId")["AvgIndividualRate"].mean().reset_index()
+    expected = pd.merge(plans, rate_avg, on="PlanId", how="left")["AvgIndividualRate"].to_numpy(dtype=float)
+    np.testing.assert_allclose(premiums, expected, rtol=1e-5)
+
+
+def test_average_by_matches_merge(frames):
+    plans, rates, _ = frames
+    averages = PremiumMatrix(plans, rates).average_by(plans["MetalLevel"])
+
+    # Home before the matrix
+    merged = plans.merge(rates, on="PlanId", how="inner")
+    expected = merged.groupby("MetalLevel", observed=True)["AvgIndividualRate"].mean()
+    np.testing.assert_allclose(
+        averages.set_index("MetalLevel")["AvgIndividualRate"].to_numpy(),
+        expected.reindex(averages["MetalLevel"]).to_numpy(),
+        rtol=1e-5,
+    )
+
+
+def _filter_policies(policy_df, user_input, exclude_names=None):
+    """
+    The chat's keyword filter as utils.filter_policies computed it before KeywordMatcher
+    """
+    exclude_names = exclude_names or []
+    keywords = {
+        "wellness": "WellnessProgramOffered",
+        "maternity": "IsNoticeRequiredForPregnancy",
+        "pregnancy": "IsNoticeRequiredForPregnancy",
+        "child": "ChildOnlyOffering",
+        "disease": "DiseaseManagementProgramsOffered",
+    }
+    mask = pd.Series([False] * len(policy_df))
+    for word, col in keywords.items():
+        if re.search(rf"\b{word}\b", user_input.lower()) and col in policy_df.columns:
+            mask |= policy_df[col].astype(str).str.contains("Yes|1|True", case=False, na=False)
+    requested_levels = [lvl.capitalize() for lvl in ["gold", "silver", "bronze", "platinum"] if lvl in user_input.lower()]
+    filtered = policy_df[mask].dropna(subset=["PlanMarketingName"])
+    if requested_levels:
+        filtered = filtered[filtered["MetalLevel"].isin(requested_levels)]
+    if exclude_names:
+        filtered = filtered[~filtered["PlanMarketingName"].isin(exclude_names)]
+    return filtered.drop_duplicates(subset=["PlanMarketingName"]).head(3)
+
+
+@pytest.mark.parametrize("text", [
+    "Any plans with a wellness program?",
+    "I need maternity cover, ideally Gold",
+    "pregnancy or child plans in silver or bronze",
+    "Disease management on a PLATINUM plan",
+    "wellnessy goldfish",
+    "what about dental?",
+])
+def test_keyword_matcher_matches_filter_policies(sample_frames, text):
+    raw_plans = create_sample_data()[0]
+    matcher = KeywordMatcher(sample_frames[0])
+    expected = _filter_policies(raw_plans, text)
+    assert matcher.match(text) == expected.index.tolist()
+
+    # Excluding the names already shown moves on to the next distinct names
+    shown = expected["PlanMarketingName"].tolist()
+    assert matcher.match(text, exclude_names=shown) == _filter_policies(raw_plans, text, shown).index.tolist()
+
+
+def test_keyword_matcher_plan_types():
+    plans = pd.DataFrame({
+        "PlanMarketingName": ["A", "B", "B", "C", None],
+        "PlanType": ["HMO", "PPO", "PPO", "PPO", "PPO"],
+        "MetalLevel": ["Gold", "Gold", "Silver", "Bronze", "Gold"],
+    })
+    matcher = KeywordMatcher(plans)
+    # Only the requested type, unlike the old filter that took HMO and PPO for either
+    assert matcher.match("a PPO please") == [1, 3]
+    assert matcher.match("hmo or ppo in gold") == [0, 1]
+    assert matcher.match("PPOs") == []
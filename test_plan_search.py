@@ -0,0 +1,138 @@
+import random
+
+import pandas as pd
+import pytest
+
+from plan_search import SEARCH_LIMIT, PlanNameIndex, edit_distance, edit_pattern, normalize_name
+
+NAMES = [
+    "Bright Health Plus Premium",
+    "Bright Health Premium Advantage HMO",
+    "Bright Health Premium Value HMO",
+    "Aetna Gold Care",
+    "Aetna Silver Flex",
+    "Aetna Select Plus",
+    "Oscar Select Care EPO",
+    "Kaiser Gold Flex",
+    "Kaiser Gold Flex",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    plans = pd.DataFrame({"PlanId": range(100, 100 + len(NAMES)), "PlanMarketingName": NAMES})
+    return PlanNameIndex(plans)
+
+
+def test_several_prefix_matches_are_alternatives(index):
+    resolution = index.resolve("Bright Health Premium")
+    assert resolution["name"] is None
+    # Names that begin with the text are offered first
+    assert sorted(resolution["alternatives"][:2]) == ["Bright Health Premium Advantage HMO", "Bright Health Premium Value HMO"]
+    assert "Bright Health Plus Premium" in resolution["alternatives"]
+
+
+def test_issuer_name_lists_its_plans(index):
+    resolution = index.resolve("Aetna")
+    assert resolution["name"] is None
+    assert sorted(resolution["alternatives"]) == ["Aetna Gold Care", "Aetna Select Plus", "Aetna Silver Flex"]
+
+
+def test_single_prefix_match_resolves(index):
+    resolution = index.resolve("the bright health premium value plan")
+    assert resolution["name"] == "Bright Health Premium Value HMO"
+    assert resolution["plan_ids"] == ["102"]
+
+
+def test_exact_name_resolves_to_every_plan_with_it(index):
+    resolution = index.resolve("kaiser gold flex")
+    assert resolution["name"] == "Kaiser Gold Flex"
+    assert resolution["plan_ids"] == ["107", "108"]
+
+
+def test_typo_and_plan_id(index):
+    assert index.resolve("Oscr Selct Care")["name"] == "Oscar Select Care EPO"
+    assert index.resolve("103")["name"] == "Aetna Gold Care"
+
+
+def test_hyphenated_plan_id():
+    plans = pd.DataFrame({
+        "PlanId": ["12345AK0010001-01", "12345AK0010001-02"],
+        "PlanMarketingName": ["Premera Gold", "Premera Gold Plus"],
+    })
+    index = PlanNameIndex(plans)
+    resolution = index.resolve("12345AK0010001-02")
+    assert resolution["name"] == "Premera Gold Plus"
+    assert resolution["plan_ids"] == ["12345AK0010001-02"]
+    assert index.resolve(" 12345ak0010001-01 ")["plan_ids"] == ["12345AK0010001-01"]
+
+
+def test_unknown_name(index):
+    assert index.resolve("Zebra Mutual")["name"] is None
+    assert index.resolve("Zebra Mutual")["alternatives"] == []
+
+
+def test_search_lists_prefix_matches_first(index):
+    positions = index.search("aet")
+    assert [NAMES[p] for p in positions[:3]] == sorted(NAMES[3:6])
+
+
+@pytest.fixture(scope="module")
+def catalog(sample_frames):
+    plans = sample_frames[0]
+    return plans, PlanNameIndex(plans)
+
+
+@pytest.mark.parametrize("text", ["gol", "kaiser pl", "a", "ambetter value", "sel heal", "zzz"])
+def test_word_prefix_ranges_match_scan(catalog, text):
+    _, index = catalog
+    key = normalize_name(text)
+    expected = [
+        entry for entry, name in enumerate(index.keys)
+        if all(any(word.startswith(typed) for word in name.split()) for typed in key.split())
+    ]
+    assert index._word_prefix_entries(key).tolist() == expected
+
+
+def test_id_prefix_lookup(catalog):
+    plans, index = catalog
+    plan_ids = plans["PlanId"].astype(str)
+    for text in ["7", "12", "999", " 45 "]:
+        expected = sorted((plan_id, position) for position, plan_id in enumerate(plan_ids) if plan_id.startswith(text.strip()))
+        positions = index.search(text)
+        assert positions[:len(expected)] == [position for _, position in expected][:SEARCH_LIMIT]
+    assert index.search("999")[0] == plan_ids.tolist().index("999")
+
+
+def test_search_returns_at_most_search_limit(catalog):
+    plans, index = catalog
+    assert SEARCH_LIMIT == 20
+    # "1" starts over a hundred PlanIds, and most names share a word starting "s"
+    for text in ["1", "s", "gold", "plan"]:
+        positions = index.search(text)
+        assert len(positions) <= SEARCH_LIMIT
+        assert len(set(positions)) == len(positions)
+    assert len(index.search("1")) == SEARCH_LIMIT
+    assert len(index.search("s")) == SEARCH_LIMIT
+    assert len(index.search("gold", limit=5)) == 5
+
+    # Nothing typed: the first names A-Z, one plan each
+    first = [plans["PlanMarketingName"].iloc[p] for p in index.search("  ")]
+    assert len(first) == SEARCH_LIMIT and first == sorted(set(first), key=normalize_name)
+
+
+def _levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def test_edit_distance_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(500):
+        a = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 12)))
+        b = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 12)))
+        assert edit_distance(edit_pattern(a), len(a), b) == _levenshtein(a, b)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+from rate_cube import MAX_AGE, MIN_AGE, PlanQuotes, RateAccumulator, RateCube
+
+
+def _raw_rates(seed=0, plans=12):
+    """
+    Raw CMS-style rate rows: every plan in one or two states, ages 0-14 to 64 and over
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for plan_id in range(1, plans + 1):
+        for state in ["CA", "NY"][: 1 + plan_id % 2]:
+            for age in ["0-14"] + [str(a) for a in range(MIN_AGE, MAX_AGE)] + ["64 and over"]:
+                rate = float(rng.uniform(100, 900))
+                tobacco = rate * 1.2 if plan_id % 3 else np.nan
+                rows.append((plan_id, state, age, "No Preference", rate, tobacco))
+    return pd.DataFrame(rows, columns=["PlanId", "StateCode", "Age", "Tobacco", "IndividualRate", "IndividualTobaccoRate"])
+
+
+def _plans(count=12):
+    return pd.DataFrame({"PlanId": np.arange(1, count + 1, dtype=np.int64)})
+
+
+def test_quotes_match_int_plan_ids():
+    raw = _raw_rates()
+    quotes = PlanQuotes(_plans(), RateCube.from_frame(raw))
+    positions = np.arange(12)
+
+    by_state = quotes.quotes(positions, "CA", 30, 40)
+    assert not np.isnan(by_state).any()
+    assert not np.isnan(quotes.quotes(positions, "Any", 30, 40, tobacco=True)).any()
+
+    ages = pd.to_numeric(raw["Age"], errors="coerce")
+    expected = raw[(raw["StateCode"] == "CA") & ages.between(30, 40)].groupby("PlanId")["IndividualRate"].mean()
+    np.testing.assert_allclose(by_state, expected.reindex(range(1, 13)).to_numpy(), rtol=1e-5)
+
+
+def test_unrated_state_and_plan_give_nan():
+    quotes = PlanQuotes(_plans(13), RateCube.from_frame(_raw_rates()))
+    assert np.isnan(quotes.quotes(np.array([12]), "CA", 30, 40)).all()
+    assert np.isnan(quotes.quotes(np.array([0]), "TX", 30, 40)).all()
+
+
+def test_lookup_accepts_int_plan_id():
+    cube = RateCube.from_frame(_raw_rates())
+    assert cube.lookup(1, "CA", 64) == cube.lookup("1", "CA", 64)
+    assert not np.isnan(cube.lookup(1, "CA", 64))
+
+
+def test_tobacco_falls_back_to_standard_rate():
+    raw = _raw_rates()
+    cube = RateCube.from_frame(raw)
+    # Plan 3 files no tobacco rates
+    assert cube.lookup(3, "CA", 30, tobacco=True) == cube.lookup(3, "CA", 30)
+    assert cube.lookup(1, "NY", 30, tobacco=True) > cube.lookup(1, "NY", 30)
+
+
+def _old_averages(raw):
+    """
+    filtered_rate2.py before the streaming accumulator
+    """
+    df = raw.copy()
+    df["Age"] = pd.to_numeric(df["Age"], errors="coerce")
+    df = df.dropna(subset=["Age"])
+    df = df[df["Age"].between(18, 64)]
+    df = df[df["Tobacco"].str.lower() == "no"]
+    df = df.dropna(subset=["IndividualRate"])
+    return (
+        df.groupby(["PlanId", "StateCode"])["IndividualRate"].mean()
+        .reset_index().rename(columns={"IndividualRate": "AvgIndividualRate"})
+    )
+
+
+def _tobacco_rates(seed=1):
+    raw = _raw_rates(seed).astype({"PlanId": str})
+    rng = np.random.default_rng(seed)
+    raw["Tobacco"] = rng.choice(["No", "Yes"], len(raw))
+    raw.loc[rng.random(len(raw)) < 0.05, "IndividualRate"] = np.nan
+    return raw
+
+
+def test_chunked_merge_matches_single_pass_and_old_averages():
+    raw = _tobacco_rates()
+    whole = RateAccumulator().add(raw)
+    merged = RateAccumulator()
+    for start in range(0, len(raw), 97):
+        merged.merge(RateAccumulator().add(raw.iloc[start:start + 97]))
+
+    expected = _old_averages(raw).sort_values(["PlanId", "StateCode"], ignore_index=True)
+    for totals in (whole, merged):
+        averages = totals.averages()
+        assert averages[["PlanId", "StateCode"]].equals(expected[["PlanId", "StateCode"]])
+        np.testing.assert_allclose(averages["AvgIndividualRate"], expected["AvgIndividualRate"])
+
+    np.testing.assert_allclose(whole.to_cube().rates, merged.to_cube().rates, equal_nan=True)
+    np.testing.assert_array_equal(whole.summary()["RateCount"], merged.summary()["RateCount"])
+
+
+def test_percentiles_stay_close_to_exact():
+    raw = _tobacco_rates()
+    summary = RateAccumulator().add(raw).summary()
+    kept = raw[pd.to_numeric(raw["Age"], errors="coerce").between(MIN_AGE, MAX_AGE) & (raw["Tobacco"] == "No")]
+    exact = kept.groupby(["PlanId", "StateCode"])["IndividualRate"].median().reset_index(drop=True)
+
+    # One log-spaced bin is about 9% wide
+    np.testing.assert_allclose(summary["P50IndividualRate"], exact, rtol=0.1)
+    assert (summary["MinIndividualRate"] <= summary["P50IndividualRate"]).all()
+    assert (summary["P90IndividualRate"] <= summary["MaxIndividualRate"]).all()
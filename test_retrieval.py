@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from retrieval import B, K1, PlanRetriever, STOPWORDS, tokenize
+
+
+def _catalog():
+    plans = pd.DataFrame({
+        "PlanId": ["P1", "P2", "P3", "P4", "P5"],
+        "PlanMarketingName": ["Aetna Gold Care", "Oscar Silver Flex", "Kaiser Bronze Basic", "Kaiser Bronze Basic", "Cigna Dental Plus"],
+        "MetalLevel": ["Gold", "Silver", "Bronze", "Bronze", "Silver"],
+        "PlanType": ["PPO", "HMO", "HMO", "HMO", "EPO"],
+        "MarketCoverage": ["Individual", "Individual", "SHOP", "SHOP", "Individual"],
+        "StateCode": ["CA", "NY", "TX", "FL", "CA"],
+        "IsNoticeRequiredForPregnancy": [True, False, True, True, False],
+        "DentalOnlyPlan": [False, False, False, False, True],
+        "WellnessProgramOffered": [False, True, False, False, False],
+    })
+    benefits = pd.DataFrame({
+        "PlanId": ["P1", "P1", "P2", "P5", "P5"],
+        "BenefitName": ["Prenatal Care", "Emergency Room", "Mental Health Visit", "Dental Cleaning", "Orthodontia"],
+        "CoverageLevel": ["In Network", "In Network", "In Network", "Child", "Adult"],
+    })
+    return plans, benefits, [450.0, 300.0, 220.0, 210.0, 40.0]
+
+
+def _bm25(documents, query):
+    # Textbook BM25 over token lists, one document at a time
+    n = len(documents)
+    avg_length = np.mean([len(document) for document in documents])
+    terms = [term for term in tokenize(query) if term not in STOPWORDS]
+    scores = np.zeros(n)
+    for term in terms:
+        df = sum(term in document for document in documents)
+        if not df:
+            continue
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        for i, document in enumerate(documents):
+            tf = document.count(term)
+            if tf:
+                scores[i] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(document) / avg_length))
+    return scores
+
+
+def test_bm25_scores_and_ranking():
+    plans, benefits, premiums = _catalog()
+    retriever = PlanRetriever(plans, benefits, premiums)
+    documents = list(retriever.documents_by_signature.values())
+    assert len(documents) == len(plans)
+
+    for query in ["maternity plan in california", "dental for kids", "kaiser bronze hmo", "mental health"]:
+        np.testing.assert_allclose(retriever.scores(query), _bm25(documents, query))
+
+    # Prenatal benefit plus the maternity flag put the Gold plan first
+    assert retriever.search("prenatal maternity care", k=2)[0] == 0
+    assert retriever.search("dental orthodontia", k=1) == [4]
+    # Two Kaiser plans share a name: only the cheaper one is listed
+    assert retriever.search("kaiser bronze", k=3)[:1] == [3]
+    assert 2 not in retriever.search("kaiser bronze", k=3)
+
+
+def test_unmatched_query_goes_to_cheapest_plans():
+    plans, benefits, premiums = _catalog()
+    retriever = PlanRetriever(plans, benefits, premiums)
+    assert not retriever.scores("what plan would you recommend").any()
+    assert retriever.search("what plan would you recommend", k=3) == [4, 3, 1]
+
+
+def test_changed_row_invalidates_only_its_document():
+    plans, benefits, premiums = _catalog()
+    first = PlanRetriever(plans, benefits, premiums)
+
+    # Change one plan's row and another plan's benefits
+    changed_plans = plans.copy()
+    changed_plans.loc[1, "PlanMarketingName"] = "Oscar Silver Flex Premier"
+    changed_benefits = pd.concat([benefits, pd.DataFrame({"PlanId": ["P3"], "BenefitName": ["Acupuncture"], "CoverageLevel": ["Adult"]})], ignore_index=True)
+    second = PlanRetriever(changed_plans, changed_benefits, premiums, previous=first)
+
+    assert second.reused == len(plans) - 2
+    unchanged = [0, 3, 4]
+    assert (second.signatures[unchanged] == first.signatures[unchanged]).all()
+    for position in unchanged:
+        signature = int(second.signatures[position])
+        assert second.documents_by_signature[signature] is first.documents_by_signature[signature]
+    assert "premier" in second.documents_by_signature[int(second.signatures[1])]
+    assert "acupuncture" in second.documents_by_signature[int(second.signatures[2])]
+    assert second.search("acupuncture", k=1) == [2]
+
+    # The same data again reuses every document
+    assert PlanRetriever(changed_plans, changed_benefits, premiums, previous=second).reused == len(plans)
@@ -14,15 +14,19 @@ columns_to_keep = [
     "StateCode"
 ]
 
-# Step 2: Read file in chunks
-chunksize = 100000  # Adjust based on your system
-chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
+# Rows missing any of these are dropped
+required_columns = ["PlanId", "BenefitName"]
 
-# Step 3: Write filtered chunks to new CSV
-first_chunk = True
-for chunk in chunks:
-    chunk = chunk.dropna(subset=["PlanId", "BenefitName"])  # Drop invalid rows
-    chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
-    first_chunk = False
+if __name__ == "__main__":
+    # Step 2: Read file in chunks
+    chunksize = 100000  # Adjust based on your system
+    chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
 
-print("✅ Trimmed benefits saved to:", output_path)
+    # Step 3: Write filtered chunks to new CSV
+    first_chunk = True
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=required_columns)  # Drop invalid rows
+        chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
+        first_chunk = False
+
+    print("✅ Trimmed benefits saved to:", output_path)
@@ -17,13 +17,17 @@ columns_to_keep = [
     "StateCode"
 ]
 
-chunksize = 100000
-chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
+# Rows missing any of these are dropped
+required_columns = ["StandardComponentId"]
 
-first_chunk = True
-for chunk in chunks:
-    chunk = chunk.dropna(subset=["StandardComponentId"])
-    chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
-    first_chunk = False
+if __name__ == "__main__":
+    chunksize = 100000
+    chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
 
-print("✅ Trimmed business rules saved to:", output_path)
+    first_chunk = True
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=required_columns)
+        chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
+        first_chunk = False
+
+    print("✅ Trimmed business rules saved to:", output_path)
@@ -19,13 +19,28 @@ columns_to_keep = [
     "RateExpirationDate"
 ]
 
-chunksize = 100000
-chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
+# Rows missing any of these are dropped
+required_columns = ["PlanId", "Age", "IndividualRate"]
 
-first_chunk = True
-for chunk in chunks:
-    chunk = chunk.dropna(subset=["PlanId", "Age", "IndividualRate"])
-    chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
-    first_chunk = False
+# Stored as numbers in the columnar ETL output; everything else stays text
+numeric_columns = [
+    "IndividualRate",
+    "IndividualTobaccoRate",
+    "PrimarySubscriberAndOneDependent",
+    "PrimarySubscriberAndTwoDependents",
+    "Couple",
+    "CoupleAndOneDependent",
+    "CoupleAndTwoDependents"
+]
+
+if __name__ == "__main__":
+    chunksize = 100000
+    chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
+
+    first_chunk = True
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=required_columns)
+        chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
+        first_chunk = False
 
-print("✅ Trimmed rate data saved to:", output_path)
+    print("✅ Trimmed rate data saved to:", output_path)
@@ -11,13 +11,17 @@ columns_to_keep = [
     "CoverEntireState"
 ]
 
-chunksize = 100000
-chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
+# Rows missing any of these are dropped
+required_columns = ["ServiceAreaId", "StateCode"]
 
-first_chunk = True
-for chunk in chunks:
-    chunk = chunk.dropna(subset=["ServiceAreaId", "StateCode"])
-    chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
-    first_chunk = False
+if __name__ == "__main__":
+    chunksize = 100000
+    chunks = pd.read_csv(input_path, chunksize=chunksize, usecols=lambda col: col in columns_to_keep, low_memory=False)
 
-print("✅ Trimmed service area data saved to:", output_path)
+    first_chunk = True
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=required_columns)
+        chunk.to_csv(output_path, mode='w' if first_chunk else 'a', index=False, header=first_chunk)
+        first_chunk = False
+
+    print("✅ Trimmed service area data saved to:", output_path)
@@ -1,290 +1,263 @@
-import google.generativeai as genai
-import pandas as pd
 import re
 import os
-import numpy as np
+import logging
+import hashlib
+import threading
+import time
 import streamlit as st
 from dotenv import load_dotenv
+from data_store import get_dataset, create_sample_data, load_within_budget
+from llm_cache import cache_key, get_response_cache
+from plan_cards import get_plan_cards, policy_markdown
+from plan_details import get_plan_details
+from plan_index import get_keyword_matcher
+from plan_search import get_plan_name_index
+from retrieval import get_plan_retriever
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+logger = logging.getLogger(__name__)
 
-# Try different model names in case one is not available
-def get_model():
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        return model
-    except Exception as e:
-        return None
+# Memory budget for loading raw CSVs outside the trimmed dataset, in MB
+MEMORY_BUDGET_MB = float(os.getenv('HAVENLY_MEMORY_BUDGET_MB', '256'))
 
-model = get_model()
-
-# Load trimmed plan data
-try:
-    policy_df = pd.read_csv("filtered_plan2.csv")
-except FileNotFoundError:
-    st.warning("filtered_plan2.csv not found. Using sample data.")
-    
-    # Create realistic plan names for sample data
-    companies = ["Blue Cross", "Aetna", "Cigna", "UnitedHealth", "Kaiser", "Humana"]
-    suffixes = ["Select", "Premier", "Advantage", "Complete", "Essential", "Basic"]
-    
-    plan_names = []
-    for i in range(100):
-        company = np.random.choice(companies)
-        metal_level = np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'])
-        suffix = np.random.choice(suffixes)
-        plan_name = f"{company} {metal_level} {suffix}"
-        plan_names.append(plan_name)
-    
-    policy_df = pd.DataFrame({
-        'PlanId': range(1, 101),
-        'PlanMarketingName': plan_names,
-        'MetalLevel': np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'], 100),
-        'PlanType': np.random.choice(['HMO', 'PPO', 'EPO'], 100),
-        'WellnessProgramOffered': np.random.choice(['Yes', 'No'], 100),
-        'DiseaseManagementProgramsOffered': np.random.choice(['Yes', 'No'], 100),
-        'IsNoticeRequiredForPregnancy': np.random.choice(['Yes', 'No'], 100),
-        'ChildOnlyOffering': np.random.choice(['Yes', 'No'], 100)
-    })
+MODEL_NAME = "gemini-1.5-flash"
 
-def filter_policies(user_input, exclude_names=None):
-    if exclude_names is None:
-        exclude_names = []
+# Catalog plans retrieved for each question and summarized in the prompt
+RETRIEVED_PLANS = 5
+# Of those, the ones shown in the comparison table under the answer
+SUGGESTED_PLANS = 3
 
-    keywords = {
-        "wellness": "WellnessProgramOffered",
-        "maternity": "IsNoticeRequiredForPregnancy",
-        "pregnancy": "IsNoticeRequiredForPregnancy",
-        "child": "ChildOnlyOffering",
-        "disease": "DiseaseManagementProgramsOffered",
-        "ppo": "PlanType",
-        "hmo": "PlanType",
-    }
+# Enhanced context for better plan recommendations
+ADVISOR_CONTEXT = """You are an AI insurance advisor for Havenly. You help users find the best health insurance plans. 
 
-    mask = pd.Series([False] * len(policy_df))
+IMPORTANT GUIDELINES:
+1. Always recommend specific plan names when users ask about insurance plans
+2. Only recommend plans from the CATALOG PLANS list below, using their exact names
+3. Explain why you're recommending specific plans
+4. Be helpful, informative, and suggest relevant plans when appropriate
+5. Keep responses concise but informative
+6. If the user asks about plans, always include 2-3 specific plan recommendations with brief explanations
 
-    for word, col in keywords.items():
-        if re.search(rf"\b{word}\b", user_input.lower()) and col in policy_df.columns:
-            mask |= policy_df[col].astype(str).str.contains("Yes|1|True|PPO|HMO", case=False, na=False)
+When recommending plans, consider:
+- User's budget and preferences
+- Metal levels (Bronze, Silver, Gold, Platinum)
+- Plan types (HMO, PPO, EPO)
+- Coverage needs (wellness, maternity, mental health, dental)"""
 
-    metal_levels = ["gold", "silver", "bronze", "platinum"]
-    requested_levels = [lvl.capitalize() for lvl in metal_levels if lvl in user_input.lower()]
+# Chat messages opening with a request about one plan, followed by its name;
+# the phrase elsewhere ("can you tell me more about gold plans") goes to the model
+DETAIL_REQUEST = re.compile(
+    r"^\s*(?:please\s+)?(?:elaborate on|tell me more about|more info(?:rmation)? (?:on|about)|details (?:of|on|about|for))\s+(?P<name>.+)",
+    re.IGNORECASE,
+)
 
-    filtered = policy_df[mask].dropna(subset=["PlanMarketingName"])
+# Cached answers are only reused while the model, this context and the plan data are unchanged
+PROMPT_VERSION = hashlib.sha256(ADVISOR_CONTEXT.encode()).hexdigest()[:12]
 
-    if requested_levels:
-        filtered = filtered[filtered["MetalLevel"].isin(requested_levels)]
+_model = None
+_model_lock = threading.Lock()
 
-    if exclude_names:
-        filtered = filtered[~filtered["PlanMarketingName"].isin(exclude_names)]
+# Try different model names in case one is not available
+def get_model():
+    """
+    Create the Gemini client on first use, shared by all sessions
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                # Deferred so pages that never chat don't pay for the HTTP client import
+                from llm_client import GeminiClient
 
-    return filtered.drop_duplicates(subset=["PlanMarketingName"]).head(3)
+                try:
+                    _model = GeminiClient(api_key=os.getenv('GOOGLE_API_KEY'), model_name=MODEL_NAME)
+                except Exception as e:
+                    return None
+    return _model
+
+def get_policy_df():
+    """
+    Plan table used by the chat helpers, loaded through the shared dataset store
+    """
+    dataset = get_dataset()
+    if dataset.is_sample:
+        st.warning("filtered_plan2.csv not found. Using sample data.")
+    return dataset.plans
+
+def filter_policies(user_input, exclude_names=None):
+    """
+    Up to three plans with distinct names matching the keywords and metal levels in the input
+    """
+    policy_df = get_policy_df()
+    positions = get_keyword_matcher().match(user_input, exclude_names or ())
+    return policy_df.iloc[positions]
 
 def format_policies(df):
-    output = []
-    for _, row in df.iterrows():
-        plan = f"""🔹 **{row['PlanMarketingName']}**
-- Metal Level: {row.get('MetalLevel', 'N/A')}
-- Plan Type: {row.get('PlanType', 'N/A')}
-- Wellness: {row.get('WellnessProgramOffered', 'N/A')}
-- Disease Mgmt: {row.get('DiseaseManagementProgramsOffered', 'N/A')}
-- Maternity Support: {row.get('IsNoticeRequiredForPregnancy', 'N/A')}
-"""
-        output.append(plan)
-    return "\n".join(output)
-
-def load_data_memory_efficient(file_path, sample_size=10000):
+    # Plans from the shared dataset use their prerendered markdown
+    cards = get_plan_cards()
+    positions = cards.positions(df["PlanId"]) if "PlanId" in df.columns else None
+    if positions is None:
+        return "\n".join(policy_markdown(plan) for plan in df.to_dict("records"))
+    return cards.policies_markdown(positions)
+
+def load_data_memory_efficient(file_path, memory_budget_mb=MEMORY_BUDGET_MB, columns=None):
     """
-    Load data with memory optimization for large files
+    Load a CSV within a memory budget, sampling evenly across states and metal levels if it must
     """
     try:
         if not os.path.exists(file_path):
             return None
-            
-        file_size = os.path.getsize(file_path) / (1024 * 1024)  # Size in MB
-        
-        if file_size > 100:  # If file is larger than 100MB
-            st.info(f"Large file detected ({file_size:.1f}MB). Loading sample for better performance.")
-            return pd.read_csv(file_path, nrows=sample_size)
-        else:
-            return pd.read_csv(file_path)
-            
+
+        df, report = load_within_budget(file_path, memory_budget_mb, columns=columns)
+
+        if report["sampled"]:
+            st.info(
+                f"{file_path} does not fit in {memory_budget_mb:,.0f}MB. Loaded a stratified sample of "
+                f"{report['rows_kept']:,} of {report['rows_read']:,} rows ({report['sampling_ratio']:.1%}) "
+                f"across {report['strata']:,} state/metal groups, using {report['memory_mb']:.1f}MB."
+            )
+        return df
+
     except Exception as e:
         st.error(f"Error loading {file_path}: {e}")
         return None
 
 def load_trimmed_data():
     """
-    Load trimmed datasets for deployment
+    Load trimmed datasets for deployment from the shared dataset store
     """
-    try:
-        # Load trimmed datasets
-        plans_df = pd.read_csv("filtered_plan2.csv")
-        rates_df = pd.read_csv("filtered_rate2.csv")
-        benefits_df = pd.read_csv("filtered_benefits2.csv")
-        service_areas_df = pd.read_csv("filtered_service_area.csv")
-        
-        st.success(f"✅ Loaded trimmed data: {len(plans_df):,} plans, {len(rates_df):,} rates, {len(benefits_df):,} benefits")
-        return plans_df, rates_df, benefits_df, service_areas_df
-        
-    except Exception as e:
-        st.error(f"Error loading trimmed data: {e}")
+    dataset = get_dataset()
+
+    if dataset.load_error is not None:
+        st.error(f"Error loading trimmed data: {dataset.load_error}")
         st.info("Using sample data instead.")
-        return create_sample_data()
+    else:
+        st.success(f"✅ Loaded trimmed data: {len(dataset.plans):,} plans, {len(dataset.rates):,} rates, {len(dataset.benefits):,} benefits")
+
+    return dataset.views()
 
-def get_gemini_response(prompt, exclude_names=None):
+def retrieval_query(prompt, history=""):
     """
-    Get response from Google Gemini AI with enhanced plan recommendations
+    Text the catalog is searched with for an answer: the question and any earlier conversation
+    """
+    return f"{history}\n{prompt}" if history else prompt
+
+def suggest_plan_names(prompt, history=""):
+    """
+    Plan names to show next to an answer about plans
+    """
+    plan_names = []
+    if any(keyword in prompt.lower() for keyword in ["plan", "coverage", "insurance", "recommend", "suggest"]):
+        # The top catalog matches, ranked as for the retrieval the answer was grounded on
+        retriever = get_plan_retriever()
+        plan_names = [retriever.names[position] for position in retriever.search(retrieval_query(prompt, history), SUGGESTED_PLANS)]
+    return plan_names
+
+def stream_gemini_response(prompt, metrics=None, history=""):
+    """
+    Yield the answer to a prompt in pieces as Gemini generates them.
+
+    history is earlier conversation to answer a follow-up in context; it is
+    part of the cache key and of the plan retrieval query.
+
+    A cached answer comes back as a single piece; a complete answer is cached
+    once the stream ends. If a metrics dict is given it receives ttft_s (time
+    to first token), total_s, cached and error.
     """
+    metrics = {} if metrics is None else metrics
+    metrics.update(cached=False, error=False, ttft_s=None)
+    start = time.perf_counter()
     try:
         # Check if API key is configured
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key or api_key == 'your_google_gemini_api_key_here':
-            return "API Configuration Required: Please set up your Google Gemini API key in the .env file. Visit https://makersuite.google.com/app/apikey to get an API key.", []
-        
+            metrics["error"] = True
+            yield "API Configuration Required: Please set up your Google Gemini API key in the .env file. Visit https://makersuite.google.com/app/apikey to get an API key."
+            return
+
+        # Identical questions are answered from the cache without calling the model
+        dataset = get_dataset()
+        cache = get_response_cache()
+        key = cache_key(f"{history}\n{prompt}" if history else prompt, MODEL_NAME, f"{PROMPT_VERSION}:{dataset.version}")
+        response_text = cache.get(key)
+        if response_text is not None:
+            metrics.update(cached=True, ttft_s=time.perf_counter() - start)
+            yield response_text
+            return
+
         # Check if model is available
+        model = get_model()
         if model is None:
-            return "Model Configuration Error: Unable to connect to Google Gemini AI service. Please check your API key and try again.", []
-        
-        # Enhanced context for better plan recommendations
-        context = """You are an AI insurance advisor for Havenly. You help users find the best health insurance plans. 
+            metrics["error"] = True
+            yield "Model Configuration Error: Unable to connect to Google Gemini AI service. Please check your API key and try again."
+            return
 
-IMPORTANT GUIDELINES:
-1. Always recommend specific plan names when users ask about insurance plans
-2. Use realistic insurance plan names like "Blue Cross Gold Premier" or "Aetna Silver Select"
-3. Explain why you're recommending specific plans
-4. Be helpful, informative, and suggest relevant plans when appropriate
-5. Keep responses concise but informative
-6. If the user asks about plans, always include 2-3 specific plan recommendations with brief explanations
+        # Ground the answer in the catalog plans that best match the question
+        retriever = get_plan_retriever(dataset)
+        catalog = retriever.summarize(dataset.plans, retriever.search(retrieval_query(prompt, history), RETRIEVED_PLANS))
+        full_prompt = f"{ADVISOR_CONTEXT}\n\nCATALOG PLANS:\n{catalog}\n\n"
+        if history:
+            full_prompt += f"CONVERSATION SO FAR:\n{history}\n\n"
+        full_prompt += f"User: {prompt}"
 
-When recommending plans, consider:
-- User's budget and preferences
-- Metal levels (Bronze, Silver, Gold, Platinum)
-- Plan types (HMO, PPO, EPO)
-- Coverage needs (wellness, maternity, mental health, dental)"""
-        
-        full_prompt = f"{context}\n\nUser: {prompt}"
-        
-        response = model.generate_content(full_prompt)
-        
-        # Extract plan names from the response or generate realistic ones
-        plan_names = []
-        if any(keyword in prompt.lower() for keyword in ["plan", "coverage", "insurance", "recommend", "suggest"]):
-            # Generate realistic plan recommendations based on the query
-            companies = ["Blue Cross", "Aetna", "Cigna", "UnitedHealth", "Kaiser", "Humana"]
-            metal_levels = ["Bronze", "Silver", "Gold", "Platinum"]
-            suffixes = ["Select", "Premier", "Advantage", "Complete", "Essential"]
-            
-            # Create 3 realistic plan recommendations
-            for i in range(3):
-                company = np.random.choice(companies)
-                metal = np.random.choice(metal_levels)
-                suffix = np.random.choice(suffixes)
-                plan_name = f"{company} {metal} {suffix}"
-                plan_names.append(plan_name)
-        
-        return response.text, plan_names
-        
-    except Exception as e:
-        return f"API Error: {str(e)}. Please check your API key and try again.", []
+        pieces = []
+        for chunk in model.generate_content(full_prompt, stream=True):
+            if not chunk.text:
+                continue
+            if not pieces:
+                metrics["ttft_s"] = time.perf_counter() - start
+            pieces.append(chunk.text)
+            yield chunk.text
 
-def lookup_plan_details(plan_name):
+        cache.put(key, "".join(pieces), MODEL_NAME, prompt)
+
+    except Exception:
+        # Details stay in the server log; exception text can carry request internals
+        logger.exception("Gemini call failed")
+        metrics["error"] = True
+        yield "API Error: The AI service could not answer right now. Please try again in a moment."
+    finally:
+        metrics["total_s"] = time.perf_counter() - start
+
+def get_gemini_response(prompt, exclude_names=None, history=""):
+    """
+    Get response from Google Gemini AI with enhanced plan recommendations
     """
-    Look up details for a specific plan
+    metrics = {}
+    response_text = "".join(stream_gemini_response(prompt, metrics, history))
+    if metrics["error"]:
+        return response_text, []
+    return response_text, suggest_plan_names(prompt, history)
+
+def detail_request_name(prompt):
     """
-    try:
-        # In a real application, this would query a database
-        # For now, return sample information
-        return f"""
-        **Plan Details for {plan_name}**
-        
-        **Coverage Level:** Silver
-        **Monthly Premium:** ₹450
-        **Deductible:** ₹2,500
-        **Out-of-Pocket Maximum:** ₹7,000
-        
-        **Key Benefits:**
-        - Primary care visits: ₹25 copay
-        - Specialist visits: ₹40 copay
-        - Emergency room: ₹200 copay
-        - Prescription drugs: Tiered copays
-        
-        **Network:** PPO
-        **Wellness Programs:** Yes
-        **Mental Health Coverage:** Yes
-        
-        This plan offers a good balance of coverage and cost for most individuals and families.
-        """
-    except Exception as e:
-        return f"Sorry, I couldn't find details for {plan_name}. Error: {e}"
+    The plan name in a request for one plan's details, or None for other messages
+    """
+    match = DETAIL_REQUEST.match(prompt)
+    return match.group("name").strip(" ?.!") if match else None
 
-def create_sample_data():
+def lookup_plan_details(plan_name):
     """
-    Create sample data for demonstration when real data is not available
+    Look up details for a specific plan by a possibly misspelled or partial
+    name, or a PlanId. Returns a list to choose from when several plans match
+    closely, and None when nothing in the catalog matches.
     """
-    np.random.seed(42)
-    
-    # Insurance company names for realistic plan names
-    companies = [
-        "Blue Cross", "Aetna", "Cigna", "UnitedHealth", "Kaiser", "Humana", 
-        "Anthem", "Molina", "Centene", "WellCare", "Ambetter", "Oscar"
-    ]
-    
-    suffixes = [
-        "Select", "Premier", "Advantage", "Complete", "Essential", "Basic",
-        "Standard", "Premium", "Plus", "Choice", "Flex", "Smart", "Value"
-    ]
-    
-    # Generate realistic plan names
-    plan_names = []
-    for i in range(1000):
-        company = np.random.choice(companies)
-        metal_level = np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'])
-        suffix = np.random.choice(suffixes)
-        plan_name = f"{company} {metal_level} {suffix}"
-        plan_names.append(plan_name)
-    
-    # Sample plans with realistic names
-    plans_df = pd.DataFrame({
-        'PlanId': range(1, 1001),
-        'PlanMarketingName': plan_names,
-        'MetalLevel': np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'], 1000),
-        'PlanType': np.random.choice(['HMO', 'PPO', 'EPO'], 1000),
-        'WellnessProgramOffered': np.random.choice(['Yes', 'No'], 1000),
-        'DiseaseManagementProgramsOffered': np.random.choice(['Yes', 'No'], 1000),
-        'IsNoticeRequiredForPregnancy': np.random.choice(['Yes', 'No'], 1000),
-        'ChildOnlyOffering': np.random.choice(['Yes', 'No'], 1000),
-        'MarketCoverage': np.random.choice(['Individual', 'Family', 'Child-only'], 1000),
-        'IsHSAEligible': np.random.choice(['Yes', 'No'], 1000),
-        'DentalOnlyPlan': np.random.choice(['Yes', 'No'], 1000)
-    })
-    
-    # Sample rates
-    rates_df = pd.DataFrame({
-        'PlanId': np.random.choice(range(1, 1001), 5000),
-        'Age': np.random.randint(18, 65, 5000),
-        'IndividualRate': np.random.uniform(200, 800, 5000),
-        'StateCode': np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL'], 5000),
-        'Tobacco': np.random.choice(['Yes', 'No'], 5000)
-    })
-    
-    # Sample benefits
-    benefits_df = pd.DataFrame({
-        'PlanId': np.random.choice(range(1, 1001), 3000),
-        'BenefitName': np.random.choice(['Primary Care', 'Specialist', 'Emergency', 'Prescription', 'Dental', 'Vision'], 3000),
-        'Copay': np.random.uniform(10, 50, 3000),
-        'Deductible': np.random.uniform(500, 5000, 3000)
-    })
-    
-    # Sample service areas
-    service_areas_df = pd.DataFrame({
-        'StateCode': np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL'], 1000),
-        'ServiceAreaId': [f"{state}S001" for state in np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL'], 1000)],
-        'CoverEntireState': np.random.choice(['Yes', 'No'], 1000),
-        'County': np.random.randint(10000, 99999, 1000),
-        'ZipCodes': [f"{np.random.randint(10000, 99999)}" for _ in range(1000)]
-    })
-    
-    return plans_df, rates_df, benefits_df, service_areas_df
+    try:
+        resolution = get_plan_name_index().resolve(plan_name)
+        if resolution["alternatives"]:
+            options = "\n".join(f"{i}. {name}" for i, name in enumerate(resolution["alternatives"], 1))
+            if resolution["more"]:
+                options += f"\n\n...and {resolution['more']} more. Add a word or two to narrow it down."
+            return (
+                f"I found several plans matching **{plan_name}**. Which one did you mean?\n\n{options}\n\n"
+                "Ask me to \"tell me more about\" one of them by its full name."
+            )
+        if resolution["name"] is None:
+            return None
+        view = get_plan_details()
+        details = view.for_ids(resolution["plan_ids"])
+        return view.markdown(details[0], others=details[1:])
+    except Exception:
+        logger.exception("Plan details lookup failed")
+        return f"Sorry, I couldn't look up details for {plan_name} right now. Please try again in a moment."